@@ -1,7 +1,13 @@
 import reflex as rx
 # from Trust_Web.trust_game_state import TrustGameState # Unused
 # from Trust_Web.questionnaire_state import QuestionnaireState # Unused
+from Trust_Web.app_logging import configure_logging
 from Trust_Web.authentication import AuthState
+from Trust_Web.firebase_config import auth_client_lifespan
+from Trust_Web.config_registry import config_watcher_lifespan
+from Trust_Web.metrics import instrument_event_handlers, metrics_api
+from Trust_Web.state_size import state_size_lifespan
+from Trust_Web.tracing import configure_tracing, tracing_lifespan
 from Trust_Web.components import (
     login_form,
     instructions_page,
@@ -16,6 +22,10 @@ from Trust_Web.components import (
     results_page,
 )
 from Trust_Web.layout import layout
+
+configure_logging()  # Before the app starts handling events; level and format come from the environment
+configure_tracing()  # Only if $TRUST_WEB_TRACE_FILE or $TRUST_WEB_TRACE_ENDPOINT is set
+
 # from Trust_Web.components.common_styles import STYLES, COLORS, page_container, primary_button, section_heading # Removed import
 
 
@@ -111,5 +121,15 @@ app = rx.App(
         color_mode="light",
         initial_color_mode="light",
         use_system_color_mode=False,
-    )
+    ),
+    api_transformer=metrics_api(),  # GET /metrics on the backend, for Prometheus
 )
+# Time every event handler of the app's states; all of them are imported by now
+instrument_event_handlers()
+# Close the pooled Firebase Auth connections when the backend shuts down
+app.register_lifespan_task(auth_client_lifespan)
+# Pick up edits to profiles/*.toml for new sessions without a restart
+app.register_lifespan_task(config_watcher_lifespan)
+app.register_lifespan_task(tracing_lifespan, rx_app=app)
+# Serialized state sizes on /metrics; warns about states and vars over budget in dev mode
+app.register_lifespan_task(state_size_lifespan, rx_app=app)
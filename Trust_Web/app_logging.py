@@ -0,0 +1,152 @@
+"""
+Structured, leveled logging for the backend.
+
+Modules log through `logger = logging.getLogger(__name__)` instead of print().
+configure_logging(), called once when the app module is imported, sends every
+record of the "Trust_Web" logger tree through a QueueHandler: code on the event
+loop only enqueues the record, and a QueueListener thread formats it (one JSON
+object per line, or plain text) and writes it to stderr.
+
+Messages logged on hot paths, such as computed vars and per-click handlers,
+pass `extra=HOT_PATH`. They are sampled: at most HOT_PATH_MAX_PER_WINDOW
+records per call site get through every HOT_PATH_WINDOW_SECONDS, and the next
+one that does reports how many were dropped. Below the configured level they
+cost a single level check.
+
+Environment:
+    TRUST_WEB_LOG_LEVEL   DEBUG, INFO (default), WARNING or ERROR
+    TRUST_WEB_LOG_FORMAT  json (default) or text
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+ROOT_LOGGER_NAME = "Trust_Web"
+
+LOG_LEVEL_ENV = "TRUST_WEB_LOG_LEVEL"
+LOG_FORMAT_ENV = "TRUST_WEB_LOG_FORMAT"
+DEFAULT_LOG_LEVEL = "INFO"
+
+# Pass as extra= to have a record sampled by SamplingFilter
+HOT_PATH = {"hot_path": True}
+HOT_PATH_WINDOW_SECONDS = 60.0
+HOT_PATH_MAX_PER_WINDOW = 5
+
+# Attributes every LogRecord has; anything else was passed through extra= and is emitted as a field
+_STANDARD_RECORD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+class SamplingFilter(logging.Filter):
+    """Rate-limits records marked with HOT_PATH, per call site (logger, file and line)."""
+
+    def __init__(self, window_seconds: float = HOT_PATH_WINDOW_SECONDS, max_per_window: int = HOT_PATH_MAX_PER_WINDOW):
+        super().__init__()
+        self.window_seconds = window_seconds
+        self.max_per_window = max_per_window
+        self._lock = threading.Lock()
+        # Call site -> [window start, records passed in the window, records dropped in the window]
+        self._sites: Dict[Tuple[str, str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "hot_path", False):
+            return True
+        site = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._sites.get(site)
+            if window is None or now - window[0] >= self.window_seconds:
+                dropped = window[2] if window is not None else 0
+                self._sites[site] = [now, 1, 0]
+                if dropped:
+                    record.suppressed = dropped
+                return True
+            if window[1] < self.max_per_window:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class StructuredQueueHandler(QueueHandler):
+    """QueueHandler that keeps extra= fields and the traceback apart from the message."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg, any extra= fields and exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_RECORD_ATTRS and key != "hot_path":
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the extra= fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(
+            f"{key}={value}"
+            for key, value in record.__dict__.items()
+            if key not in _STANDARD_RECORD_ATTRS and key != "hot_path"
+        )
+        return f"{line} [{fields}]" if fields else line
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None) -> None:
+    """Installs the queue handler on the Trust_Web logger tree; later calls only change the level.
+
+    Args:
+        level: Level name, defaults to $TRUST_WEB_LOG_LEVEL or INFO
+        log_format: "json" or "text", defaults to $TRUST_WEB_LOG_FORMAT or json
+    """
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    root.setLevel((level or os.getenv(LOG_LEVEL_ENV) or DEFAULT_LOG_LEVEL).upper())
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler()
+    output.setFormatter(TextFormatter() if (log_format or os.getenv(LOG_FORMAT_ENV)) == "text" else JsonFormatter())
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = StructuredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    root.addHandler(handler)
+    root.propagate = False  # Reflex's own handlers would print every record a second time
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # Flushes the records still queued
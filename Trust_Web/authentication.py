@@ -1,14 +1,33 @@
+import asyncio
+import logging
+from typing import Any, Dict
+
 import reflex as rx
-from .firebase_config import sign_in_with_email_and_password, create_user_with_email_and_password
-# Removed direct state imports, will rely on events
+from .app_logging import HOT_PATH
+from .firebase_config import sign_in_with_email_and_password, create_user_with_email_and_password, FirebaseAuthError
+from .identity_state import IdentityState
+from .public_goods_state import PublicGoodState
+from .state_store import CompactStateMixin
+from .trust_game_state import TrustGameState
+from .token_manager import (
+    REFRESH_RETRY_SECONDS,
+    MIN_REFRESH_DELAY_SECONDS,
+    can_refresh,
+    is_permanent_refresh_error,
+    is_session_valid,
+    refresh_session_tokens,
+    seconds_until_refresh,
+    session_tokens_from_response,
+)
+# Game states read the identity through IdentityState; only logout resets them directly
 # from .questionnaire_state import QuestionnaireState
 # from .demographic_state import DemographicState
-# from .trust_game_state import TrustGameState
-# from .public_goods_state import PublicGoodState
 # from .components.results import ResultsState # Removed this line
 
+logger = logging.getLogger(__name__)
+
 
-class AuthState(rx.State):
+class AuthState(CompactStateMixin, rx.State):
     """Handles user authentication and session management."""
 
     # Authentication state
@@ -19,6 +38,11 @@ class AuthState(rx.State):
     auth_error: str = ""
     user_id: str = ""  # Firebase localId
 
+    # Cached ID/refresh tokens of this session (see token_manager), never sent to the browser
+    _session_tokens: Dict[str, Any] = {}
+    # Bumped whenever a refresh loop starts or the session ends, stopping older loops
+    _token_refresh_generation: int = 0
+
     # Modal state for login dialog
     show_login_modal: bool = False
 
@@ -37,47 +61,98 @@ class AuthState(rx.State):
         """Set the confirm password."""
         self.confirm_password = value
 
-    def _handle_successful_auth(self, user: dict, redirect_path: str = "/app/demography"):
+    async def _handle_successful_auth(self, user: dict, redirect_path: str = "/app/demography"):
         """Private helper to handle common logic after successful login/registration."""
         raw_user_id = user.get("localId")
         if not raw_user_id:
             self.auth_error = "Failed to retrieve user ID from authentication."
-            print(f"[AUTH_STATE] Auth error: localId is missing or empty. User: {user}")
+            logger.error("Auth response without localId, fields: %s", sorted(user))
             return self.auth_error # Or raise an exception
 
         self.user_id = raw_user_id
         self.is_authenticated = True
         self.auth_error = ""
-        print(f"[AUTH_STATE] Authentication successful. User ID: {self.user_id}, Email: {self.user_email}, Auth: {self.is_authenticated}")
+        self._session_tokens = session_tokens_from_response(user)
+        logger.info("Authentication successful", extra={"user_id": self.user_id})
 
-        # Emit an event to notify other states, instead of direct calls
-        event_payload = {"user_id": self.user_id, "user_email": self.user_email}
-        
+        # Publish the identity once; game states read it through get_state and load their data on first visit
+        identity = await self.get_state(IdentityState)
+        identity._set_identity(self.user_id, self.user_email)
+
+        # A participant whose last session ended mid-game is sent back to the round they left off
         actions = [
             AuthState.close_login_modal,
-            rx.Event("auth.set_user_identity", payload=event_payload),
-            rx.redirect(redirect_path)
+            TrustGameState.resume_from_checkpoint(redirect_path),
         ]
+        if self._session_tokens.get("refresh_token"):
+            actions.append(AuthState.keep_session_tokens_fresh)
         return actions
 
+    @rx.event(background=True)
+    async def keep_session_tokens_fresh(self):
+        """Refreshes the cached ID token shortly before it expires, for as long as the session lasts."""
+        async with self:
+            self._token_refresh_generation += 1
+            generation = self._token_refresh_generation
+
+        while True:
+            async with self:
+                if generation != self._token_refresh_generation or not can_refresh(
+                    self._session_tokens, self.user_id
+                ):
+                    return
+                tokens = dict(self._session_tokens)
+            await asyncio.sleep(seconds_until_refresh(tokens))
+
+            async with self:
+                if generation != self._token_refresh_generation or not can_refresh(
+                    self._session_tokens, self.user_id
+                ):
+                    return
+                tokens = dict(self._session_tokens)
+            try:
+                refreshed = await refresh_session_tokens(tokens)
+            except FirebaseAuthError as e:
+                logger.warning("Token refresh failed: %s", e, extra={"user_id": tokens.get("user_id")})
+                if is_permanent_refresh_error(e.code):
+                    async with self:
+                        if generation == self._token_refresh_generation:
+                            self._session_tokens = {}
+                    return
+                await asyncio.sleep(REFRESH_RETRY_SECONDS)
+                continue
+
+            async with self:
+                if generation != self._token_refresh_generation:
+                    return
+                if refreshed.get("user_id") != self.user_id:
+                    logger.warning("Refreshed token belongs to another user, dropping it", extra={"user_id": self.user_id})
+                    self._session_tokens = {}
+                    return
+                self._session_tokens = refreshed
+            await asyncio.sleep(MIN_REFRESH_DELAY_SECONDS)
+
     @rx.event
-    def login(self) -> None:
-        """Handle user login using Firebase."""
+    async def login(self):
+        """Handle user login using Firebase.
+
+        Async so that other sessions keep being served while the request is in flight.
+        """
         try:
             if not self.user_email or not self.password:
                 self.auth_error = "Please enter both email and password"
                 return
-            user = sign_in_with_email_and_password(self.user_email, self.password)
-            return self._handle_successful_auth(user)
+            user = await sign_in_with_email_and_password(self.user_email, self.password)
+            return await self._handle_successful_auth(user)
         except Exception as e:
             self.auth_error = str(e)
-            print(f"[AUTH_STATE] Login exception: {e}")
+            logger.info("Login failed: %s", e)
             # Optionally, return an error state or None
             return AuthState.set_auth_error(str(e))
 
 
     @rx.event
-    def register(self) -> None:
+    async def register(self):
         """Handle user registration using Firebase."""
         try:
             if not self.user_email or not self.password:
@@ -86,20 +161,19 @@ class AuthState(rx.State):
             if self.password != self.confirm_password:
                 self.auth_error = "Passwords do not match"
                 return
-            user = create_user_with_email_and_password(self.user_email, self.password)
+            user = await create_user_with_email_and_password(self.user_email, self.password)
             # For registration, redirect might be different or include additional setup steps
             # For now, using the default redirect_path from _handle_successful_auth
-            return self._handle_successful_auth(user)
+            return await self._handle_successful_auth(user)
         except Exception as e:
             self.auth_error = str(e)
-            print(f"[AUTH_STATE] Register exception: {e}")
+            logger.info("Registration failed: %s", e)
             return AuthState.set_auth_error(str(e))
 
     @rx.event
-    def logout(self) -> None:
+    async def logout(self):
         """Handle user logout by clearing local state and emitting a logout event."""
         prev_user_id = self.user_id
-        prev_auth_state = self.is_authenticated
 
         self.user_email = ""
         self.password = ""
@@ -107,13 +181,16 @@ class AuthState(rx.State):
         self.is_authenticated = False
         self.user_id = ""
         self.auth_error = ""
+        self._session_tokens = {}
+        self._token_refresh_generation += 1
+        identity = await self.get_state(IdentityState)
+        identity._clear_identity()
 
-        print(
-            f"[AUTH_STATE] Logout. Prev UserID: {prev_user_id}, Prev Auth: {prev_auth_state}, New Auth: {self.is_authenticated}"
-        )
-        # Emit a general logout event for other states to handle
+        logger.info("Logout", extra={"user_id": prev_user_id})
+        # Reset the games played by the previous participant
         return [
-            rx.Event("auth.logout_event"),
+            TrustGameState.handle_logout_event,
+            PublicGoodState.handle_logout_event,
             rx.redirect("/")
         ]
 
@@ -125,7 +202,7 @@ class AuthState(rx.State):
     @rx.event
     def on_load_index_page_check(self):
         """Checks auth on index page load and redirects if necessary."""
-        print(f"[AUTH_STATE-INDEX_CHECK] Auth: {self.is_authenticated}")
+        logger.debug("Index page check, authenticated: %s", self.is_authenticated, extra=HOT_PATH)
         if self.is_authenticated:
             # return rx.redirect("/app/demography") # Allow authenticated users to see the landing page
             return None
@@ -133,11 +210,24 @@ class AuthState(rx.State):
 
     @rx.event
     def on_load_app_page_check(self):
-        """Checks auth on app page load and redirects if necessary."""
-        print(f"[AUTH_STATE-APP_CHECK] Auth: {self.is_authenticated}, UserID: {self.user_id}")
+        """Checks auth on app page load and redirects if necessary.
+
+        The session is validated against the cached token claims only, so no
+        request leaves the server. An expired token that can still be
+        refreshed lets the page load and restarts the background refresh.
+        """
+        logger.debug(
+            "App page check, authenticated: %s", self.is_authenticated, extra={**HOT_PATH, "user_id": self.user_id}
+        )
         if not self.is_authenticated or not self.user_id:
             return rx.redirect("/")
-        return None
+        if is_session_valid(self._session_tokens, self.user_id):
+            return None
+        if can_refresh(self._session_tokens, self.user_id):
+            return AuthState.keep_session_tokens_fresh
+        logger.info("No valid session tokens, redirecting", extra={"user_id": self.user_id})
+        self.is_authenticated = False
+        return rx.redirect("/")
 
     @rx.event
     def open_login_modal(self):
@@ -155,9 +245,9 @@ class AuthState(rx.State):
     @rx.event
     def login_on_enter(self, key: str):
         if key == "Enter":
-            return self.login()
+            return AuthState.login
 
     @rx.event
     def register_on_enter(self, key: str):
         if key == "Enter":
-            return self.register()
+            return AuthState.register
@@ -0,0 +1,406 @@
+"""
+Microbenchmarks of the experiment engine's hot code, tracked across commits.
+
+Each benchmark times one call of a game engine step, computed var or
+serialization helper on synthetic data sized like a large study. Every run is
+appended to a JSON-lines history with the git commit it measured, and
+--compare fails the run if a benchmark's median got slower than on the
+previous commit by more than --tolerance, so regressions are caught before a
+study goes live:
+
+    python -m Trust_Web.benchmarks                  # run all and record them
+    python -m Trust_Web.benchmarks -k trust_game    # only names containing "trust_game"
+    python -m Trust_Web.benchmarks --compare        # exit 1 on a regression
+
+Benchmarks measure CPU only: save_experiment_data is replaced by a no-op for
+the run, and the Firestore client is pointed at an emulator address it never
+connects to.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+HISTORY_PATH: Path = Path(__file__).parent.parent / ".benchmarks" / "history.jsonl"
+REPEATS = 7
+MIN_RUN_SECONDS = 0.2  # Each repeat loops the benchmark for at least this long
+DEFAULT_TOLERANCE = 0.20  # Allowed slowdown of the median before --compare fails
+
+# Modules whose save_experiment_data calls are silenced while benchmarking
+STORAGE_MODULES = ("Trust_Web.public_goods_state", "Trust_Web.trust_game_state", "Trust_Web.questionnaire_state")
+
+# Sizes of the synthetic data
+ROUND_HISTORY_SIZE = 1_000  # Section 2 rounds across all stages
+STATISTICS_SIZE = 2_000  # Result documents on the results page
+DOCUMENT_ROUNDS = 2_000  # Rounds embedded in one document passed to _convert_value
+COHORT_SIZE = 10_000  # Participants scored at once
+
+# Benchmark name -> setup function returning the zero-argument callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str) -> Callable[[Callable[[], Callable[[], Any]]], Callable[[], Callable[[], Any]]]:
+    """Registers a setup function under name."""
+
+    def register(setup: Callable[[], Callable[[], Any]]) -> Callable[[], Callable[[], Any]]:
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def _load_state(state_cls: type, user_id: str = "benchmark-user") -> Any:
+    """A fresh session's instance of state_cls, with the participant identity set."""
+    import reflex as rx
+    from reflex.state import StateManagerMemory
+
+    from .identity_state import IdentityState
+
+    async def load():
+        manager = StateManagerMemory(state=rx.State)
+        root = await manager.get_state(f"{uuid.uuid4()}_{state_cls.get_full_name()}")
+        identity = await root.get_state(IdentityState)
+        identity._set_identity(user_id, f"{user_id}@benchmark.local")
+        return await root.get_state(state_cls)
+
+    return asyncio.run(load())
+
+
+# --- Game engines ---
+
+
+@benchmark("trust_game.calculate_player_b_return")
+def _bench_player_b_return() -> Callable[[], Any]:
+    from .trust_game_state import PERSONALITIES_CONFIG, TrustGameState
+
+    state = _load_state(TrustGameState)
+    state._pin_config()
+    state.player_b_personality = next(iter(state._config(PERSONALITIES_CONFIG)))
+    state.amount_to_send = 5
+    calculate = TrustGameState.event_handlers["calculate_player_b_return"].fn
+    return lambda: calculate(state)
+
+
+@benchmark("public_goods.play_game")
+def _bench_play_game() -> Callable[[], Any]:
+    from .public_goods_state import PublicGoodState
+
+    state = _load_state(PublicGoodState)
+    play_game = PublicGoodState.event_handlers["play_game"].fn
+    loop = asyncio.new_event_loop()
+
+    def play_round():
+        state.human_contribution = 10
+        loop.run_until_complete(play_game(state))
+        state._reset_balances()  # Keep every round on the same balances
+
+    return play_round
+
+
+# --- Computed vars ---
+
+
+def _round_history(rng: random.Random, num_stages: int) -> List[Dict[str, Any]]:
+    rounds_per_stage = ROUND_HISTORY_SIZE // num_stages
+    history = []
+    for stage in range(num_stages):
+        for round_num in range(1, rounds_per_stage + 1):
+            sent = rng.randint(1, 5)
+            returned = rng.randint(0, sent * 3)
+            history.append(
+                {
+                    "stage": stage,
+                    "round": round_num,
+                    "amount_sent": sent,
+                    "amount_returned": returned,
+                    "player_a_current_round_payoff": returned - sent,
+                    "player_b_current_round_payoff": sent * 3 - returned,
+                }
+            )
+    return history
+
+
+@benchmark("trust_game.all_stages_vars")
+def _bench_all_stages_vars() -> Callable[[], Any]:
+    from .trust_game_state import PERSONALITIES_CONFIG, TrustGameState
+
+    state = _load_state(TrustGameState)
+    state._pin_config()
+    state._shuffled_profiles = list(state._config(PERSONALITIES_CONFIG))
+    history = _round_history(random.Random(0), len(state._shuffled_profiles))
+
+    def recompute():
+        state._round_history = history  # Invalidates the cached vars, as appending a round does
+        return (
+            state.all_stages_total_invested,
+            state.all_stages_total_returned,
+            state.all_stages_net_payoff,
+            state.all_stages_end_balance,
+        )
+
+    return recompute
+
+
+def _result_documents(rng: random.Random) -> List[Dict[str, Any]]:
+    """Trust game section 1 and 2 rounds and public goods rounds, in equal parts."""
+    documents = []
+    for index in range(STATISTICS_SIZE):
+        sent = rng.randint(1, 5)
+        returned = rng.randint(0, sent * 3)
+        round_num = index % 100 + 1
+        kind = index % 3
+        if kind == 0:
+            data = {"game_name": "public goods game", "round": round_num, "human_contribution": sent, "human_payoff": returned}
+        else:
+            data = {
+                "game_name": "trust_game",
+                "section_num": kind,
+                "stage_num": index // 300,
+                "round": round_num,
+                "amount_sent": sent,
+                "amount_returned": returned,
+                "player_a_payoff": returned - sent,
+                "player_b_payoff": sent * 3 - returned,
+                "player_a_balance": 10 + index,
+                "player_b_balance": index,
+                "human_payoff": returned - sent,
+                "human_balance": 10 + index,
+            }
+        documents.append({"id": f"document_{index}", "data": data})
+    return documents
+
+
+@benchmark("results.summary_vars")
+def _bench_results_summaries() -> Callable[[], Any]:
+    from .results_arrays import TRUST_GAME_COLLECTION_NAME
+    from .results_state import ResultsState
+
+    state = _load_state(ResultsState)
+    state.current_game_loaded = TRUST_GAME_COLLECTION_NAME
+    documents = _result_documents(random.Random(0))
+
+    def recompute():
+        state._statistics = documents  # A new load invalidates every summary var
+        return (
+            state.tg_section1_summary,
+            state.tg_section2_summary,
+            state.tg_section1_round_chart_data,
+            state.tg_section2_round_chart_data,
+            state.pgg_overall_summary,
+        )
+
+    return recompute
+
+
+# --- Serialization ---
+
+
+@benchmark("firebase_db.convert_value")
+def _bench_convert_value() -> Callable[[], Any]:
+    from .firebase_db import _convert_value
+
+    started = datetime.datetime(2025, 1, 1)
+    document = {
+        "user_id": "benchmark-user",
+        "game_began_at": started,
+        "rounds": [
+            {"round": index, "amount_sent": 3, "saved_at": started + datetime.timedelta(seconds=index)}
+            for index in range(DOCUMENT_ROUNDS)
+        ],
+        "profile": {"name": "trustworthy", "parameters": {"base_fairness": 0.5, "fairness_variance": 0.1}},
+    }
+    return lambda: _convert_value(document)
+
+
+@benchmark("questionnaire.calculate_score")
+def _bench_calculate_score() -> Callable[[], Any]:
+    from .questionnaire_scoring import get_compiled_questionnaires
+    from .questionnaire_state import QuestionnaireState
+
+    state = _load_state(QuestionnaireState)
+    state._pin_config()
+    name, compiled = max(get_compiled_questionnaires(state._config_version).items(), key=lambda item: item[1].num_items)
+    answers = state._answers_for(name, state._questionnaire_configs()).copy()
+    answers[:] = [index % compiled.likert_level for index in range(compiled.num_items)]
+    state._answers = {name: answers}
+    return lambda: state._calculate_score_internal(name)
+
+
+@benchmark("questionnaire.score_cohort")
+def _bench_score_cohort() -> Callable[[], Any]:
+    from .questionnaire_scoring import get_compiled_questionnaires, score_cohort
+
+    name, compiled = max(get_compiled_questionnaires().items(), key=lambda item: item[1].num_items)
+    rng = random.Random(0)
+    responses = {
+        f"participant-{index}": [str(rng.randrange(compiled.likert_level)) for _ in range(compiled.num_items)]
+        for index in range(COHORT_SIZE)
+    }
+    return lambda: score_cohort(name, responses)
+
+
+# --- Running and tracking ---
+
+
+@contextlib.contextmanager
+def offline_storage() -> Iterator[None]:
+    """Replaces save_experiment_data with a no-op in the state modules for the duration of the block."""
+    import importlib
+
+    modules = [importlib.import_module(name) for name in STORAGE_MODULES]
+    originals = [module.save_experiment_data for module in modules]
+    for module in modules:
+        module.save_experiment_data = lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        for module, original in zip(modules, originals):
+            module.save_experiment_data = original
+
+
+def time_benchmark(fn: Callable[[], Any], repeats: int = REPEATS) -> Dict[str, Any]:
+    """Times fn over repeats runs of as many calls as fill MIN_RUN_SECONDS.
+
+    Returns:
+        Seconds per call: median, min and max over the repeats, plus the loop sizes
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * MIN_RUN_SECONDS / 0.2))
+    per_call = [total / number for total in timer.repeat(repeat=repeats, number=number)]
+    median = statistics.median(per_call)
+    return {
+        "median_s": median,
+        "min_s": min(per_call),
+        "max_s": max(per_call),
+        "ops_per_s": 1.0 / median if median else float("inf"),
+        "number": number,
+        "repeats": repeats,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(pattern: str = "", repeats: int = REPEATS) -> Dict[str, Dict[str, Any]]:
+    """Runs the benchmarks whose name contains pattern.
+
+    Returns:
+        Benchmark name -> timings of time_benchmark
+    """
+    os.environ.setdefault("FIRESTORE_EMULATOR_HOST", "localhost:8080")  # Never contacted, see offline_storage
+    results = {}
+    with offline_storage():
+        for name, setup in BENCHMARKS.items():
+            if pattern in name:
+                results[name] = time_benchmark(setup(), repeats)
+    return results
+
+
+def load_history(path: Path = HISTORY_PATH) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(results: Dict[str, Dict[str, Any]], path: Path = HISTORY_PATH) -> Dict[str, Any]:
+    """Records a run, with the commit and machine it ran on, at the end of the history file."""
+    entry = {
+        "commit": _git_commit(),
+        "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "results": results,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+    return entry
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float = DEFAULT_TOLERANCE
+) -> Dict[str, float]:
+    """Benchmarks whose median is more than tolerance slower than in baseline.
+
+    Returns:
+        Benchmark name -> slowdown ratio (e.g. 1.35 for 35% slower)
+    """
+    regressions = {}
+    for name, timing in results.items():
+        previous = baseline.get(name)
+        if previous and previous["median_s"] > 0:
+            ratio = timing["median_s"] / previous["median_s"]
+            if ratio > 1.0 + tolerance:
+                regressions[name] = ratio
+    return regressions
+
+
+def _baseline_run(history: List[Dict[str, Any]], commit: str) -> Optional[Dict[str, Any]]:
+    """The latest recorded run of another commit on this machine."""
+    for entry in reversed(history):
+        if entry["commit"] != commit and entry.get("machine") == platform.node():
+            return entry
+    return None
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the experiment engine.")
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH, help="JSON-lines file runs are recorded in")
+    parser.add_argument("--no-record", action="store_true", help="do not append this run to the history")
+    parser.add_argument("--compare", action="store_true", help="exit 1 if slower than the previous commit's run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    results = run_benchmarks(args.pattern, args.repeats)
+    commit = _git_commit()
+    baseline = _baseline_run(history, commit)
+    baseline_results = baseline["results"] if baseline else {}
+
+    print(f"{'benchmark':<42} {'median':>12} {'min':>12} {'ops/s':>12} {'vs ' + (baseline['commit'] if baseline else '-'):>12}")
+    for name, timing in results.items():
+        previous = baseline_results.get(name)
+        change = f"{timing['median_s'] / previous['median_s'] - 1:+.1%}" if previous else ""
+        print(
+            f"{name:<42} {timing['median_s'] * 1e6:>10.1f}us {timing['min_s'] * 1e6:>10.1f}us "
+            f"{timing['ops_per_s']:>12.1f} {change:>12}"
+        )
+
+    if not args.no_record:
+        append_history(results, args.history)
+    if args.compare and baseline:
+        regressions = find_regressions(results, baseline_results, args.tolerance)
+        for name, ratio in regressions.items():
+            print(f"REGRESSION {name}: {ratio - 1:+.1%} vs {baseline['commit']}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Chart data service for the results page.
+
+Round series are keyed by a numeric (stage, round) composite key, so they sort
+and window correctly for any number of stages, and are downsampled with
+Largest-Triangle-Three-Buckets (LTTB) so a chart never ships more than a
+bounded number of points to the browser.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Multiplier of the stage number in the composite key; rounds per stage stay far below it
+ROUND_KEY_STRIDE = 1000
+
+# Upper bound of points sent to the browser per chart
+DEFAULT_MAX_POINTS = 120
+
+# LTTB needs the first point, the last point and at least one bucket in between
+MIN_LTTB_POINTS = 3
+
+# Rounds labelled on the x-axis besides the first shown round of each stage
+TICK_ROUNDS = (1, 6)
+
+
+def stage_round_keys(stages: np.ndarray, rounds: np.ndarray) -> np.ndarray:
+    """Numeric composite keys ordering points by stage, then round."""
+    return stages.astype(np.int64) * ROUND_KEY_STRIDE + rounds.astype(np.int64)
+
+
+def stage_round_label(stage: int, round_num: int) -> str:
+    """The 1-indexed "stage-round" label shown on the x-axis."""
+    return f"{stage + 1}-{round_num}"
+
+
+def window_slice(
+    sorted_keys: np.ndarray, start_stage: Optional[int] = None, end_stage: Optional[int] = None
+) -> slice:
+    """Slice of sorted composite keys whose stage lies in [start_stage, end_stage].
+
+    Args:
+        sorted_keys: Composite keys in ascending order
+        start_stage: First stage to include (0-indexed), None for no lower bound
+        end_stage: Last stage to include (0-indexed), None for no upper bound
+
+    Returns:
+        The slice selecting the window, found by binary search
+    """
+    lo = 0 if start_stage is None else int(np.searchsorted(sorted_keys, start_stage * ROUND_KEY_STRIDE, "left"))
+    hi = (
+        len(sorted_keys)
+        if end_stage is None
+        else int(np.searchsorted(sorted_keys, (end_stage + 1) * ROUND_KEY_STRIDE, "left"))
+    )
+    return slice(lo, max(lo, hi))
+
+
+def lttb_indices(values: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    Points are assumed evenly spaced along x (the chart axis is categorical).
+    With several value columns, the triangle areas of all series are summed so
+    that a spike in any series is preserved.
+
+    Args:
+        values: Array of shape (n,) or (n, k) holding the plotted series
+        max_points: Target number of points
+
+    Returns:
+        Sorted indices into values, always including the first and last point
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    if max_points >= n or max_points < MIN_LTTB_POINTS:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start = end
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = values[next_start:next_end].mean(axis=0)
+
+        areas = np.abs(
+            (x[a] - avg_x) * (values[start:end] - values[a])
+            - (x[a] - x[start:end])[:, None] * (avg_y - values[a])
+        ).sum(axis=1)
+        a = start + int(np.argmax(areas))
+        selected[bucket + 1] = a
+
+    return selected
+
+
+def query_round_series(
+    rows: np.ndarray,
+    fields: Dict[str, str],
+    *,
+    stage_field: Optional[str] = "stage",
+    start_stage: Optional[int] = None,
+    end_stage: Optional[int] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Windowed, downsampled chart series from a structured array of rounds.
+
+    Args:
+        rows: Structured array with a "round" field (and stage_field, if given)
+        fields: Mapping of output series name to the rows field it is read from
+        stage_field: Field holding the 0-indexed stage, None for single-stage games
+        start_stage: First stage of the window (0-indexed), None for the first stage
+        end_stage: Last stage of the window (0-indexed), None for the last stage
+        max_points: Maximum number of points returned
+
+    Returns:
+        Tuple of (chart points ordered by stage and round, x-axis tick labels)
+    """
+    stages = rows[stage_field] if stage_field else np.zeros(rows.size, dtype=np.int64)
+    keys = stage_round_keys(stages, rows["round"])
+    order = np.argsort(keys, kind="stable")
+    keys, rows, stages = keys[order], rows[order], stages[order]
+
+    window = window_slice(keys, start_stage, end_stage)
+    keys, rows, stages = keys[window], rows[window], stages[window]
+
+    series_names = list(fields)
+    values = np.column_stack([rows[fields[name]] for name in series_names]) if rows.size else np.empty((0, 0))
+    kept = lttb_indices(values, max_points) if rows.size else np.arange(0)
+    keys, rows, stages = keys[kept], rows[kept], stages[kept]
+
+    stage_list = stages.tolist()
+    round_list = rows["round"].tolist()
+    labels = [stage_round_label(stage, round_num) for stage, round_num in zip(stage_list, round_list)]
+    columns = {name: rows[fields[name]].tolist() for name in series_names}
+
+    points = []
+    for i, (key, label) in enumerate(zip(keys.tolist(), labels)):
+        point = {"key": key, "stage": stage_list[i], "round": round_list[i], "stage_round": label}
+        for name in series_names:
+            point[name] = columns[name][i]
+        points.append(point)
+
+    return points, _ticks(stages, rows["round"], labels)
+
+
+def _ticks(stages: np.ndarray, rounds: np.ndarray, labels: Sequence[str]) -> List[str]:
+    """Labels of each stage's first shown point and of the TICK_ROUNDS points."""
+    if not len(labels):
+        return []
+    stage_starts = np.zeros(len(labels), dtype=bool)
+    stage_starts[np.unique(stages, return_index=True)[1]] = True
+    tick_mask = stage_starts | np.isin(rounds, TICK_ROUNDS)
+    return [label for label, is_tick in zip(labels, tick_mask.tolist()) if is_tick]
@@ -217,5 +217,6 @@ def demography_form() -> rx.Component:
         ),
         width="100%",  # rx.center takes full width to center its child
         height="100%",  # Make center take full height to better center vertically if needed
+        on_mount=DemographicState.ensure_data_loaded_for_user,  # Load saved data on the first visit only
         # style={"border": "1px solid red"} # Debugging: to see the bounds of rx.center
     )
@@ -1,10 +1,5 @@
 import reflex as rx
-from Trust_Web.public_goods_state import (
-    PublicGoodState,
-    TOTAL_ROUNDS,
-    NUM_COMPUTER_PLAYERS,
-    MULTIPLIER,
-)
+from Trust_Web.public_goods_state import PublicGoodState
 # from Trust_Web.trust_game_state import TrustGameState # Removed unused import
 from .common_styles import STYLES, primary_button, plum_button, COLORS 
 from .ui_helpers import GameSectionCard # Import the new component
@@ -14,20 +9,44 @@ def public_goods_game_component() -> rx.Component:
     """UI component for the Public Goods Game, refactored to use GameSectionCard."""
 
     header_extras_content = rx.text(
-        rx.text(f"{PublicGoodState.display_round_number} / {TOTAL_ROUNDS} 라운드", font_weight="bold"),
+        rx.text(f"{PublicGoodState.display_round_number} / {PublicGoodState.total_rounds} 라운드", font_weight="bold"),
         color_scheme="gray",
     )
 
+    # Multiplayer mode: no decision while waiting for the group to form or for the other members' decisions
+    can_submit = ~PublicGoodState.game_played & ~PublicGoodState.waiting_for_group & ~PublicGoodState.waiting_for_round
+
     game_content = [
         rx.text(
-            f"참가자: 당신을 포함해서 {NUM_COMPUTER_PLAYERS + 1}명",
+            f"참가자: 당신을 포함해서 {PublicGoodState.num_players}명",
             size="3",
             color_scheme="gray",
         ),
+        # Multiplayer mode: waiting for the group to form, or for the other members' decisions
+        rx.cond(
+            PublicGoodState.waiting_for_group,
+            rx.hstack(
+                rx.spinner(),
+                rx.text("다른 참가자들이 입장하기를 기다리고 있습니다...", size="3", color_scheme="gray"),
+                align_items="center",
+                justify="center",
+                width="100%",
+            ),
+        ),
+        rx.cond(
+            PublicGoodState.waiting_for_round,
+            rx.hstack(
+                rx.spinner(),
+                rx.text("다른 참가자들의 결정을 기다리고 있습니다...", size="3", color_scheme="gray"),
+                align_items="center",
+                justify="center",
+                width="100%",
+            ),
+        ),
         rx.cond(
             ~PublicGoodState.game_finished,
             rx.cond(
-                ~PublicGoodState.game_played,
+                can_submit,
                 rx.vstack(
                     rx.center(
                         rx.vstack(
@@ -75,7 +94,7 @@ def public_goods_game_component() -> rx.Component:
                 padding="2rem",
             ),
             rx.cond(
-                ~PublicGoodState.game_played,
+                can_submit,
                 primary_button(
                     "결정 제출",
                     on_click=[
@@ -162,6 +181,15 @@ def public_goods_game_component() -> rx.Component:
                     spacing="4",
                     padding_y="2",
                 ),
+                rx.cond(
+                    PublicGoodState.contribution_substituted,
+                    rx.text(
+                        "제한 시간 안에 결정하지 않아 컴퓨터가 대신 기부했습니다.",
+                        size="2",
+                        color_scheme="red",
+                        text_align="center",
+                    ),
+                ),
                 rx.divider(),
                 rx.vstack(
                     rx.text("이번 라운드 순수익", size="5", color_scheme="gray"),
@@ -199,8 +227,9 @@ def public_goods_game_component() -> rx.Component:
         icon_name="users",
         header_extras=header_extras_content,
         progress_value=PublicGoodState.display_round_number, # Use display_round_number (1-indexed)
-        progress_max=TOTAL_ROUNDS,
+        progress_max=PublicGoodState.total_rounds,
         *game_content, # Unpack children
         # Apply specific margin from the old rx.card if needed, otherwise defaults from GameSectionCard apply
-        margin_top="2em" # Keep the original margin_top
+        margin_top="2em", # Keep the original margin_top
+        on_mount=PublicGoodState.join_group,  # Joins the lobby in multiplayer mode only
     )
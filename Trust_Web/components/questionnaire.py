@@ -1,5 +1,6 @@
 import reflex as rx
 from ..questionnaire_state import QuestionnaireState
+from ..questionnaire_scoring import PACKED_MISSING
 from typing import List
 from ..components.common_styles import primary_button
 
@@ -89,10 +90,10 @@ def questionnaire_ui_component() -> rx.Component:
                     ),
                     rx.table.body(
                         rx.foreach(
-                            QuestionnaireState.current_items,
+                            QuestionnaireState.page_items,  # Only the current page is rendered
                             lambda item_text, item_idx: rx.table.row(
                                 rx.table.cell(
-                                    item_idx + 1,
+                                    QuestionnaireState.page_item_offset + item_idx + 1,
                                     style={**cell_style, "word_break": "break-word", "white_space": "pre-line"},
                                 ),
                                 rx.table.cell(
@@ -106,13 +107,14 @@ def questionnaire_ui_component() -> rx.Component:
                                 rx.table.cell(
                                     rx.radio(
                                         items=QuestionnaireState.current_likert_options_as_strings,
-                                        value=rx.cond(
-                                            QuestionnaireState.current_responses[item_idx].is_not_none(),
-                                            QuestionnaireState.current_responses[item_idx],
+                                        # Uncontrolled: the selection lives in the browser, clicks send no state back
+                                        default_value=rx.cond(
+                                            QuestionnaireState.answer_defaults[item_idx] != PACKED_MISSING,
+                                            QuestionnaireState.answer_defaults[item_idx],
                                             "",
                                         ),
                                         on_change=lambda selected_value: QuestionnaireState.set_response(
-                                            item_idx,
+                                            QuestionnaireState.page_item_offset + item_idx,
                                             selected_value,
                                         ),
                                         direction="row",
@@ -128,7 +130,8 @@ def questionnaire_ui_component() -> rx.Component:
                                     },
                                 ),
                             ),
-                        )
+                        ),
+                        key=QuestionnaireState.answers_revision,  # Remount the radios when new defaults arrive
                     ),
                     variant="surface",
                     size="2",
@@ -142,11 +145,37 @@ def questionnaire_ui_component() -> rx.Component:
                     },
                 ),
                 rx.spacer(height="2em"),
-                primary_button(
-                    "제출하기",
-                    on_click=lambda: QuestionnaireState.submit_questionnaire(),
-                    width="100%",
-                    color_scheme="orange",
+                rx.cond(
+                    QuestionnaireState.page_count > 1,
+                    rx.hstack(
+                        rx.button(
+                            "이전",
+                            on_click=QuestionnaireState.previous_page,
+                            disabled=QuestionnaireState.page_index == 0,
+                            variant="soft",
+                            color_scheme="orange",
+                        ),
+                        rx.text(f"{QuestionnaireState.page_index + 1} / {QuestionnaireState.page_count}"),
+                        rx.button(
+                            "다음",
+                            on_click=QuestionnaireState.next_page,
+                            disabled=QuestionnaireState.is_last_page,
+                            variant="soft",
+                            color_scheme="orange",
+                        ),
+                        justify="between",
+                        align="center",
+                        width="100%",
+                    ),
+                ),
+                rx.cond(
+                    QuestionnaireState.is_last_page,
+                    primary_button(
+                        "제출하기",
+                        on_click=lambda: QuestionnaireState.submit_questionnaire(),
+                        width="100%",
+                        color_scheme="orange",
+                    ),
                 ),
                 rx.cond(
                     QuestionnaireState.error_message != "",
@@ -173,6 +202,8 @@ def questionnaire_ui_component() -> rx.Component:
         padding="0.5em",  # Reduced padding a bit
         max_width="1000px",
         margin_x="auto",  # Center the vstack itself
+        on_mount=QuestionnaireState.ensure_responses_loaded,  # Load saved responses on the first visit only
+        on_unmount=QuestionnaireState.flush_drafts,  # Don't wait for the debounce when leaving the page
     )
 
 
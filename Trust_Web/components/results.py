@@ -41,6 +41,53 @@ def summary_card(
     )
 
 
+def raw_statistics_view() -> rx.Component:
+    """Full documents of the loaded game, one page at a time, as JSON."""
+    return rx.cond(
+        ResultsState.current_game_loaded != "",
+        rx.vstack(
+            rx.button(
+                "원본 데이터 보기",
+                on_click=ResultsState.load_raw_statistics_page,
+                variant="outline",
+            ),
+            rx.cond(
+                ResultsState.raw_statistics_page_num > 0,
+                rx.vstack(
+                    rx.hstack(
+                        rx.button(
+                            "이전",
+                            on_click=ResultsState.load_previous_raw_statistics_page,
+                            disabled=ResultsState.raw_statistics_page_num <= 1,
+                            size="1",
+                        ),
+                        rx.text(ResultsState.raw_statistics_page_num, " 페이지"),
+                        rx.button(
+                            "다음",
+                            on_click=ResultsState.load_next_raw_statistics_page,
+                            disabled=~ResultsState.has_next_raw_statistics_page,
+                            size="1",
+                        ),
+                        align_items="center",
+                        spacing="3",
+                    ),
+                    rx.code_block(
+                        ResultsState.formatted_statistics,
+                        language="json",
+                        width="100%",
+                    ),
+                    align_items="center",
+                    width="100%",
+                ),
+            ),
+            align_items="center",
+            spacing="4",
+            width="100%",
+            max_width="1000px",
+        ),
+    )
+
+
 def results_page() -> rx.Component:
     """UI for the experiment results page."""
     return rx.vstack(
@@ -428,6 +475,20 @@ def results_page() -> rx.Component:
                                     width="100%",
                                     max_width="1000px",
                                 ),
+                                # Stage filter for the charts below
+                                rx.hstack(
+                                    rx.text("스테이지", color_scheme="gray"),
+                                    rx.select(
+                                        ResultsState.tg_section2_stage_options,
+                                        value=ResultsState.tg_section2_stage_filter,
+                                        on_change=ResultsState.set_tg_section2_stage_filter,
+                                        size="2",
+                                    ),
+                                    align_items="center",
+                                    spacing="2",
+                                    width="100%",
+                                    justify_content="flex-end",
+                                ),
                                 rx.hstack(
                                     rx.box(
                                         rx.heading(
@@ -528,6 +589,7 @@ def results_page() -> rx.Component:
             width="100%",
             padding_x="2em",  # Add some horizontal padding to the tabs root
         ),
+        raw_statistics_view(),
         align="center",
         spacing="7",
         padding_top="2em",  # Reduced top padding for the main vstack
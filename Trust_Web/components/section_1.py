@@ -1,5 +1,5 @@
 import reflex as rx
-from Trust_Web.trust_game_state import TrustGameState, NUM_ROUNDS
+from Trust_Web.trust_game_state import TrustGameState
 from .common_styles import COLORS, STYLES, primary_button, plum_button
 from .ui_helpers import GameSectionCard # Import the new component
 
@@ -18,7 +18,7 @@ def section_1() -> rx.Component:
         icon_name="user",
         header_extras=header_extras_content,
         progress_value=TrustGameState.current_round, # Assuming current_round is 1-indexed
-        progress_max=NUM_ROUNDS,
+        progress_max=TrustGameState.num_rounds,
         # The vstack content from the original card becomes children here
         # The outer rx.card and its direct rx.vstack for layout are replaced by GameSectionCard
         # Specific card style props like width, margin_x, padding are now handled by GameSectionCard defaults
@@ -1,5 +1,5 @@
 import reflex as rx
-from Trust_Web.trust_game_state import TrustGameState, NUM_ROUNDS
+from Trust_Web.trust_game_state import TrustGameState
 from .common_styles import COLORS, STYLES, primary_button # Removed unused COLORS
 from .stage_transition import stage_transition
 from .ui_helpers import GameSectionCard # Import the new component
@@ -10,9 +10,7 @@ def section_2() -> rx.Component:
     balance = TrustGameState.player_a_balance
     max_send = TrustGameState.max_send_amount
     round_str = TrustGameState.round_str
-    # Assuming shuffled_profiles is populated and its length is the total number of stages.
-    # If TrustGameState.shuffled_profiles can be empty, add a check or ensure it's always populated before this page.
-    total_stages = TrustGameState.shuffled_profiles.length() # Access length of Var[List]
+    total_stages = TrustGameState.num_stages
     stage_info_text = rx.text(
         f" 상대 {TrustGameState.current_stage + 1} / {total_stages} - {round_str}",
         color_scheme="gray",
@@ -191,7 +189,7 @@ def section_2() -> rx.Component:
         icon_name="user", # Or "users"
         header_extras=stage_info_text,
         progress_value=TrustGameState.current_round,
-        progress_max=NUM_ROUNDS,
+        progress_max=TrustGameState.num_rounds,
         *game_content, # Unpack the list of children
         # Apply the specific styling from the old rx.box to this GameSectionCard instance
         style={
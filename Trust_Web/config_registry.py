@@ -0,0 +1,300 @@
+"""
+Process-wide, read-only registry of the experiment configuration in profiles/.
+
+The TOML files are compiled together into a versioned snapshot of frozen
+structures (tables become MappingProxyType, arrays become tuples) shared by
+every session. Session state keeps only keys into it, such as a questionnaire
+or profile name, plus the version it is pinned to.
+
+The registry watches the files' modification times: when one changes, a new
+snapshot is compiled and swapped in atomically. Sessions pinned to an older
+version keep reading it; new sessions get the new one without a restart.
+
+Every version's files are also archived under CONFIG_ARCHIVE_DIR by their
+content hash, so a version that is no longer in memory (after a restart, on
+another worker sharing the directory, or evicted beyond MAX_SNAPSHOTS) is
+recompiled from its archived copy. A version that cannot be found there falls
+back to the latest one, logged and counted in
+trust_web_config_version_fallbacks_total.
+"""
+
+import asyncio
+import collections
+import contextlib
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Set, Tuple
+
+import toml
+
+from .metrics import REGISTRY, Counter
+
+logger = logging.getLogger(__name__)
+
+PROFILES_DIR: Path = Path(__file__).parent / "profiles"
+
+# Content-hashed copies of every version's files, <version>/<file name>
+CONFIG_ARCHIVE_DIR = Path(
+    os.getenv("TRUST_WEB_CONFIG_ARCHIVE", str(Path(__file__).parent.parent / "config_versions"))
+)
+
+# Compiled versions kept in memory; older ones are recompiled from the archive when a session reads them
+MAX_SNAPSHOTS = 16
+
+# Registry name -> TOML file in PROFILES_DIR
+CONFIG_FILES: Dict[str, str] = {
+    "personalities": "personalities.toml",
+    "game_rules": "game_rules.toml",
+    "questionnaires": "questionnaires.toml",
+    "experiment": "experiment.toml",
+}
+
+# How often the backend checks profiles/ for edited files
+CONFIG_POLL_SECONDS = 2.0
+
+VERSION_FALLBACKS = REGISTRY.register(
+    Counter(
+        "trust_web_config_version_fallbacks_total",
+        "Reads of a pinned config version that is neither loaded nor archived, served from the latest version.",
+    )
+)
+
+
+def freeze(value: Any) -> Any:
+    """Recursively converts dicts to read-only mappings and lists to tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Mutable plain copy of a frozen value, for Firestore documents and frontend vars."""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """One compiled version of every configuration file."""
+
+    version: str  # Content hash of the files, stable across restarts
+    configs: Mapping[str, Mapping[str, Any]]
+
+    def get(self, name: str) -> Mapping[str, Any]:
+        return self.configs[name]
+
+
+class ConfigRegistry:
+    """Compiles the configuration files into snapshots and swaps in new versions when they change."""
+
+    def __init__(
+        self,
+        profiles_dir: Path = PROFILES_DIR,
+        files: Dict[str, str] = CONFIG_FILES,
+        archive_dir: Optional[Path] = CONFIG_ARCHIVE_DIR,
+    ):
+        self.profiles_dir = profiles_dir
+        self.files = dict(files)
+        self.archive_dir = archive_dir
+        self._current: Optional[ConfigSnapshot] = None
+        # Least recently read first, at most MAX_SNAPSHOTS
+        self._snapshots: "collections.OrderedDict[str, ConfigSnapshot]" = collections.OrderedDict()
+        self._missing: Set[str] = set()  # Versions already warned about
+        self._stamp: Optional[Tuple] = None
+        self._lock = threading.Lock()
+
+    def _file_stamp(self) -> Tuple:
+        """(name, mtime, size) of every file; a change in any of them triggers a recompile."""
+        stamp = []
+        for name, file_name in self.files.items():
+            try:
+                stat = (self.profiles_dir / file_name).stat()
+                stamp.append((name, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamp.append((name, None, None))
+        return tuple(stamp)
+
+    def _compile(self, directory: Path) -> Tuple[ConfigSnapshot, Dict[str, bytes]]:
+        """Snapshot of the files in directory, and their raw contents."""
+        digest = hashlib.sha1()
+        configs = {}
+        raws = {}
+        for name, file_name in self.files.items():
+            raw = raws[file_name] = (directory / file_name).read_bytes()
+            digest.update(name.encode() + b"\0" + raw + b"\0")
+            configs[name] = freeze(toml.loads(raw.decode("utf-8")))
+        return ConfigSnapshot(version=digest.hexdigest()[:12], configs=MappingProxyType(configs)), raws
+
+    def _archive(self, version: str, raws: Dict[str, bytes]) -> None:
+        """Keeps a copy of the version's files; written to a temporary name first, so readers never see a partial copy."""
+        if self.archive_dir is None or (self.archive_dir / version).is_dir():
+            return
+        try:
+            staging = self.archive_dir / f".{version}.{os.getpid()}"
+            staging.mkdir(parents=True, exist_ok=True)
+            for file_name, raw in raws.items():
+                (staging / file_name).write_bytes(raw)
+            os.replace(staging, self.archive_dir / version)
+        except OSError as e:
+            logger.warning("Could not archive config version %s: %s", version, e)
+
+    def _load_archived(self, version: str) -> Optional[ConfigSnapshot]:
+        if self.archive_dir is None or not (self.archive_dir / version).is_dir():
+            return None
+        try:
+            snapshot, _ = self._compile(self.archive_dir / version)
+        except Exception as e:
+            logger.error("Archived config version %s is unreadable: %s: %s", version, type(e).__name__, e)
+            return None
+        if snapshot.version != version:
+            logger.error("Archived config version %s hashes to %s, ignoring it", version, snapshot.version)
+            return None
+        logger.info("Loaded config version %s from the archive", version)
+        return snapshot
+
+    def _remember(self, snapshot: ConfigSnapshot) -> None:
+        """Adds snapshot to the in-memory versions, evicting the least recently read one beyond MAX_SNAPSHOTS."""
+        self._snapshots[snapshot.version] = snapshot
+        self._snapshots.move_to_end(snapshot.version)
+        while len(self._snapshots) > MAX_SNAPSHOTS:
+            self._snapshots.popitem(last=False)
+
+    def reload(self) -> bool:
+        """Recompiles the configuration if a file changed since the last check.
+
+        A file that fails to parse keeps the previous version in service.
+
+        Returns:
+            True if a new version was swapped in
+
+        Raises:
+            FileNotFoundError, toml.TomlDecodeError: If the very first compile fails
+        """
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        with self._lock:
+            if stamp == self._stamp:
+                return False
+            try:
+                snapshot, raws = self._compile(self.profiles_dir)
+            except Exception as e:
+                if self._current is None:
+                    raise
+                logger.error("Keeping version %s, reload failed: %s: %s", self._current.version, type(e).__name__, e)
+                self._stamp = stamp
+                return False
+            self._stamp = stamp
+            if self._current is not None and snapshot.version == self._current.version:
+                return False
+            self._archive(snapshot.version, raws)
+            self._remember(snapshot)
+            self._current = snapshot  # Atomic swap: readers see either the old or the new snapshot
+        logger.info("Loaded config version %s from %s", snapshot.version, self.profiles_dir)
+        return True
+
+    def current(self) -> ConfigSnapshot:
+        """The latest compiled snapshot, compiling it on first use."""
+        if self._current is None:
+            self.reload()
+        return self._current
+
+    def find(self, version: str) -> Optional[ConfigSnapshot]:
+        """The snapshot of version from memory or the archive, None if it is unknown."""
+        with self._lock:
+            snapshot = self._snapshots.get(version)
+            if snapshot is not None:
+                self._snapshots.move_to_end(version)
+                return snapshot
+            snapshot = self._load_archived(version)
+            if snapshot is not None:
+                self._remember(snapshot)
+            return snapshot
+
+    def has_version(self, version: str) -> bool:
+        return self.find(version) is not None
+
+    def snapshot(self, version: Optional[str] = None) -> ConfigSnapshot:
+        """The snapshot of version, or the latest one if version is None or unknown (logged and counted)."""
+        current = self.current()
+        if not version or version == current.version:
+            return current
+        snapshot = self.find(version)
+        if snapshot is not None:
+            return snapshot
+        VERSION_FALLBACKS.inc()
+        if version not in self._missing:
+            self._missing.add(version)
+            logger.warning("Config version %s is unknown, serving version %s instead", version, current.version)
+        return current
+
+    def get(self, name: str, version: Optional[str] = None) -> Mapping[str, Any]:
+        """Returns the frozen configuration registered under name.
+
+        Args:
+            name: A key of CONFIG_FILES
+            version: The pinned version to read, None for the latest
+
+        Returns:
+            The parsed file as a read-only mapping
+
+        Raises:
+            KeyError: If name is not a registered configuration
+            FileNotFoundError: If a file is missing when first compiled
+            toml.TomlDecodeError: If a file is not valid TOML when first compiled
+        """
+        return self.snapshot(version).get(name)
+
+
+_registry = ConfigRegistry()
+
+
+def get_config(name: str, version: Optional[str] = None) -> Mapping[str, Any]:
+    """Returns the process-wide frozen configuration registered under name."""
+    return _registry.get(name, version)
+
+
+def get_config_snapshot(version: Optional[str] = None) -> ConfigSnapshot:
+    """Returns the snapshot of version (the latest one if None or unknown), e.g. to key derived caches."""
+    return _registry.snapshot(version)
+
+
+def is_config_version_available(version: str) -> bool:
+    """Whether version can still be read, from memory or the archive."""
+    return _registry.has_version(version)
+
+
+def current_config_version() -> str:
+    """Version new sessions are pinned to."""
+    return _registry.current().version
+
+
+@contextlib.asynccontextmanager
+async def config_watcher_lifespan():
+    """Backend lifespan task polling profiles/ and swapping in edited configuration."""
+
+    async def watch():
+        while True:
+            await asyncio.sleep(CONFIG_POLL_SECONDS)
+            try:
+                await asyncio.to_thread(_registry.reload)
+            except Exception as e:
+                logger.exception("Config watch error: %s", e)
+
+    task = asyncio.create_task(watch())
+    try:
+        yield
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
@@ -0,0 +1,34 @@
+"""
+State mixin pinning a session to one version of the experiment configuration.
+"""
+
+import logging
+from typing import Any, Mapping
+
+import reflex as rx
+
+from .config_registry import current_config_version, get_config
+
+logger = logging.getLogger(__name__)
+
+
+class PinnedConfigMixin(rx.State, mixin=True):
+    """Reads configuration from the version the session started with.
+
+    Until _pin_config is called the latest version is read.
+    """
+
+    _config_version: str = ""
+
+    def _config(self, name: str) -> Mapping[str, Any]:
+        return get_config(name, self._config_version or None)
+
+    def _pin_config(self):
+        """Pins the session to the latest version, unless it is already pinned."""
+        if not self._config_version:
+            self._config_version = current_config_version()
+            logger.debug("%s pinned to config version %s", type(self).__name__, self._config_version)
+
+    def _unpin_config(self):
+        """Lets the next _pin_config pick up the latest version, e.g. when a game restarts."""
+        self._config_version = ""
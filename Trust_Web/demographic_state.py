@@ -1,14 +1,20 @@
+import asyncio
 import reflex as rx
 from typing import List, Dict, Any, Optional
 import datetime
+import logging
 
 # Assuming firebase_db.py is in the same directory (Trust_Web)
-from .firebase_db import save_experiment_data, get_user_demographics_data
+from .firebase_db import save_experiment_data, get_user_demographics_data, BASIC_INFO_COLLECTION, DEMOGRAPHICS_DOC
+from .identity_state import IdentityState
+from .state_store import CompactStateMixin
+from .app_logging import HOT_PATH
 
+logger = logging.getLogger(__name__)
 
-class DemographicState(rx.State):
-    user_id: str = ""  # Firebase localId, to be set by AuthState
-    user_email: str = ""  # User's email, to be set by AuthState
+
+class DemographicState(CompactStateMixin, rx.State):
+    _demographics_loaded_for: str = ""  # user_id whose saved demographics are loaded, "" before the first visit
     demographics_doc_id: Optional[str] = None  # Firestore document ID for this user's demographics
 
     # Options for past_diagnoses - this remains as it's used for rendering in the form
@@ -36,74 +42,58 @@ class DemographicState(rx.State):
         # To ensure reactivity, especially if nested, reassign if necessary
         # For simple key-value updates at the top level, this should be fine.
         # If issues persist, consider self.demographics_data = self.demographics_data.copy()
-        print(f"[DEMOGRAPHIC_STATE] Updated field '{field_name}' to: {value}")
+        logger.debug("Updated field '%s'", field_name, extra=HOT_PATH)
 
-    @rx.event
-    def set_user_identity(self, user_id: str, user_email: str):
-        """Sets the user ID and email, then loads existing demographic data."""
-        print(f"[DEMOGRAPHIC_STATE] set_user_identity called with: id='{user_id}', email='{user_email}'")
-        self.user_id = user_id
-        self.user_email = user_email
-        self.error_message = ""
-        self.demographics_data = {}  # Reset data before loading
-        self.demographics_doc_id = None  # Reset doc_id
-
-        if self.user_id:
-            self._load_demographics_from_firebase()
-        else:
-            print("[DEMOGRAPHIC_STATE] User ID is not set, cannot load demographics.")
-
-    def _load_demographics_from_firebase(self):
-        """Loads demographic data for the current user_id from Firebase."""
-        print(f"[DEMOGRAPHIC_STATE] Attempting to load demographics for user: {self.user_id}")
-        data_with_doc_id = get_user_demographics_data(self.user_id)
+    def _load_demographics_from_firebase(self, user_id: str):
+        """Loads demographic data for user_id from Firebase."""
+        data_with_doc_id = get_user_demographics_data(user_id)
         if data_with_doc_id:
             self.demographics_data = data_with_doc_id.get("data", {})
-            print(f"[DEMOGRAPHIC_STATE] Loaded demographics for user {self.user_id}, doc_id: {data_with_doc_id.get('doc_id')}")
+            logger.debug("Loaded saved demographics", extra={"user_id": user_id})
         else:
-            print(f"[DEMOGRAPHIC_STATE] No existing demographic data found for user: {self.user_id}")
+            logger.debug("No saved demographics", extra={"user_id": user_id})
             self.demographics_data = {}  # Ensure it's empty if nothing found
 
     @rx.event
-    def handle_submit(self, form_data: dict):
+    async def handle_submit(self, form_data: dict):
         """Handle the form submit, add user info, and save to Firebase."""
-        print(f"[DEMOGRAPHIC_STATE] handle_submit called. Raw form_data: {form_data}")
-        if not self.user_id or not self.user_email:
+        identity = await self.get_state(IdentityState)
+        if not identity.user_id or not identity.user_email:
             self.error_message = "User not properly identified. Cannot save demographics."
-            print(f"[DEMOGRAPHIC_STATE] Error in submit: User ID ('{self.user_id}') or Email ('{self.user_email}') is not set.")
+            logger.warning("Demographics submitted without a signed-in participant")
             return
 
         # Prepare data to save
         self.demographics_data = form_data.copy()  # Start with the submitted form data
-        self.demographics_data["user_id"] = self.user_id  # For querying
-        self.demographics_data["user_email"] = self.user_email  # Storing the email
+        self.demographics_data["user_id"] = identity.user_id  # For querying
+        self.demographics_data["user_email"] = identity.user_email  # Storing the email
         self.demographics_data["game_name"] = "demographics_data"  # For Firestore doc naming
         # 'timestamp' will be added by save_experiment_data using server timestamp
 
-        print(f"[DEMOGRAPHIC_STATE] Data being sent to Firebase: {self.demographics_data}")
-
         try:
-            save_experiment_data(self.user_id, self.demographics_data)
+            await asyncio.to_thread(
+                save_experiment_data,
+                identity.user_id, BASIC_INFO_COLLECTION, self.demographics_data, document_id=DEMOGRAPHICS_DOC
+            )
             self.error_message = "Demographics saved successfully!"
-            print(f"[DEMOGRAPHIC_STATE] Demographics data saved for user {self.user_id}.")
+            logger.info("Demographics saved", extra={"user_id": identity.user_id})
             return rx.redirect("/app/questionnaire")  # Navigate to questionnaire page
         except Exception as e:
             self.error_message = f"Failed to save demographics: {str(e)}"
-            print(f"[DEMOGRAPHIC_STATE] Error saving demographics: {e}")
+            logger.exception("Error saving demographics: %s", e)
 
-    # Method to allow AuthState to trigger data loading without direct UI interaction
-    # This is useful if the demographics page is visited and user identity is already known.
+    # Called when the demographics page mounts, so data is only fetched once a participant visits it
     @rx.event
-    def ensure_data_loaded_for_user(self):
-        if self.user_id and not self.demographics_data:
-            print(
-                f"[DEMOGRAPHIC_STATE] ensure_data_loaded_for_user: User ID {self.user_id} present, data empty. Attempting load."
-            )
-            self._load_demographics_from_firebase()
-        elif not self.user_id:
-            print("[DEMOGRAPHIC_STATE] ensure_data_loaded_for_user: No User ID.")
-        else:
-            print("[DEMOGRAPHIC_STATE] ensure_data_loaded_for_user: Data already present or User ID missing.")
+    async def ensure_data_loaded_for_user(self):
+        identity = await self.get_state(IdentityState)
+        if not identity.user_id:
+            logger.debug("ensure_data_loaded_for_user: no user ID")
+        elif self._demographics_loaded_for != identity.user_id:
+            logger.debug("First demographics visit, loading saved data", extra={"user_id": identity.user_id})
+            self._demographics_loaded_for = identity.user_id
+            self.error_message = ""
+            self.demographics_doc_id = None
+            self._load_demographics_from_firebase(identity.user_id)
 
     # Removed individual state variables:
     # gender: Optional[str] = None
@@ -129,19 +119,6 @@ class DemographicState(rx.State):
 
     # Removed submit_demographics as it's replaced by handle_submit
 
-    # Event handler for auth.set_user_identity
-    @rx.event_handler("auth.set_user_identity")
-    def handle_set_user_identity(self, payload: dict):
-        """Handles the set_user_identity event emitted by AuthState."""
-        user_id = payload.get("user_id")
-        user_email = payload.get("user_email")
-        if user_id is not None and user_email is not None:
-            print(f"[DemographicState] Received set_user_identity event. User ID: {user_id}, Email: {user_email}")
-            # Call the existing set_user_identity method which also handles loading data
-            self.set_user_identity(user_id, user_email)
-        else:
-            print("[DemographicState] Error: Received set_user_identity event with missing user_id or user_email.")
-
 
 # Example of how to display the submitted data (could be on another page or part of the UI)
 # def display_submitted_data() -> rx.Component:
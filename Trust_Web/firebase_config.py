@@ -1,99 +1,256 @@
 """
 This file is used to configure the Firebase API key and authentication
 for user login and signup.
+
+Requests go through one shared async HTTP client, so logins reuse pooled
+keep-alive connections and never block the Reflex event loop.
+
+Setting FIREBASE_AUTH_EMULATOR_HOST (host:port) sends every auth request to
+the Firebase Auth emulator or to Trust_Web.local_auth_server instead, in which
+case no real API key is needed.
 """
 
+import asyncio
+import contextlib
 from dotenv import load_dotenv
-import requests
+import httpx
+import logging
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 # Load environment variables
 load_dotenv()
 
-# Get Firebase API Key for authentication
+logger = logging.getLogger(__name__)
+
+# Get Firebase API Key for authentication; checked when the auth client is first created
 FIREBASE_API_KEY = os.getenv("FIREBASE_API_KEY")
-if not FIREBASE_API_KEY:
-    raise ValueError("Missing required Firebase configuration: FIREBASE_API_KEY")
 
+# host:port of a local auth backend (Firebase emulator or Trust_Web.local_auth_server)
+FIREBASE_AUTH_EMULATOR_HOST = os.getenv("FIREBASE_AUTH_EMULATOR_HOST", "")
+EMULATOR_API_KEY = "fake-api-key"
 
-def sign_in_with_email_and_password(email: str, password: str) -> Dict[str, Any]:
-    """Sign in with email and password using Firebase Authentication REST API.
+IDENTITY_TOOLKIT_URL = "https://identitytoolkit.googleapis.com/v1"
+SECURE_TOKEN_URL = "https://securetoken.googleapis.com/v1"
 
-    Args:
-        email: User's email address
-        password: User's password
+# HTTP client tuning for the auth endpoints
+AUTH_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+AUTH_POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0)
+AUTH_MAX_RETRIES = 2
+AUTH_RETRY_BACKOFF_SECONDS = 0.3
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
 
-    Returns:
-        Dictionary containing user data and ID token
 
-    Raises:
-        Exception: If authentication fails
-    """
-    try:
-        # Verify the credentials using Firebase REST API
-        sign_in_url: str = (
-            f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={FIREBASE_API_KEY}"
-        )
-        sign_in_data: Dict[str, Any] = {
-            "email": email,
-            "password": password,
-            "returnSecureToken": True,
-        }
+class FirebaseAuthError(Exception):
+    """Raised when Firebase rejects an auth request; code is the Firebase error message (e.g. EMAIL_NOT_FOUND)."""
 
-        response: requests.Response = requests.post(sign_in_url, json=sign_in_data)
-        response.raise_for_status()  # Raise exception for bad status codes
+    def __init__(self, message: str, code: str = ""):
+        super().__init__(message)
+        self.code = code
 
-        # Return the user data and tokens
-        return response.json()
 
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 400:
-            error_data: Dict[str, Any] = e.response.json()
-            error_message: str = error_data.get("error", {}).get("message", "Authentication failed")
+class FirebaseAuthClient:
+    """Async client for the Firebase Authentication REST API with a shared keep-alive pool."""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = IDENTITY_TOOLKIT_URL,
+        token_url: str = SECURE_TOKEN_URL,
+        timeout: httpx.Timeout = AUTH_TIMEOUT,
+        limits: httpx.Limits = AUTH_POOL_LIMITS,
+        max_retries: int = AUTH_MAX_RETRIES,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.token_url = token_url
+        self.max_retries = max_retries
+        self._http = httpx.AsyncClient(timeout=timeout, limits=limits, transport=transport)
+
+    async def _post(self, url: str, idempotent: bool, **request_kwargs) -> httpx.Response:
+        """POSTs to a Firebase Auth endpoint, retrying transient failures.
+
+        Non-idempotent requests (sign-up) are only retried when the request
+        cannot have reached the server (connection errors, 429/503).
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._http.post(url, params={"key": self.api_key}, **request_kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if attempt == self.max_retries:
+                    raise
+            except httpx.TransportError:
+                if not idempotent or attempt == self.max_retries:
+                    raise
+            else:
+                retryable = response.status_code in RETRYABLE_STATUS_CODES and (
+                    idempotent or response.status_code in (429, 503)
+                )
+                if not retryable or attempt == self.max_retries:
+                    return response
+            await asyncio.sleep(AUTH_RETRY_BACKOFF_SECONDS * 2**attempt)
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def _error_code(response: httpx.Response) -> str:
+        try:
+            return response.json().get("error", {}).get("message", "")
+        except ValueError:
+            return ""
+
+    async def sign_in_with_email_and_password(self, email: str, password: str) -> Dict[str, Any]:
+        """Sign in with email and password using Firebase Authentication REST API.
+
+        Args:
+            email: User's email address
+            password: User's password
+
+        Returns:
+            Dictionary containing user data and ID token
+
+        Raises:
+            FirebaseAuthError: If authentication fails
+        """
+        try:
+            response = await self._post(
+                f"{self.base_url}/accounts:signInWithPassword",
+                idempotent=True,
+                json={"email": email, "password": password, "returnSecureToken": True},
+            )
+        except httpx.HTTPError as e:
+            raise FirebaseAuthError(f"Authentication error: {str(e)}") from e
+
+        if response.status_code == 400:
+            error_message = self._error_code(response) or "Authentication failed"
             if "INVALID_PASSWORD" in error_message:
-                raise Exception("Invalid password")
+                raise FirebaseAuthError("Invalid password", error_message)
             elif "EMAIL_NOT_FOUND" in error_message:
-                raise Exception("User not found")
-            else:
-                raise Exception(f"Authentication error: {error_message}")
-        raise Exception(f"Authentication error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Authentication error: {str(e)}")
+                raise FirebaseAuthError("User not found", error_message)
+            raise FirebaseAuthError(f"Authentication error: {error_message}", error_message)
+        if response.is_error:
+            raise FirebaseAuthError(f"Authentication error: HTTP {response.status_code}", self._error_code(response))
+
+        # Return the user data and tokens
+        return response.json()
+
+    async def create_user_with_email_and_password(self, email: str, password: str) -> Dict[str, Any]:
+        """Create a new user with email and password using Firebase REST API.
 
+        Args:
+            email: User's email address
+            password: User's password
 
-def create_user_with_email_and_password(email: str, password: str) -> Dict[str, Any]:
-    """Create a new user with email and password using Firebase REST API.
+        Returns:
+            Dictionary containing user data
 
-    Args:
-        email: User's email address
-        password: User's password
+        Raises:
+            FirebaseAuthError: If user creation fails
+        """
+        try:
+            response = await self._post(
+                f"{self.base_url}/accounts:signUp",
+                idempotent=False,
+                json={"email": email, "password": password, "returnSecureToken": True},
+            )
+        except httpx.HTTPError as e:
+            raise FirebaseAuthError(f"Error creating user: {str(e)}") from e
 
-    Returns:
-        Dictionary containing user data
+        if response.status_code == 400:
+            error_message = self._error_code(response) or "User creation failed"
+            raise FirebaseAuthError(f"Error creating user: {error_message}", error_message)
+        if response.is_error:
+            raise FirebaseAuthError(f"Error creating user: HTTP {response.status_code}", self._error_code(response))
+
+        return response.json()
+
+    async def refresh_id_token(self, refresh_token: str) -> Dict[str, Any]:
+        """Exchange a refresh token for a new ID token using the secure token endpoint.
+
+        Args:
+            refresh_token: The refreshToken from a sign-in or an earlier refresh
+
+        Returns:
+            Dictionary with id_token, refresh_token, expires_in and user_id
+
+        Raises:
+            FirebaseAuthError: If the refresh fails; code is e.g. TOKEN_EXPIRED or INVALID_REFRESH_TOKEN
+        """
+        try:
+            response = await self._post(
+                f"{self.token_url}/token",
+                idempotent=True,
+                data={"grant_type": "refresh_token", "refresh_token": refresh_token},
+            )
+        except httpx.HTTPError as e:
+            raise FirebaseAuthError(f"Token refresh error: {str(e)}") from e
+
+        if response.is_error:
+            error_message = self._error_code(response) or f"HTTP {response.status_code}"
+            raise FirebaseAuthError(f"Token refresh error: {error_message}", error_message)
+
+        return response.json()
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+_auth_client: Optional[FirebaseAuthClient] = None
+
+
+def create_auth_client() -> FirebaseAuthClient:
+    """Creates the auth client for the configured backend.
 
     Raises:
-        Exception: If user creation fails
+        ValueError: If no emulator host is set and FIREBASE_API_KEY is missing
+    """
+    if FIREBASE_AUTH_EMULATOR_HOST:
+        emulator_url = f"http://{FIREBASE_AUTH_EMULATOR_HOST}"
+        logger.info("Using local auth backend at %s", emulator_url)
+        return FirebaseAuthClient(
+            FIREBASE_API_KEY or EMULATOR_API_KEY,
+            base_url=f"{emulator_url}/identitytoolkit.googleapis.com/v1",
+            token_url=f"{emulator_url}/securetoken.googleapis.com/v1",
+        )
+    if not FIREBASE_API_KEY:
+        raise ValueError("Missing required Firebase configuration: FIREBASE_API_KEY")
+    return FirebaseAuthClient(FIREBASE_API_KEY)
+
+
+def get_auth_client() -> FirebaseAuthClient:
+    """Returns the process-wide auth client, creating it on first use."""
+    global _auth_client
+    if _auth_client is None:
+        _auth_client = create_auth_client()
+    return _auth_client
+
+
+def set_auth_client(client: Optional[FirebaseAuthClient]) -> None:
+    """Replaces the process-wide auth client, e.g. with one bound to an in-process backend.
+
+    The previous client is not closed; None makes the next call create the configured one.
     """
+    global _auth_client
+    _auth_client = client
+
+
+@contextlib.asynccontextmanager
+async def auth_client_lifespan():
+    """Backend lifespan task closing the pooled auth connections on shutdown."""
+    global _auth_client
     try:
-        # Create user using Firebase REST API
-        sign_up_url: str = f"https://identitytoolkit.googleapis.com/v1/accounts:signUp?key={FIREBASE_API_KEY}"
-        sign_up_data: Dict[str, Any] = {
-            "email": email,
-            "password": password,
-            "returnSecureToken": True,
-        }
+        yield
+    finally:
+        if _auth_client is not None:
+            await _auth_client.aclose()
+            _auth_client = None
 
-        response: requests.Response = requests.post(sign_up_url, json=sign_up_data)
-        response.raise_for_status()
 
-        return response.json()
+async def sign_in_with_email_and_password(email: str, password: str) -> Dict[str, Any]:
+    """Sign in with email and password, see FirebaseAuthClient.sign_in_with_email_and_password."""
+    return await get_auth_client().sign_in_with_email_and_password(email, password)
+
 
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 400:
-            error_data: Dict[str, Any] = e.response.json()
-            error_message: str = error_data.get("error", {}).get("message", "User creation failed")
-            raise Exception(f"Error creating user: {error_message}")
-        raise Exception(f"Error creating user: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Error creating user: {str(e)}")
+async def create_user_with_email_and_password(email: str, password: str) -> Dict[str, Any]:
+    """Create a new user, see FirebaseAuthClient.create_user_with_email_and_password."""
+    return await get_auth_client().create_user_with_email_and_password(email, password)
@@ -4,26 +4,53 @@ experiment data.
 """
 
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, BinaryIO
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from google.api_core import exceptions as gapi_exceptions
+from google.auth import exceptions as google_auth_exceptions
 from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
 
 # from google.cloud.firestore_v1.types import Timestamp # Removed problematic import
 from datetime import datetime  # Standard datetime
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
 from dotenv import load_dotenv
 import traceback  # For detailed error logging
+
+from .app_logging import HOT_PATH
+from .metrics import FIRESTORE_ERRORS, instrument_firestore_call
 # from Trust_Web.firebase_config import app_env # Removed this import as FIREBASE_ENABLED checks are removed
 # from Trust_Web.authentication import AuthState # Removed unused import
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+# Setting FIRESTORE_EMULATOR_HOST (host:port) sends every read and write to a local Firestore emulator,
+# e.g. for load tests (see load_test.py); no service account is needed then
+FIRESTORE_EMULATOR_HOST = os.getenv("FIRESTORE_EMULATOR_HOST", "")
+EMULATOR_PROJECT_ID = "trust-web-local"
+
 
 # Initialize Firestore client
 def init_firebase_client() -> firestore.Client:
     """Initialize and return Firestore client with credentials."""
+    if FIRESTORE_EMULATOR_HOST:
+        logger.info("Using the Firestore emulator at %s", FIRESTORE_EMULATOR_HOST)
+        return firestore.Client(
+            project=os.getenv("GOOGLE_CLOUD_PROJECT", EMULATOR_PROJECT_ID), credentials=AnonymousCredentials()
+        )
     credentials_path = Path(__file__).parent.parent / "secret" / "trustweb.json"
-    print(credentials_path)
+    logger.info("Using Firestore credentials %s", credentials_path)
 
     try:
         credentials = service_account.Credentials.from_service_account_file(
@@ -31,7 +58,7 @@ def init_firebase_client() -> firestore.Client:
         )
         return firestore.Client(credentials=credentials)
     except Exception as e:
-        print(f"Error initializing Firestore: {e}")
+        logger.exception("Error initializing Firestore: %s", e)
         raise
 
 
@@ -47,6 +74,9 @@ BASIC_INFO_COLLECTION = "basic_info"
 DEMOGRAPHICS_DOC = "demographic_data"
 PUBLIC_GOODS_GAME_COLLECTION = "public_goods_game"
 SECTION_DOC_PREFIX = "section"
+SESSION_COLLECTION = "session"
+TRUST_GAME_CHECKPOINT_DOC = "trust_game_checkpoint"
+QUESTIONNAIRE_SUBMITTED_STATUS = "submitted"  # "status" of a submitted questionnaire, "draft" before
 # --- End Firestore Names ---
 
 # --- Path Helper Functions ---
@@ -71,55 +101,164 @@ def _get_questionnaire_collection_ref(user_id: str) -> firestore.CollectionRefer
 def _get_demographics_doc_ref(user_id: str) -> firestore.DocumentReference:
     """Returns the document reference for demographic_data under basic_info for a user."""
     return _get_user_doc_ref(user_id).collection(BASIC_INFO_COLLECTION).document(DEMOGRAPHICS_DOC)
+
+def _get_checkpoint_doc_ref(user_id: str) -> firestore.DocumentReference:
+    """Returns the document reference for the trust game checkpoint of a user."""
+    return _get_user_doc_ref(user_id).collection(SESSION_COLLECTION).document(TRUST_GAME_CHECKPOINT_DOC)
 # --- End Path Helper Functions ---
 
 
 # Helper function to convert datetime objects to ISO strings
 # and recursively process nested dicts/lists.
+# Copy-on-write: a container is only rebuilt if something inside it was converted,
+# otherwise the very same object is returned, so datetime-free documents are not copied.
 def _convert_value(value):
     # Removed FirestoreDatetime check, relying on standard datetime
     if isinstance(value, datetime):
         return value.isoformat()
     if isinstance(value, dict):
-        return {k: _convert_value(v) for k, v in value.items()}
+        converted = None
+        for k, v in value.items():
+            new_v = _convert_value(v)
+            if new_v is not v:
+                if converted is None:
+                    converted = dict(value)
+                converted[k] = new_v
+        return value if converted is None else converted
     if isinstance(value, list):
-        return [_convert_value(item) for item in value]
+        converted = None
+        for i, item in enumerate(value):
+            new_item = _convert_value(item)
+            if new_item is not item:
+                if converted is None:
+                    converted = list(value)
+                converted[i] = new_item
+        return value if converted is None else converted
     return value
 
 
+def _snapshot_data(doc_snapshot) -> Optional[dict]:
+    """Returns the decoded fields of a snapshot, None if the document does not exist.
+
+    to_dict() deep-copies the fields. That copy is a deliberate trade-off: avoiding
+    it would mean reading the snapshot's private _data, which the client may change.
+    """
+    if not getattr(doc_snapshot, "exists", True):
+        return None
+    return doc_snapshot.to_dict()
+
+
 # Helper function to process a document snapshot
 # Always returns a dict with 'id' and 'data' keys for compatibility
 def _process_doc_snapshot(doc_snapshot):
     # If it's a Firestore DocumentSnapshot (has .id and .to_dict())
     if hasattr(doc_snapshot, "id") and hasattr(doc_snapshot, "to_dict"):
-        data = doc_snapshot.to_dict()
-        processed_data = (
-            {key: _convert_value(value) for key, value in data.items()} if data else {}
-        )
+        data = _snapshot_data(doc_snapshot)
+        processed_data = _convert_value(data) if data else {}
         return {"id": doc_snapshot.id, "data": processed_data}
     # If it's already a dict (e.g., from .to_dict()), wrap it
     elif isinstance(doc_snapshot, dict):
-        processed_data = (
-            {key: _convert_value(value) for key, value in doc_snapshot.items()}
-            if doc_snapshot
-            else {}
-        )
+        processed_data = _convert_value(doc_snapshot) if doc_snapshot else {}
         return {"id": None, "data": processed_data}
     # If None or unknown type, return empty
     else:
         return {"id": None, "data": {}}
 
 
+# --- Save pipeline: deterministic IDs, retries, dead letters ---
+# Transient Firestore/gRPC failures that are retried with exponential backoff
+TRANSIENT_SAVE_ERRORS = (
+    gapi_exceptions.ServiceUnavailable,
+    gapi_exceptions.DeadlineExceeded,
+    gapi_exceptions.InternalServerError,
+    gapi_exceptions.TooManyRequests,
+    gapi_exceptions.ResourceExhausted,
+    gapi_exceptions.Aborted,
+    gapi_exceptions.GatewayTimeout,
+    google_auth_exceptions.TransportError,
+    ConnectionError,
+)
+SAVE_MAX_ATTEMPTS = 5
+SAVE_BACKOFF_INITIAL_SECONDS = 0.2
+SAVE_BACKOFF_MAX_SECONDS = 3.0
+
+# Writes that still fail after all retries are appended here (JSON Lines) for replay_dead_letters()
+DEAD_LETTER_PATH = Path(
+    os.getenv("SAVE_DEAD_LETTER_PATH", str(Path(__file__).parent.parent / "dead_letter" / "failed_writes.jsonl"))
+)
+_dead_letter_lock = threading.Lock()
+
+
+# Fields left out of content-hashed document IDs, as a retry that rebuilds the data gives them new values
+VOLATILE_ID_FIELDS = ("timestamp",)
+VOLATILE_ID_SUFFIX = "_at"
+
+
+def experiment_document_id(data: dict) -> str:
+    """
+    Deterministic document ID for an experiment write, so a retried write lands on the same document.
+
+    Rounds are keyed by their stage_num and round fields (e.g. "round_3", "stage_1_round_3");
+    anything else by a hash of its content without timestamps.
+    """
+    round_num = data.get("round")
+    if round_num is not None:
+        stage_num = data.get("stage_num")
+        return f"round_{round_num}" if stage_num is None else f"stage_{stage_num}_round_{round_num}"
+    stable = {
+        key: value
+        for key, value in data.items()
+        if key not in VOLATILE_ID_FIELDS and not str(key).endswith(VOLATILE_ID_SUFFIX)
+    }
+    digest = hashlib.sha1(json.dumps(stable, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"doc_{digest[:20]}"
+
+
+def _set_with_retry(doc_ref: firestore.DocumentReference, data_to_save: dict) -> None:
+    """Idempotent set(merge=True), retried with capped exponential backoff and jitter on transient errors.
+
+    Sleeps between attempts, so event handlers call the savers using it through asyncio.to_thread.
+    """
+    delay = SAVE_BACKOFF_INITIAL_SECONDS
+    for attempt in range(1, SAVE_MAX_ATTEMPTS + 1):
+        try:
+            doc_ref.set(data_to_save, merge=True)
+            return
+        except TRANSIENT_SAVE_ERRORS as e:
+            if attempt == SAVE_MAX_ATTEMPTS:
+                raise
+            logger.warning(
+                "Transient error saving %s (attempt %d/%d): %s", doc_ref.path, attempt, SAVE_MAX_ATTEMPTS, e
+            )
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, SAVE_BACKOFF_MAX_SECONDS)
+
+
+def _write_dead_letter(record: dict) -> None:
+    """Appends a failed write to the dead-letter file."""
+    with _dead_letter_lock:
+        DEAD_LETTER_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+@instrument_firestore_call
 def save_experiment_data(
     user_id: str,
     game_name: str, # Made game_name mandatory
     data: dict,
     section_num: Optional[int] = None,
     document_id: Optional[str] = None,
-) -> None:
+) -> bool:
     """
     Saves experiment data to a specified collection in Firestore.
 
+    Writes are idempotent: every document gets a deterministic ID and is written with
+    set(merge=True), so retries (ours, or a participant clicking twice) never duplicate it.
+    Transient errors are retried with exponential backoff. A write that still fails, or fails
+    with any other error (e.g. PermissionDenied), is appended to the dead-letter file instead
+    of being dropped or raised, so a round the caller has already applied is neither lost nor applied twice.
+
     Args:
         user_id: The ID of the user.
         game_name: The name of the game or data category (e.g., "trust_game", "public_goods_game", "questionnaire", "basic_info").
@@ -127,128 +266,281 @@ def save_experiment_data(
         data: The data dictionary to save.
         section_num: Optional. Required if game_name is "trust_game", to specify the section number.
         document_id: Optional. If provided, data will be saved to a document with this ID.
-                       If None, Firestore will auto-generate a document ID.
+                       If None, a deterministic ID is derived with experiment_document_id().
+
+    Returns:
+        True if the data was committed, False if it was written to the dead-letter file.
+
+    Raises:
+        ValueError: If game_name is missing, or section_num is missing for the trust game.
     """
-    # if not app_env.FIREBASE_ENABLED:
-    #     print("[SAVE_EXPERIMENT_DATA] Firebase is not enabled. Skipping save.")
-    #     return
-    try:
-        if not game_name:
-            # This check is technically redundant if game_name is mandatory in signature,
-            # but kept for robustness during refactoring or if signature changes.
-            raise ValueError("game_name must be provided to save experiment data.")
+    if not game_name or not isinstance(game_name, str):
+        raise ValueError("game_name must be provided to save experiment data.")
+    if game_name == TRUST_GAME_COLLECTION and section_num is None:
+        raise ValueError(f"section_num is required for game_name '{TRUST_GAME_COLLECTION}'")
+
+    document_id = document_id or experiment_document_id(data)
 
+    # Process datetimes etc.; copy, as data may be returned as-is
+    data_to_save = dict(_convert_value(data))
+    data_to_save.setdefault("game_name", game_name)
+    if section_num is not None:
+        data_to_save.setdefault("section_num", section_num)
+
+    try:
         # Determine the target collection reference using helper functions
         if game_name == TRUST_GAME_COLLECTION:
-            if section_num is None:
-                raise ValueError(f"section_num is required for game_name '{TRUST_GAME_COLLECTION}'")
             target_collection_ref = _get_trust_game_section_rounds_collection_ref(user_id, section_num)
         else:
             # Covers PUBLIC_GOODS_GAME_COLLECTION, QUESTIONNAIRE_COLLECTION, BASIC_INFO_COLLECTION, etc.
             target_collection_ref = _get_game_collection_ref(user_id, game_name)
-            if game_name == BASIC_INFO_COLLECTION and not document_id:
-                # This warning is specific to how basic_info might be structured (usually one doc)
-                print(f"Warning: Saving to '{game_name}' collection without a specific document_id. Data will have an auto-generated ID.")
 
-
-        # Add server timestamp
-        data_to_save = _convert_value(data)  # Process datetimes etc.
-        data_to_save["saved_at"] = firestore.SERVER_TIMESTAMP # Use Firestore server timestamp
-
-        if document_id:
-            doc_ref = target_collection_ref.document(document_id)
-            doc_ref.set(data_to_save, merge=True) # Use set with merge=True to create or update
-            print(f"[SAVE_EXPERIMENT_DATA] Data saved to document: {doc_ref.path}")
-        else:
-            # Auto-generate document ID using .add()
-            # .add() returns a tuple: (timestamp, DocumentReference)
-            timestamp, doc_ref = target_collection_ref.add(data_to_save)
-            print(f"[SAVE_EXPERIMENT_DATA] Data saved with auto-generated ID to document: {doc_ref.path} at {timestamp}")
+        doc_ref = target_collection_ref.document(document_id)
+        _set_with_retry(doc_ref, {**data_to_save, "saved_at": firestore.SERVER_TIMESTAMP})
+        logger.debug("Data saved to document: %s", doc_ref.path, extra=HOT_PATH)
+        return True
 
     except Exception as e:
-        # Improved error logging
-        error_message = (
-            f"Error saving experiment data for user_id='{user_id}', game_name='{game_name}', "
-            f"section_num='{section_num}', document_id='{document_id}'. Error: {e}"
+        FIRESTORE_ERRORS.inc(operation="save_experiment_data", error=type(e).__name__)
+        logger.exception(
+            "Error saving experiment data, writing to dead letter file: %s",
+            e,
+            extra={"user_id": user_id, "game_name": game_name, "section_num": section_num, "document_id": document_id},
+        )
+        _write_dead_letter(
+            {
+                "user_id": user_id,
+                "game_name": game_name,
+                "section_num": section_num,
+                "document_id": document_id,
+                "data": data_to_save,
+                "error": str(e),
+                "failed_at": datetime.now().isoformat(),
+            }
         )
-        print(error_message)
-        traceback.print_exc() # Print full traceback for debugging
-        # Optionally, re-raise the exception or handle it as per application's error handling policy
-        # raise e
-        # Standardize error return for consistency (though not explicitly requested for this func, good practice)
-        # return {"error_saving": str(e), "details": traceback.format_exc()} # Or raise
+        return False
 
 
+@instrument_firestore_call
+def replay_dead_letters() -> Dict[str, int]:
+    """
+    Retries every write in the dead-letter file. Writes that fail again stay in the file.
+    Safe to run repeatedly: the writes are idempotent.
+
+    Returns:
+        {"replayed": <committed count>, "remaining": <still failing count>}
+    """
+    with _dead_letter_lock:
+        if not DEAD_LETTER_PATH.exists():
+            return {"replayed": 0, "remaining": 0}
+        with open(DEAD_LETTER_PATH, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        DEAD_LETTER_PATH.unlink()
+
+    replayed = 0
+    for record in records:
+        # A failing save appends the record back to the dead-letter file
+        try:
+            saved = save_experiment_data(
+                record["user_id"],
+                record["game_name"],
+                record["data"],
+                section_num=record.get("section_num"),
+                document_id=record["document_id"],
+            )
+        except Exception as e:
+            logger.exception("Replaying %s failed, keeping it: %s", record.get("document_id"), e)
+            _write_dead_letter(record)
+            continue
+        if saved:
+            replayed += 1
+    logger.info("Replayed %d of %d failed write(s)", replayed, len(records))
+    return {"replayed": replayed, "remaining": len(records) - replayed}
+# --- End Save pipeline ---
+
+
+def _get_experiment_collection_ref(user_id: str, game_name: str, section_num: int) -> firestore.CollectionReference:
+    """Returns the collection holding the experiment documents of game_name."""
+    if game_name == TRUST_GAME_COLLECTION:
+        return _get_trust_game_section_rounds_collection_ref(user_id, section_num)
+    # Covers PUBLIC_GOODS_GAME_COLLECTION, QUESTIONNAIRE_COLLECTION, etc.
+    return _get_game_collection_ref(user_id, game_name)
+
+
+def _build_experiment_query(
+    collection_ref: firestore.CollectionReference,
+    fields: Optional[List[str]] = None,
+    page_size: Optional[int] = None,
+    start_after: Optional[str] = None,
+):
+    """Builds a query with an optional select() projection and document-ID cursor paging."""
+    query = collection_ref
+    if fields:
+        query = query.select(fields)
+    if page_size is not None or start_after is not None:
+        # Paging needs a stable order; the document ID is the cursor
+        query = query.order_by(FieldPath.document_id())
+        if start_after is not None:
+            query = query.start_after({FieldPath.document_id(): start_after})
+        if page_size is not None:
+            query = query.limit(page_size)
+    return query
+
+
+@instrument_firestore_call
 def get_user_experiment_data(
-    user_id: str, game_name: str, section_num: int = 1
+    user_id: str,
+    game_name: str,
+    section_num: int = 1,
+    fields: Optional[List[str]] = None,
+    page_size: Optional[int] = None,
+    start_after: Optional[str] = None,
 ) -> list:
     """
-    Fetches all experiment data for a specific game collection for a given user.
+    Fetches experiment data for a specific game collection for a given user.
     For 'trust_game', it fetches data from the 'rounds' subcollection of the specified section.
     For other game_names, it fetches all documents from the collection named game_name.
+
+    Args:
+        user_id: The ID of the user.
+        game_name: The name of the game collection.
+        section_num: The trust game section; ignored for other games.
+        fields: Optional. Field paths to fetch, pushed down as a Firestore select() projection.
+                If None, whole documents are fetched.
+        page_size: Optional. Maximum number of documents to return, ordered by document ID.
+        start_after: Optional. Document ID cursor; only documents after it are returned.
     """
-    # if not app_env.FIREBASE_ENABLED:
-    #     print("[GET_USER_EXPERIMENT_DATA] Firebase is not enabled. Skipping fetch.")
-    #     return [{"error": "Firebase not enabled"}]
     try:
         data_list = []
         collection_name_for_print = game_name # For logging purposes
-
         if game_name == TRUST_GAME_COLLECTION:
-            # section_num is used by the helper, default is 1 from signature
-            target_collection_ref = _get_trust_game_section_rounds_collection_ref(user_id, section_num)
             collection_name_for_print = f"{game_name}/{SECTION_DOC_PREFIX}{section_num}/{ROUNDS_SUBCOLLECTION}"
-        elif game_name == PUBLIC_GOODS_GAME_COLLECTION:
-            target_collection_ref = _get_game_collection_ref(user_id, PUBLIC_GOODS_GAME_COLLECTION)
-        else:
-            # Generic fetch for other game types (e.g., QUESTIONNAIRE_COLLECTION)
-            target_collection_ref = _get_game_collection_ref(user_id, game_name)
-        
-        docs = target_collection_ref.stream()
+
+        target_collection_ref = _get_experiment_collection_ref(user_id, game_name, section_num)
+        query = _build_experiment_query(target_collection_ref, fields, page_size, start_after)
+
+        docs = query.stream()
         for doc in docs:
             processed_doc = _process_doc_snapshot(doc)
             data_list.append(processed_doc)
 
         # Fallback logic for when game_name might represent a document ID within a collection of the same name.
         # This is specific and kept for compatibility if such structures were used.
-        if not data_list and game_name not in [TRUST_GAME_COLLECTION, PUBLIC_GOODS_GAME_COLLECTION]:
+        # Only applies to the first page, later pages being empty is expected.
+        if not data_list and start_after is None and game_name not in [TRUST_GAME_COLLECTION, PUBLIC_GOODS_GAME_COLLECTION]:
             try:
-                single_doc_ref = _get_game_collection_ref(user_id, game_name).document(game_name).get()
+                single_doc_ref = _get_game_collection_ref(user_id, game_name).document(game_name).get(field_paths=fields)
                 if single_doc_ref and single_doc_ref.exists:
                     processed_doc = _process_doc_snapshot(single_doc_ref)
                     data_list.append(processed_doc)
                     collection_name_for_print = f"{game_name}/{game_name} (single document)" 
             except Exception as e_single_doc:
-                print(f"Note: Fallback attempt to fetch single document at '{game_name}/{game_name}' failed: {e_single_doc}")
+                logger.debug("Fallback fetch of single document '%s/%s' failed: %s", game_name, game_name, e_single_doc)
 
 
-        if data_list:
-            print(
-                f"[GET_USER_EXPERIMENT_DATA] Fetched {len(data_list)} document(s) for '{collection_name_for_print}' for user '{user_id}'"
-            )
-        else:
-            print(
-                f"[GET_USER_EXPERIMENT_DATA] No data found for user '{user_id}', path '{collection_name_for_print}'"
-            )
+        logger.debug(
+            "Fetched %d document(s) for '%s' for user '%s'", len(data_list), collection_name_for_print, user_id
+        )
 
         return data_list
 
     except Exception as e:
-        # Consistent error logging
-        error_message = (
-            f"Error fetching experiment data for user_id='{user_id}', game_name='{game_name}', "
-            f"section_num='{section_num}'. Error: {e}"
+        FIRESTORE_ERRORS.inc(operation="get_user_experiment_data", error=type(e).__name__)
+        logger.exception(
+            "Error fetching experiment data: %s",
+            e,
+            extra={"user_id": user_id, "game_name": game_name, "section_num": section_num},
         )
-        print(error_message)
-        traceback.print_exc()
         return [{"error_fetching": str(e), "details": traceback.format_exc()}]
 
 
+# Not instrumented itself: the get_user_experiment_data call records the page's metrics and span
+def get_user_experiment_data_page(
+    user_id: str,
+    game_name: str,
+    section_num: int = 1,
+    page_size: int = 20,
+    start_after: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Fetches one page of experiment data, see get_user_experiment_data.
+
+    Returns:
+        {"items": [...], "next_cursor": <document ID to pass as start_after, or None on the last page>}
+        On error, items holds the error dict from get_user_experiment_data.
+    """
+    items = get_user_experiment_data(
+        user_id, game_name, section_num, fields=fields, page_size=page_size, start_after=start_after
+    )
+    is_full_page = len(items) == page_size and items and items[-1].get("id")
+    return {"items": items, "next_cursor": items[-1]["id"] if is_full_page else None}
+
+
+# --- Streaming export ---
+def _json_default(value):
+    """Fallback for values the JSON encoder does not handle natively (Firestore datetimes)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+try:
+    import orjson
+
+    def _encode_json_line(obj) -> bytes:
+        # OPT_PASSTHROUGH_DATETIME routes datetimes to _json_default, matching isoformat() output
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE)
+
+except ImportError:  # orjson is optional, fall back to the standard library encoder
+
+    def _encode_json_line(obj) -> bytes:
+        return (json.dumps(obj, default=_json_default, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+@instrument_firestore_call
+def export_user_experiment_data(
+    user_id: str,
+    game_name: str,
+    out: BinaryIO,
+    section_num: int = 1,
+    fields: Optional[List[str]] = None,
+) -> int:
+    """
+    Streams the experiment documents of a game straight into a binary file as JSON Lines,
+    one {"id": ..., "data": ...} object per line.
+
+    Documents are encoded as they arrive, so only one document is held in memory at a time.
+    Each is still copied once by the snapshot's to_dict() (see _snapshot_data), but not
+    converted: datetimes are written as ISO strings by the encoder, as in
+    get_user_experiment_data, instead of through _convert_value's copy-on-write pass.
+
+    Args:
+        user_id: The ID of the user.
+        game_name: The name of the game collection (see get_user_experiment_data).
+        out: Binary file-like object to write to.
+        section_num: The trust game section; ignored for other games.
+        fields: Optional. Field paths to export, pushed down as a select() projection.
+
+    Returns:
+        The number of documents written.
+    """
+    query = _build_experiment_query(_get_experiment_collection_ref(user_id, game_name, section_num), fields)
+    count = 0
+    for doc in query.stream():
+        out.write(_encode_json_line({"id": doc.id, "data": _snapshot_data(doc) or {}}))
+        count += 1
+    logger.info("Exported %d document(s) of '%s' for user '%s'", count, game_name, user_id)
+    return count
+# --- End Streaming export ---
+
+
+@instrument_firestore_call
 def get_user_questionnaire_responses(user_id: str) -> Dict[str, Dict[str, Any]]:
     """Fetches all questionnaire responses for a user."""
     try:
         if not user_id:
-            print("[GET_USER_QUESTIONNAIRE_RESPONSES] User ID not provided.")
+            logger.warning("get_user_questionnaire_responses: user ID not provided")
             return {}
 
         questionnaire_coll_ref = _get_questionnaire_collection_ref(user_id)
@@ -260,18 +552,49 @@ def get_user_questionnaire_responses(user_id: str) -> Dict[str, Dict[str, Any]]:
                 q_name = processed_doc["id"] # The document ID is the questionnaire name (e.g., "AQ")
                 responses[q_name] = {"doc_id": q_name, "data": processed_doc["data"]}
         
-        if responses:
-            print(
-                f"[GET_USER_QUESTIONNAIRE_RESPONSES] Fetched responses for questionnaires: {list(responses.keys())} for user '{user_id}'"
-            )
-        else:
-            print(f"[GET_USER_QUESTIONNAIRE_RESPONSES] No questionnaire responses found for user '{user_id}'.")
+        logger.debug("Fetched responses for questionnaires %s for user '%s'", list(responses), user_id)
         return responses
     except Exception as e:
-        print(f"[GET_USER_QUESTIONNAIRE_RESPONSES] Error fetching responses for user '{user_id}': {e}")
-        traceback.print_exc()
+        FIRESTORE_ERRORS.inc(operation="get_user_questionnaire_responses", error=type(e).__name__)
+        logger.exception("Error fetching questionnaire responses for user '%s': %s", user_id, e)
         return {"error_fetching": str(e), "details": traceback.format_exc()}
 
+
+@firestore.transactional
+def _merge_unless_submitted(transaction: firestore.Transaction, doc_ref: firestore.DocumentReference, draft: dict) -> bool:
+    snapshot = doc_ref.get(field_paths=["status"], transaction=transaction)
+    if snapshot.exists and (snapshot.to_dict() or {}).get("status") == QUESTIONNAIRE_SUBMITTED_STATUS:
+        return False
+    transaction.set(doc_ref, draft, merge=True)
+    return True
+
+
+@instrument_firestore_call
+def save_questionnaire_draft(user_id: str, questionnaire_name: str, draft: Dict[str, Any]) -> bool:
+    """
+    Merges a draft into a questionnaire's document, unless the questionnaire was submitted meanwhile.
+
+    The check and the write run in one transaction, so a submission that lands
+    between them cannot be overwritten by the draft. A failed draft is logged
+    but not dead-lettered: the next edit saves a fresh one, and a replay could
+    reopen a submitted questionnaire.
+
+    Returns:
+        True if the draft was committed, False if the questionnaire was already submitted or the write failed.
+    """
+    doc_ref = _get_questionnaire_collection_ref(user_id).document(questionnaire_name)
+    try:
+        saved = _merge_unless_submitted(
+            db.transaction(), doc_ref, {**_convert_value(draft), "saved_at": firestore.SERVER_TIMESTAMP}
+        )
+    except TRANSIENT_SAVE_ERRORS as e:
+        FIRESTORE_ERRORS.inc(operation="save_questionnaire_draft", error=type(e).__name__)
+        logger.warning("Error saving draft of %s for user '%s': %s", questionnaire_name, user_id, e)
+        return False
+    if not saved:
+        logger.debug("%s already submitted, draft dropped", questionnaire_name, extra={"user_id": user_id})
+    return saved
+
 #     try:
 #         stats = {
 #             "total_documents_processed": 0,
@@ -316,11 +639,12 @@ def get_user_questionnaire_responses(user_id: str) -> Dict[str, Dict[str, Any]]:
 #         raise
 
 
+@instrument_firestore_call
 def get_user_demographics_data(user_id: str) -> Optional[Dict[str, Any]]:
     """Fetches the demographic data for a user."""
     try:
         if not user_id:
-            print("[GET_USER_DEMOGRAPHICS_DATA] User ID not provided.")
+            logger.warning("get_user_demographics_data: user ID not provided")
             return None
 
         demographics_doc_ref = _get_demographics_doc_ref(user_id)
@@ -329,20 +653,54 @@ def get_user_demographics_data(user_id: str) -> Optional[Dict[str, Any]]:
         processed_doc = _process_doc_snapshot(doc_snapshot)
         if processed_doc and processed_doc["data"]: # Check if data exists after processing
             # The 'id' from _process_doc_snapshot will be 'demographic_data' if the doc exists
-            print(
-                f"[GET_USER_DEMOGRAPHICS_DATA] Fetched demographic data for user '{user_id}', doc_id: {processed_doc.get('id', 'N/A')}"
-            )
+            logger.debug("Fetched demographic data for user '%s'", user_id)
             # Return in the same structure as other data getters if possible,
             # though this one is for a single known document.
             return {"doc_id": processed_doc.get("id"), "data": processed_doc["data"]}
 
-        print(f"[GET_USER_DEMOGRAPHICS_DATA] No demographic data found for user '{user_id}'.")
+        logger.debug("No demographic data found for user '%s'", user_id)
         return None
     except Exception as e:
-        print(f"[GET_USER_DEMOGRAPHICS_DATA] Error fetching data for user '{user_id}': {e}")
-        traceback.print_exc()
+        FIRESTORE_ERRORS.inc(operation="get_user_demographics_data", error=type(e).__name__)
+        logger.exception("Error fetching demographic data for user '%s': %s", user_id, e)
         return {"error_fetching": str(e), "details": traceback.format_exc()}
 
 
+@instrument_firestore_call
+def save_session_checkpoint(user_id: str, checkpoint: Dict[str, Any]) -> bool:
+    """
+    Overwrites the trust game checkpoint of a user with the given record.
+
+    A failed write is logged but not dead-lettered: replaying it later could
+    overwrite a newer checkpoint, and the next round writes a fresh one anyway.
+
+    Returns:
+        True if the checkpoint was committed.
+    """
+    try:
+        doc_ref = _get_checkpoint_doc_ref(user_id)
+        _set_with_retry(doc_ref, {**checkpoint, "saved_at": firestore.SERVER_TIMESTAMP})
+        logger.debug("Checkpoint saved to document: %s", doc_ref.path, extra=HOT_PATH)
+        return True
+    except Exception as e:
+        FIRESTORE_ERRORS.inc(operation="save_session_checkpoint", error=type(e).__name__)
+        logger.warning("Error saving checkpoint for user '%s': %s", user_id, e)
+        return False
+
+
+@instrument_firestore_call
+def get_session_checkpoint(user_id: str) -> Optional[Dict[str, Any]]:
+    """Fetches the trust game checkpoint of a user, None if there is none or it cannot be read."""
+    try:
+        if not user_id:
+            logger.warning("get_session_checkpoint: user ID not provided")
+            return None
+        return _snapshot_data(_get_checkpoint_doc_ref(user_id).get())
+    except Exception as e:
+        FIRESTORE_ERRORS.inc(operation="get_session_checkpoint", error=type(e).__name__)
+        logger.exception("Error fetching checkpoint for user '%s': %s", user_id, e)
+        return None
+
+
 def get_all_user_data_for_export(user_id: str) -> dict:
     pass
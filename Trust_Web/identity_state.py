@@ -0,0 +1,26 @@
+"""
+The signed-in participant's identity, shared by every state that needs it.
+
+AuthState sets it once per login. Game states read it on demand with
+`await self.get_state(IdentityState)` instead of keeping their own copies, so
+a login is a single state update rather than one handler per game state.
+"""
+
+import reflex as rx
+
+from .state_store import CompactStateMixin
+
+
+class IdentityState(CompactStateMixin, rx.State):
+    """User ID and email of the authenticated participant."""
+
+    user_id: str = ""  # Firebase localId
+    user_email: str = ""
+
+    def _set_identity(self, user_id: str, user_email: str):
+        self.user_id = user_id
+        self.user_email = user_email
+
+    def _clear_identity(self):
+        self.user_id = ""
+        self.user_email = ""
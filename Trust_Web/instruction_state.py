@@ -1,42 +1,52 @@
+import logging
+
 import reflex as rx
-import toml
-from typing import List, Dict, Any
-from pathlib import Path
+from typing import List, Dict, Any, Mapping
+
+from .config_registry import CONFIG_FILES, PROFILES_DIR, thaw
+from .config_state import PinnedConfigMixin
+from .public_goods_state import PublicGoodState
+from .state_store import CompactStateMixin
+from .trust_game_state import TrustGameState
+
+logger = logging.getLogger(__name__)
+
+GAME_RULES_CONFIG = "game_rules"
+GAME_RULES_FILE_PATH = PROFILES_DIR / CONFIG_FILES[GAME_RULES_CONFIG]
 
-GAME_RULES_FILE_PATH = Path(__file__).parent / "profiles" / "game_rules.toml"
+# Game in game_rules -> the state playing it, whose pinned configuration version the instructions show
+GAME_STATES: Dict[str, type] = {
+    "public_goods": PublicGoodState,
+    "section1": TrustGameState,
+    "section2": TrustGameState,
+}
 
 
-class InstructionState(rx.State):
-    """Manages loading and displaying game instructions."""
+class InstructionState(PinnedConfigMixin, CompactStateMixin, rx.State):
+    """Manages loading and displaying game instructions.
+
+    The rules are read from the configuration version the game's state is
+    pinned to, so a reload mid-session never shows rules other than the ones played.
+    """
 
-    _raw_game_rules: Dict[str, Any] = {}
     current_game_for_instructions: str = ""
     error_message: str = ""
 
-    def _ensure_rules_loaded(self):
-        if not self._raw_game_rules:
-            print(f"[InstructionState] _ensure_rules_loaded: Attempting to load game rules from {GAME_RULES_FILE_PATH}")
-            try:
-                with open(GAME_RULES_FILE_PATH, "r", encoding="utf-8") as f:
-                    self._raw_game_rules = toml.load(f)
-                print(
-                    f"[InstructionState] _ensure_rules_loaded: Successfully loaded rules. Keys: {list(self._raw_game_rules.keys())}"
-                )
-            except FileNotFoundError:
-                self.error_message = f"Game rules file not found: {GAME_RULES_FILE_PATH}"
-                self._raw_game_rules = {}
-                print(f"[InstructionState] _ensure_rules_loaded: FileNotFoundError. Path: {GAME_RULES_FILE_PATH}")
-            except Exception as e:
-                self.error_message = f"Error loading game rules: {str(e)}"
-                self._raw_game_rules = {}
-                print(f"[InstructionState] _ensure_rules_loaded: Exception loading rules: {type(e).__name__}: {e}")
-        else:
-            print("[InstructionState] _ensure_rules_loaded: Rules already loaded.")
+    def _game_rules(self) -> Mapping[str, Any]:
+        """The shared, read-only game rules; empty (with error_message set) if they cannot be loaded."""
+        try:
+            return self._config(GAME_RULES_CONFIG)
+        except FileNotFoundError:
+            self.error_message = f"Game rules file not found: {GAME_RULES_FILE_PATH}"
+            logger.error("Game rules file not found: %s", GAME_RULES_FILE_PATH)
+        except Exception as e:
+            self.error_message = f"Error loading game rules: {str(e)}"
+            logger.exception("Error loading game rules: %s", e)
+        return {}
 
     @rx.var
     def current_game_config(self) -> Dict[str, Any]:
-        self._ensure_rules_loaded()
-        return self._raw_game_rules.get(self.current_game_for_instructions, {})
+        return thaw(self._game_rules().get(self.current_game_for_instructions, {}))
 
     @rx.var
     def current_game_title(self) -> str:
@@ -48,23 +58,32 @@ class InstructionState(rx.State):
 
     @rx.var
     def current_game_next_page_text(self) -> str:
-        print(f"[DEBUG] current_game_next_page_text: {self.current_game_config.get('next_page_text', 'Next')}")
         return self.current_game_config.get("next_page_text", "Next")
 
     @rx.var
     def current_game_next_page_url(self) -> str:
-        print(f"[DEBUG] current_game_next_page_url: {self.current_game_config.get('next_page_url', '/')}")
         return self.current_game_config.get("next_page_url", "/")  # Default to home if not specified
 
+    async def _pin_to_game(self, game_name: str):
+        """Reads the rules from the version game_name's state is pinned to, pinning it if it is not yet."""
+        game_state_cls = GAME_STATES.get(game_name)
+        if game_state_cls is None:
+            self._unpin_config()
+            return
+        game_state = await self.get_state(game_state_cls)
+        game_state._pin_config()
+        self._config_version = game_state._config_version
+
     @rx.event
-    def prepare_instructions(self, game_name: str):
+    async def prepare_instructions(self, game_name: str):
         """Sets the current game and navigates to the instructions page."""
-        self._ensure_rules_loaded()
+        await self._pin_to_game(game_name)
+        game_rules = self._game_rules()
         self.current_game_for_instructions = game_name
         self.error_message = ""  # Clear any previous errors
 
         # Check if the game_name is valid
-        if game_name not in self._raw_game_rules:
+        if game_name not in game_rules:
             self.error_message = f"Instructions for game '{game_name}' not found."
             # Potentially redirect to an error page or stay and show message
             return rx.redirect("/")  # Or some error indication page
@@ -75,33 +94,34 @@ class InstructionState(rx.State):
         return rx.redirect(f"/app/instructions?game={game_name}")
 
     @rx.event
-    def load_instructions_for_current_page(self):
+    async def load_instructions_for_current_page(self):
         """Sets current_game_for_instructions based on URL query param 'game' or uses already set one."""
         game_name_from_url = self.router.page.params.get("game", "")
-        self._ensure_rules_loaded()  # Ensure rules are available
+        await self._pin_to_game(game_name_from_url or self.current_game_for_instructions)
+        game_rules = self._game_rules()
 
         if game_name_from_url:
-            if game_name_from_url in self._raw_game_rules:
+            if game_name_from_url in game_rules:
                 self.current_game_for_instructions = game_name_from_url
                 self.error_message = ""
-                print(f"[InstructionState] Loaded instructions for: {game_name_from_url} from URL param.")
+                logger.debug("Loaded instructions for %s from URL param", game_name_from_url)
             else:
                 self.error_message = f"Instructions for game '{game_name_from_url}' (from URL) not found."
                 self.current_game_for_instructions = ""  # Clear if invalid game from URL
-                print(self.error_message)
-        elif self.current_game_for_instructions and self.current_game_for_instructions in self._raw_game_rules:
+                logger.warning(self.error_message)
+        elif self.current_game_for_instructions and self.current_game_for_instructions in game_rules:
             # If no game in URL, but a valid game is already set in state, keep it.
-            print(f"[InstructionState] Using already set game: {self.current_game_for_instructions}")
             pass
-        elif self._raw_game_rules:  # No game in URL, nothing valid set, try defaulting
-            first_game_in_rules = next(iter(self._raw_game_rules), None)
+        elif game_rules:  # No game in URL, nothing valid set, try defaulting
+            first_game_in_rules = next(iter(game_rules), None)
             if first_game_in_rules:
                 self.current_game_for_instructions = first_game_in_rules
+                await self._pin_to_game(first_game_in_rules)
                 self.error_message = ""
-                print(f"[InstructionState] No game in URL or state, defaulting to first game: {first_game_in_rules}")
+                logger.debug("No game in URL or state, defaulting to first game: %s", first_game_in_rules)
             else:
                 self.error_message = "No game specified and no game rules found to default to."
-                print(self.error_message)
+                logger.warning(self.error_message)
         else:
             self.error_message = "No game rules loaded."
-            print(self.error_message)
+            logger.warning(self.error_message)
@@ -0,0 +1,602 @@
+"""
+Headless load generator: virtual participants playing the whole experiment
+over the Reflex websocket protocol.
+
+Each virtual participant opens its own Socket.IO connection to the backend's
+event endpoint, like a browser tab, and clicks through the flow the pages
+drive: login, the demographics form, every questionnaire page, the public
+goods rounds, Section 1 as trustee and Section 2 as investor against every AI
+profile. Events the backend sends back (redirects, on_load handlers, chained
+handlers) are followed the way the frontend follows them, and the page's
+on_mount handlers are sent on arrival. Between clicks a participant waits a
+random think time around --think-time.
+
+The latency of an event is the time from sending it to the backend's final
+update for it. The report gives the count, throughput and p50/p95/p99
+latency of every event handler.
+
+Run it against a backend wired to the local stand-ins, so no Firebase
+project is touched (participant i logs in as a user seeded by
+local_auth_server):
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    python -m Trust_Web.local_auth_server --port 9099 --seed-users 2000
+    FIRESTORE_EMULATOR_HOST=localhost:8080 FIREBASE_AUTH_EMULATOR_HOST=localhost:9099 reflex run --env prod --backend-only
+    python -m Trust_Web.load_test --participants 2000 --concurrency 500 --think-time 1.5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+from reflex.constants import CompileVars
+from reflex.utils.format import to_snake_case
+from simple_websocket import AioClient, ConnectionClosed
+
+from .local_auth_server import SYNTHETIC_EMAIL_TEMPLATE, SYNTHETIC_PASSWORD
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND_URL = "http://localhost:8000"
+EVENT_NAMESPACE = "/_event"
+EVENT_TIMEOUT_SECONDS = 30.0
+MAX_EVENTS_PER_PARTICIPANT = 2000  # Stops a participant stuck on a page that never changes
+
+ROOT_STATE = "reflex___state____state"
+REDIRECT_EVENT = "_redirect"
+FINAL_PAGE = "/app/final"
+
+# Routes that are not the dynamic /app/[page_id] page
+STATIC_ROUTES = ("/", "/app/instructions")
+DYNAMIC_ROUTE = "/app/[page_id]"
+
+
+def _state_path(module: str, class_name: str) -> str:
+    """Full name Reflex gives a state defined directly under rx.State (see BaseState.get_full_name)."""
+    return f"{ROOT_STATE}.{to_snake_case(module.replace('.', '___') + '___' + class_name)}"
+
+
+# Computed from names rather than imported, so the generator does not load the app (and its Firestore client)
+AUTH = _state_path("Trust_Web.authentication", "AuthState")
+DEMOGRAPHICS = _state_path("Trust_Web.demographic_state", "DemographicState")
+QUESTIONNAIRE = _state_path("Trust_Web.questionnaire_state", "QuestionnaireState")
+INSTRUCTIONS = _state_path("Trust_Web.instruction_state", "InstructionState")
+PUBLIC_GOODS = _state_path("Trust_Web.public_goods_state", "PublicGoodState")
+TRUST_GAME = _state_path("Trust_Web.trust_game_state", "TrustGameState")
+
+STATE_LABELS: Dict[str, str] = {
+    ROOT_STATE: "State",
+    f"{ROOT_STATE}.{CompileVars.ON_LOAD_INTERNAL.rpartition('.')[0]}": "OnLoadInternalState",
+    AUTH: "AuthState",
+    DEMOGRAPHICS: "DemographicState",
+    QUESTIONNAIRE: "QuestionnaireState",
+    INSTRUCTIONS: "InstructionState",
+    PUBLIC_GOODS: "PublicGoodState",
+    TRUST_GAME: "TrustGameState",
+}
+
+# Handlers the pages call from on_mount
+PAGE_MOUNT_EVENTS: Dict[str, List[Tuple[str, str]]] = {
+    "/app/demography": [(DEMOGRAPHICS, "ensure_data_loaded_for_user")],
+    "/app/questionnaire": [(QUESTIONNAIRE, "ensure_responses_loaded")],
+}
+
+DEMOGRAPHICS_FORM: Dict[str, str] = {
+    "gender": "female",
+    "birth_date": "1995-03-14",
+    "education_level": "대학교 재학/휴학/중퇴",
+    "occupation": "학생",
+    "has_psychiatric_history": "no",
+    "on_psychiatric_medication": "no",
+    "in_psychological_counseling": "no",
+}
+
+
+# Section 1: amount the participant (trustee) returns out of what they received
+def _trustee_fair(received: int, rng: random.Random) -> int:
+    return max(1, received // 2)
+
+
+def _trustee_selfish(received: int, rng: random.Random) -> int:
+    return 1
+
+
+def _trustee_generous(received: int, rng: random.Random) -> int:
+    return max(1, received * 2 // 3)
+
+
+def _trustee_random(received: int, rng: random.Random) -> int:
+    return rng.randint(1, received)
+
+
+TRUSTEE_STRATEGIES: Dict[str, Callable[[int, random.Random], int]] = {
+    "fair": _trustee_fair,
+    "selfish": _trustee_selfish,
+    "generous": _trustee_generous,
+    "random": _trustee_random,
+}
+
+
+# Section 2: amount the participant (investor) sends, given the largest allowed amount
+# and the share of the previous investment that came back (None in a stage's first round)
+def _investor_cautious(max_send: int, last_return_ratio: Optional[float], rng: random.Random) -> int:
+    return max(1, max_send // 4)
+
+
+def _investor_all_in(max_send: int, last_return_ratio: Optional[float], rng: random.Random) -> int:
+    return max_send
+
+
+def _investor_tit_for_tat(max_send: int, last_return_ratio: Optional[float], rng: random.Random) -> int:
+    if last_return_ratio is None or last_return_ratio >= 1.0:
+        return max_send
+    return max(1, round(max_send * last_return_ratio))
+
+
+def _investor_random(max_send: int, last_return_ratio: Optional[float], rng: random.Random) -> int:
+    return rng.randint(1, max_send)
+
+
+INVESTOR_STRATEGIES: Dict[str, Callable[[int, Optional[float], random.Random], int]] = {
+    "cautious": _investor_cautious,
+    "all_in": _investor_all_in,
+    "tit_for_tat": _investor_tit_for_tat,
+    "random": _investor_random,
+}
+
+
+class LoadTestError(RuntimeError):
+    """A virtual participant could not continue: connection lost, timeout or unexpected page."""
+
+
+class ReflexSocket:
+    """Minimal Socket.IO 5 client (Engine.IO 4 over a websocket) of the backend's event namespace."""
+
+    DISCONNECTED = "disconnected"
+
+    def __init__(self, backend_url: str, namespace: str = EVENT_NAMESPACE):
+        parts = urlsplit(backend_url)
+        scheme = "wss" if parts.scheme == "https" else "ws"
+        self.url = f"{scheme}://{parts.netloc}{namespace}/?EIO=4&transport=websocket"
+        self.namespace = namespace
+        self.updates: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+        self._ws: Optional[AioClient] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def connect(self, timeout: float = EVENT_TIMEOUT_SECONDS) -> None:
+        """Opens the websocket and joins the namespace.
+
+        Raises:
+            LoadTestError: If the backend does not complete the handshake
+        """
+        self._ws = await asyncio.wait_for(AioClient.connect(self.url), timeout)
+        opening = await self._ws.receive(timeout)
+        if not opening or not opening.startswith("0"):
+            raise LoadTestError(f"Unexpected Engine.IO opening packet: {opening!r}")
+        await self._ws.send(f"40{self.namespace},")
+        while True:
+            packet = await self._ws.receive(timeout)
+            if packet is None:
+                raise LoadTestError("Timed out joining the event namespace")
+            if packet == "2":
+                await self._ws.send("3")
+            elif packet.startswith(f"40{self.namespace},"):
+                break
+            elif packet.startswith(f"44{self.namespace},"):
+                raise LoadTestError(f"Backend refused the connection: {packet}")
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        prefix = f"42{self.namespace},"
+        try:
+            while True:
+                packet = await self._ws.receive()
+                if packet == "2":  # Engine.IO ping
+                    await self._ws.send("3")
+                elif isinstance(packet, str) and packet.startswith(prefix):
+                    name, *args = json.loads(packet[len(prefix) :])
+                    self.updates.put_nowait((name, args[0] if args else None))
+                elif packet == "1" or packet == f"41{self.namespace},":
+                    break
+        except ConnectionClosed:
+            pass
+        finally:
+            self.updates.put_nowait((self.DISCONNECTED, None))
+
+    async def emit_event(self, fields: Dict[str, Any]) -> None:
+        await self._ws.send(f"42{self.namespace}," + json.dumps(["event", fields], ensure_ascii=False))
+
+    async def next_update(self, timeout: float = EVENT_TIMEOUT_SECONDS) -> Tuple[str, Any]:
+        """The next message the backend emitted, e.g. ("event", <StateUpdate>) or ("reload", <Event>).
+
+        Raises:
+            LoadTestError: If the connection closed or nothing arrived within timeout
+        """
+        try:
+            kind, data = await asyncio.wait_for(self.updates.get(), timeout)
+        except asyncio.TimeoutError:
+            raise LoadTestError(f"No update within {timeout:.0f}s") from None
+        if kind == self.DISCONNECTED:
+            self.updates.put_nowait((kind, data))  # Later reads fail the same way
+            raise LoadTestError("Backend closed the connection")
+        return kind, data
+
+    def pending_updates(self) -> List[Tuple[str, Any]]:
+        """Messages already received, e.g. deltas pushed by background tasks between clicks."""
+        messages = []
+        while not self.updates.empty():
+            message = self.updates.get_nowait()
+            if message[0] == self.DISCONNECTED:
+                self.updates.put_nowait(message)
+                break
+            messages.append(message)
+        return messages
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._ws is not None:
+            try:
+                await self._ws.close()
+            except ConnectionClosed:
+                pass
+
+
+class LoadStats:
+    """Latencies and failures collected from every virtual participant."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.completed = 0
+        self.failed = 0
+        self.reloads = 0
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+
+    def record(self, label: str, seconds: float) -> None:
+        self.latencies[label].append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        """Run totals and, per event label, count, rate and latency percentiles in milliseconds."""
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        events = {}
+        for label, samples in sorted(self.latencies.items()):
+            values = np.asarray(samples) * 1000.0
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            events[label] = {
+                "count": len(samples),
+                "per_second": len(samples) / elapsed if elapsed else 0.0,
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(values.max()),
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {
+            "elapsed_seconds": elapsed,
+            "participants_completed": self.completed,
+            "participants_failed": self.failed,
+            "events": total,
+            "events_per_second": total / elapsed if elapsed else 0.0,
+            "reloads": self.reloads,
+            "errors": dict(self.errors),
+            "by_event": events,
+        }
+
+    def format_report(self) -> str:
+        summary = self.summary()
+        lines = [
+            f"{summary['participants_completed']} participants completed, {summary['participants_failed']} failed "
+            f"in {summary['elapsed_seconds']:.1f}s; {summary['events']} events, "
+            f"{summary['events_per_second']:.1f}/s, {summary['reloads']} reloads",
+            "",
+            f"{'event':<48} {'count':>7} {'per s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+        ]
+        for label, row in summary["by_event"].items():
+            lines.append(
+                f"{label:<48} {row['count']:>7} {row['per_second']:>8.2f} {row['p50_ms']:>9.1f} "
+                f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}"
+            )
+        if summary["errors"]:
+            lines.append("")
+            lines.extend(f"error {kind}: {count}" for kind, count in sorted(summary["errors"].items()))
+        return "\n".join(lines)
+
+
+@dataclass
+class LoadTestOptions:
+    backend_url: str = DEFAULT_BACKEND_URL
+    participants: int = 100
+    concurrency: int = 100  # Participants connected at the same time
+    ramp_up_seconds: float = 10.0  # Start times are spread evenly over this window
+    think_time: float = 1.0  # Mean pause before each click, in seconds
+    first_user_index: int = 0  # Participant i logs in as synthetic user first_user_index + i
+    password: str = SYNTHETIC_PASSWORD
+    trustee: str = "fair"
+    investor: str = "tit_for_tat"
+    seed: int = 0
+    event_timeout: float = EVENT_TIMEOUT_SECONDS
+
+
+class VirtualParticipant:
+    """One scripted participant on its own websocket connection."""
+
+    def __init__(self, index: int, options: LoadTestOptions, stats: LoadStats):
+        self.options = options
+        self.stats = stats
+        self.email = SYNTHETIC_EMAIL_TEMPLATE.format(index=options.first_user_index + index)
+        self.token = str(uuid.uuid4())
+        self.rng = random.Random(options.seed * 1_000_003 + index)
+        self.trustee = TRUSTEE_STRATEGIES[options.trustee]
+        self.investor = INVESTOR_STRATEGIES[options.investor]
+        self.path = "/"
+        self.vars: Dict[str, Dict[str, Any]] = defaultdict(dict)  # State path -> var -> last value from the backend
+        self.events_sent = 0
+        self._last_return: Tuple[Optional[int], Optional[float]] = (None, None)  # Section 2 stage, return ratio
+        self._socket = ReflexSocket(options.backend_url)
+
+    # --- Protocol ---
+
+    def _router_data(self) -> Dict[str, Any]:
+        """Router data the frontend attaches to events, for the current path."""
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query))
+        route = parts.path or "/"
+        if route not in STATIC_ROUTES and route.startswith("/app/"):
+            query["page_id"] = route[len("/app/") :]
+            route = DYNAMIC_ROUTE
+        return {"pathname": route, "query": query, "asPath": self.path}
+
+    def _event(self, state: str, handler: str, **payload: Any) -> Dict[str, Any]:
+        return {"token": self.token, "name": f"{state}.{handler}", "router_data": self._router_data(), "payload": payload}
+
+    def _page_load_events(self) -> List[Dict[str, Any]]:
+        """What the frontend sends after navigating: on_load_internal, which queues the page's on_load handlers."""
+        return [self._event(ROOT_STATE, CompileVars.ON_LOAD_INTERNAL)]
+
+    @staticmethod
+    def _label(event_name: str) -> str:
+        state, _, handler = event_name.rpartition(".")
+        if state in STATE_LABELS:
+            return f"{STATE_LABELS[state]}.{handler}"
+        return f"{state.rpartition('.')[2] or state}.{handler}"
+
+    def _apply(self, update: Dict[str, Any]) -> None:
+        for state, delta in (update.get("delta") or {}).items():
+            self.vars[state].update(delta)
+
+    async def _dispatch(self, events: List[Dict[str, Any]]) -> None:
+        """Sends events one at a time, as the frontend's event queue does, following what the backend sends back."""
+        pending: Deque[Dict[str, Any]] = deque(events)
+        redirect: Optional[str] = None
+        while pending:
+            event = pending.popleft()
+            for _, update in self._socket.pending_updates():
+                if isinstance(update, dict):
+                    self._apply(update)
+            self.events_sent += 1
+            if self.events_sent > MAX_EVENTS_PER_PARTICIPANT:
+                raise LoadTestError(f"More than {MAX_EVENTS_PER_PARTICIPANT} events, stuck on {self.path}")
+            started = time.perf_counter()
+            await self._socket.emit_event(event)
+            while True:
+                kind, update = await self._socket.next_update(self.options.event_timeout)
+                if kind == "reload":
+                    # The backend lost the session state: the frontend re-hydrates, then resends the event
+                    self.stats.reloads += 1
+                    pending.extendleft(reversed([self._event(ROOT_STATE, CompileVars.HYDRATE), *self._page_load_events(), event]))
+                    break
+                if kind != "event":
+                    continue
+                self._apply(update)
+                for follow_up in update.get("events") or []:
+                    if follow_up["name"] == REDIRECT_EVENT:
+                        redirect = follow_up["payload"]["path"]
+                    elif not follow_up["name"].startswith("_"):  # Other "_" events only act in the browser
+                        pending.append(follow_up)
+                if update.get("final", True):
+                    self.stats.record(self._label(event["name"]), time.perf_counter() - started)
+                    break
+        if redirect is not None:
+            await self.navigate(redirect)
+
+    async def navigate(self, path: str) -> None:
+        """Moves to path and sends what the frontend sends on arrival: the page's on_load and on_mount events."""
+        self.path = path
+        await self._dispatch(self._page_load_events())
+        mount_events = PAGE_MOUNT_EVENTS.get(urlsplit(path).path, [])
+        if mount_events:
+            await self._dispatch([self._event(state, handler) for state, handler in mount_events])
+
+    async def click(self, state: str, handler: str, **payload: Any) -> None:
+        """Waits a think time, then sends one user-initiated event."""
+        await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.options.think_time)
+        await self._dispatch([self._event(state, handler, **payload)])
+
+    # --- Pages ---
+
+    async def run(self) -> None:
+        """Plays the experiment from the landing page to the final page."""
+        await self._socket.connect(self.options.event_timeout)
+        try:
+            await self._dispatch([self._event(ROOT_STATE, CompileVars.HYDRATE), *self._page_load_events()])
+            await self._login()
+            pages = {
+                "/app/demography": self._demography,
+                "/app/questionnaire": self._questionnaires,
+                "/app/instructions": self._instructions,
+                "/app/public-goods": self._public_goods,
+                "/app/section1": self._section_1,
+                "/app/section2": self._section_2,
+                "/app/stage-transition": self._stage_transition,
+            }
+            while self.path != FINAL_PAGE:
+                page = pages.get(urlsplit(self.path).path)
+                if page is None:
+                    raise LoadTestError(f"Unexpected page {self.path}")
+                await page()
+        finally:
+            await self._socket.close()
+
+    async def _login(self) -> None:
+        await self.click(AUTH, "open_login_modal")
+        await self.click(AUTH, "set_user_email", value=self.email)
+        await self.click(AUTH, "set_password", value=self.options.password)
+        await self.click(AUTH, "login")
+        if self.path == "/":
+            raise LoadTestError(f"Login failed: {self.vars[AUTH].get('auth_error', '')}")
+
+    async def _demography(self) -> None:
+        for field_name, value in DEMOGRAPHICS_FORM.items():
+            await self.click(DEMOGRAPHICS, "update_demographics_field", field_name=field_name, value=value)
+        await self.click(DEMOGRAPHICS, "handle_submit", form_data=dict(DEMOGRAPHICS_FORM))
+
+    async def _questionnaires(self) -> None:
+        state = self.vars[QUESTIONNAIRE]
+        level = state.get("current_likert_level") or 2
+        offset = state.get("page_item_offset", 0)
+        for item_index in range(offset, offset + len(state.get("page_items") or [])):
+            await self.click(QUESTIONNAIRE, "set_response", item_index=item_index, value=str(self.rng.randrange(level)))
+        if state.get("is_last_page", True):
+            await self.click(QUESTIONNAIRE, "submit_questionnaire")
+        else:
+            await self.click(QUESTIONNAIRE, "next_page")
+
+    async def _instructions(self) -> None:
+        next_page_url = self.vars[INSTRUCTIONS].get("current_game_next_page_url", "")
+        if next_page_url == "/app/section1":
+            await self.click(TRUST_GAME, "start_section_1")
+        elif next_page_url == "/app/section2":
+            await self.click(TRUST_GAME, "start_section_2")
+        elif next_page_url:
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.options.think_time)
+            await self.navigate(next_page_url)  # A client-side redirect button
+        else:
+            raise LoadTestError(f"No next page on {self.path}")
+
+    async def _public_goods(self) -> None:
+        state = self.vars[PUBLIC_GOODS]
+        if state.get("game_finished"):
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.options.think_time)
+            await self.navigate("/app/instructions?game=section1")
+        elif not state.get("game_played"):
+            contribution = self.rng.randint(0, max(0, state.get("human_balance", 0)) // 2)
+            await self.click(PUBLIC_GOODS, "set_human_contribution", value=str(contribution))
+            await self.click(PUBLIC_GOODS, "play_game")
+        else:
+            await self.click(PUBLIC_GOODS, "prepare_next_round")
+
+    async def _section_1(self) -> None:
+        state = self.vars[TRUST_GAME]
+        if state.get("is_decision_submitted"):
+            await self.click(TRUST_GAME, "go_to_next_round")
+            return
+        received = state.get("received_amount", 0)
+        if received > 0:
+            await self.click(TRUST_GAME, "set_amount_to_return", value=str(self.trustee(received, self.rng)))
+        await self.click(TRUST_GAME, "submit_player_b_decision")
+
+    async def _section_2(self) -> None:
+        state = self.vars[TRUST_GAME]
+        if state.get("is_decision_submitted"):
+            # The round history stays on the server, so remember the opponent's last return here
+            sent = state.get("amount_to_send")
+            ratio = state.get("amount_to_return", 0) / sent if sent else None
+            self._last_return = (state.get("current_stage"), ratio)
+            await self.click(TRUST_GAME, "go_to_next_round")
+            return
+        stage, last_return_ratio = self._last_return
+        if stage != state.get("current_stage"):
+            last_return_ratio = None
+        max_send = state.get("max_send_amount", 0)
+        if max_send > 0:
+            amount = self.investor(max_send, last_return_ratio, self.rng)
+            await self.click(TRUST_GAME, "set_amount_to_send", value=str(amount))
+        await self.click(TRUST_GAME, "main_algorithm")
+
+    async def _stage_transition(self) -> None:
+        if self.vars[TRUST_GAME].get("is_last_stage"):
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.options.think_time)
+            await self.navigate(FINAL_PAGE)
+        else:
+            await self.click(TRUST_GAME, "start_next_stage")
+
+
+async def run_load_test(options: LoadTestOptions) -> LoadStats:
+    """Runs options.participants virtual participants, at most options.concurrency at a time.
+
+    Raises:
+        KeyError: If options.trustee or options.investor is not a known strategy
+    """
+    if options.trustee not in TRUSTEE_STRATEGIES or options.investor not in INVESTOR_STRATEGIES:
+        raise KeyError(f"Unknown strategy: trustee {options.trustee!r}, investor {options.investor!r}")
+    stats = LoadStats()
+    slots = asyncio.Semaphore(options.concurrency)
+    start_interval = options.ramp_up_seconds / max(options.participants, 1)
+
+    async def participate(index: int) -> None:
+        await asyncio.sleep(index * start_interval)
+        async with slots:
+            participant = VirtualParticipant(index, options, stats)
+            try:
+                await participant.run()
+                stats.completed += 1
+            except (LoadTestError, ConnectionClosed, OSError, asyncio.TimeoutError) as e:
+                stats.failed += 1
+                stats.errors[type(e).__name__] += 1
+                logger.warning("Participant %d failed on %s: %s", index, participant.path, e)
+
+    await asyncio.gather(*(participate(index) for index in range(options.participants)))
+    stats.finished_at = time.perf_counter()
+    return stats
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Simulate concurrent participants against a running backend.")
+    parser.add_argument("--backend-url", default=DEFAULT_BACKEND_URL)
+    parser.add_argument("--participants", type=int, default=LoadTestOptions.participants)
+    parser.add_argument("--concurrency", type=int, default=LoadTestOptions.concurrency)
+    parser.add_argument("--ramp-up", type=float, default=LoadTestOptions.ramp_up_seconds, help="seconds")
+    parser.add_argument("--think-time", type=float, default=LoadTestOptions.think_time, help="mean seconds per click")
+    parser.add_argument("--first-user", type=int, default=0, help="index of the first synthetic user to log in as")
+    parser.add_argument("--password", default=SYNTHETIC_PASSWORD, help="password of the synthetic users")
+    parser.add_argument("--trustee", choices=sorted(TRUSTEE_STRATEGIES), default=LoadTestOptions.trustee)
+    parser.add_argument("--investor", choices=sorted(INVESTOR_STRATEGIES), default=LoadTestOptions.investor)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=EVENT_TIMEOUT_SECONDS, help="seconds to wait for an event")
+    parser.add_argument("--json", dest="json_path", help="also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    options = LoadTestOptions(
+        backend_url=args.backend_url,
+        participants=args.participants,
+        concurrency=args.concurrency,
+        ramp_up_seconds=args.ramp_up,
+        think_time=args.think_time,
+        first_user_index=args.first_user,
+        password=args.password,
+        trustee=args.trustee,
+        investor=args.investor,
+        seed=args.seed,
+        event_timeout=args.timeout,
+    )
+    stats = asyncio.run(run_load_test(options))
+    print(stats.format_report())
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(stats.summary(), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Local stand-in for the Firebase Authentication REST API, used to exercise and
+benchmark the login path on an offline machine.
+
+It implements the subset of endpoints FirebaseAuthClient calls, with the same
+URL layout as the Firebase Auth emulator:
+
+    POST /identitytoolkit.googleapis.com/v1/accounts:signInWithPassword
+    POST /identitytoolkit.googleapis.com/v1/accounts:signUp
+    POST /securetoken.googleapis.com/v1/token
+
+and answers with Firebase's response shapes and error codes (EMAIL_NOT_FOUND,
+INVALID_PASSWORD, EMAIL_EXISTS, ...). ID tokens are unsigned JWTs, like the
+ones the emulator issues. Users live in memory only.
+
+Run it with
+
+    python -m Trust_Web.local_auth_server --port 9099 --seed-users 5000
+
+and start the app with FIREBASE_AUTH_EMULATOR_HOST=localhost:9099, or plug it
+in-process with set_auth_client(FirebaseAuthClient(..., transport=backend.transport())).
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+IDENTITY_TOOLKIT_PREFIX = "/identitytoolkit.googleapis.com/v1/accounts:"
+SECURE_TOKEN_PATH = "/securetoken.googleapis.com/v1/token"
+
+DEFAULT_PORT = 9099
+ID_TOKEN_LIFETIME_SECONDS = 3600
+MIN_PASSWORD_LENGTH = 6
+PROJECT_ID = "trust-web-local"
+
+# Credentials of the users created by seed_users
+SYNTHETIC_EMAIL_TEMPLATE = "user{index}@loadtest.local"
+SYNTHETIC_PASSWORD = "loadtest-password"
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _error(message: str, status: int = 400) -> Tuple[int, Dict[str, Any]]:
+    """A Firebase-style error body."""
+    return status, {
+        "error": {
+            "code": status,
+            "message": message,
+            "errors": [{"message": message, "domain": "global", "reason": "invalid"}],
+        }
+    }
+
+
+class LocalAuthBackend:
+    """In-memory user store answering Firebase Auth REST requests."""
+
+    def __init__(self, token_lifetime: int = ID_TOKEN_LIFETIME_SECONDS):
+        self.token_lifetime = token_lifetime
+        self._lock = threading.Lock()
+        self._users_by_email: Dict[str, Dict[str, str]] = {}
+        self._users_by_id: Dict[str, Dict[str, str]] = {}
+        self._refresh_tokens: Dict[str, str] = {}  # refresh token -> localId
+
+    @staticmethod
+    def _hash_password(salt: str, password: str) -> str:
+        # A fast salted hash keeps synthetic logins cheap; this is not a production store
+        return hashlib.sha256(f"{salt}:{password}".encode()).hexdigest()
+
+    def _create_user(self, email: str, password: str) -> Dict[str, str]:
+        """Stores a new user; the caller holds the lock and has checked that email is free."""
+        salt = secrets.token_hex(8)
+        user = {
+            "localId": secrets.token_hex(14),
+            "email": email,
+            "salt": salt,
+            "password_hash": self._hash_password(salt, password),
+        }
+        self._users_by_email[email] = user
+        self._users_by_id[user["localId"]] = user
+        return user
+
+    def add_user(self, email: str, password: str) -> str:
+        """Creates a user directly and returns its localId; existing users are kept."""
+        email = email.strip().lower()
+        with self._lock:
+            user = self._users_by_email.get(email)
+            if user is None:
+                user = self._create_user(email, password)
+            return user["localId"]
+
+    def seed_users(self, count: int, password: str = SYNTHETIC_PASSWORD) -> int:
+        """Creates count synthetic users (see SYNTHETIC_EMAIL_TEMPLATE); returns the total user count."""
+        for index in range(count):
+            self.add_user(SYNTHETIC_EMAIL_TEMPLATE.format(index=index), password)
+        return len(self._users_by_email)
+
+    def _issue_tokens(self, user: Dict[str, str]) -> Dict[str, str]:
+        now = int(time.time())
+        claims = {
+            "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+            "aud": PROJECT_ID,
+            "auth_time": now,
+            "user_id": user["localId"],
+            "sub": user["localId"],
+            "iat": now,
+            "exp": now + self.token_lifetime,
+            "email": user["email"],
+        }
+        header = _b64url(json.dumps({"alg": "none", "typ": "JWT"}).encode())
+        id_token = f"{header}.{_b64url(json.dumps(claims).encode())}."
+        refresh_token = secrets.token_urlsafe(32)
+        self._refresh_tokens[refresh_token] = user["localId"]
+        return {"idToken": id_token, "refreshToken": refresh_token, "expiresIn": str(self.token_lifetime)}
+
+    def sign_in_with_password(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        email = str(payload.get("email") or "").strip().lower()
+        password = payload.get("password")
+        if not email:
+            return _error("INVALID_EMAIL")
+        if not password:
+            return _error("MISSING_PASSWORD")
+        with self._lock:
+            user = self._users_by_email.get(email)
+            if user is None:
+                return _error("EMAIL_NOT_FOUND")
+            if self._hash_password(user["salt"], password) != user["password_hash"]:
+                return _error("INVALID_PASSWORD")
+            tokens = self._issue_tokens(user)
+        return 200, {
+            "kind": "identitytoolkit#VerifyPasswordResponse",
+            "localId": user["localId"],
+            "email": user["email"],
+            "displayName": "",
+            "registered": True,
+            **tokens,
+        }
+
+    def sign_up(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        email = str(payload.get("email") or "").strip().lower()
+        password = payload.get("password")
+        if not email:
+            return _error("MISSING_EMAIL")
+        if not EMAIL_PATTERN.match(email):
+            return _error("INVALID_EMAIL")
+        if not password:
+            return _error("MISSING_PASSWORD")
+        if len(password) < MIN_PASSWORD_LENGTH:
+            return _error(f"WEAK_PASSWORD : Password should be at least {MIN_PASSWORD_LENGTH} characters")
+        with self._lock:
+            if email in self._users_by_email:
+                return _error("EMAIL_EXISTS")
+            user = self._create_user(email, password)
+            tokens = self._issue_tokens(user)
+        return 200, {
+            "kind": "identitytoolkit#SignupNewUserResponse",
+            "localId": user["localId"],
+            "email": user["email"],
+            **tokens,
+        }
+
+    def refresh_token(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if payload.get("grant_type") != "refresh_token":
+            return _error("INVALID_GRANT_TYPE")
+        refresh_token = payload.get("refresh_token")
+        if not refresh_token:
+            return _error("MISSING_REFRESH_TOKEN")
+        with self._lock:
+            local_id = self._refresh_tokens.pop(refresh_token, None)
+            user = self._users_by_id.get(local_id)
+            if user is None:
+                return _error("INVALID_REFRESH_TOKEN")
+            tokens = self._issue_tokens(user)
+        return 200, {
+            "id_token": tokens["idToken"],
+            "refresh_token": tokens["refreshToken"],
+            "expires_in": tokens["expiresIn"],
+            "token_type": "Bearer",
+            "user_id": user["localId"],
+            "project_id": PROJECT_ID,
+        }
+
+    def handle(self, method: str, path: str, body: bytes, content_type: str = "") -> Tuple[int, Dict[str, Any]]:
+        """Dispatches one HTTP request.
+
+        Args:
+            method: HTTP method
+            path: Request path without the query string
+            body: Raw request body (JSON, or form-encoded for the token endpoint)
+            content_type: The request's Content-Type header
+
+        Returns:
+            Tuple of (HTTP status, JSON response body)
+        """
+        if method != "POST":
+            return _error("METHOD_NOT_ALLOWED", 405)
+        try:
+            if content_type.startswith("application/x-www-form-urlencoded"):
+                payload = dict(parse_qsl(body.decode()))
+            else:
+                payload = json.loads(body or b"{}")
+        except (UnicodeDecodeError, ValueError):
+            return _error("INVALID_PAYLOAD")
+        if not isinstance(payload, dict):
+            return _error("INVALID_PAYLOAD")
+
+        if path == SECURE_TOKEN_PATH:
+            return self.refresh_token(payload)
+        if path.startswith(IDENTITY_TOOLKIT_PREFIX):
+            endpoint = path[len(IDENTITY_TOOLKIT_PREFIX) :]
+            if endpoint == "signInWithPassword":
+                return self.sign_in_with_password(payload)
+            if endpoint == "signUp":
+                return self.sign_up(payload)
+        return _error("NOT_FOUND", 404)
+
+    def transport(self) -> httpx.MockTransport:
+        """An httpx transport answering requests in-process, for benchmarks without sockets."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            status, body = self.handle(
+                request.method, request.url.path, request.content, request.headers.get("content-type", "")
+            )
+            return httpx.Response(status, json=body)
+
+        return httpx.MockTransport(handler)
+
+
+def make_server(backend: LocalAuthBackend, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """An HTTP server exposing backend, one thread per connection."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            status, body = backend.handle(
+                "POST", urlsplit(self.path).path, self.rfile.read(length), self.headers.get("Content-Type", "")
+            )
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # one line per login would dominate a benchmark
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the Firebase Auth REST API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seed-users", type=int, default=0, help="number of synthetic users to create")
+    parser.add_argument("--password", default=SYNTHETIC_PASSWORD, help="password of the synthetic users")
+    args = parser.parse_args(argv)
+
+    backend = LocalAuthBackend()
+    if args.seed_users:
+        print(f"[LOCAL_AUTH] Seeded {backend.seed_users(args.seed_users, args.password)} synthetic users")
+    server = make_server(backend, args.host, args.port)
+    print(f"[LOCAL_AUTH] Serving on http://{args.host}:{args.port}, set FIREBASE_AUTH_EMULATOR_HOST={args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 import toml
 from pathlib import Path
 
+from Trust_Web.tracing import traced
+
 load_dotenv()
 
 PROMPT_TEMPLATE = """
@@ -22,6 +24,10 @@ client = OpenAI(
 )
 
 
+LLM_MODEL = "gpt-4.1-nano"
+
+
+@traced("llm.generate_response", **{"llm.model": LLM_MODEL})
 def generate_response(
     *,
     profile: dict,
@@ -47,7 +53,7 @@ def generate_response(
     )
 
     response = client.responses.create(
-        model="gpt-4.1-nano",
+        model=LLM_MODEL,
         instructions=instructions,
         input=prompt,
     )
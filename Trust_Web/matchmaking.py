@@ -0,0 +1,351 @@
+"""
+Matchmaking and round synchronization for the multi-participant public goods game.
+
+With multiplayer = true in the [public_goods] table of profiles/experiment.toml,
+participants play the public goods game with each other instead of with
+simulated computer players:
+
+- Matchmaker.join puts a participant in the lobby. A group forms as soon as
+  group_size participants are waiting, or lobby_timeout_seconds after the
+  first one arrived, in which case bots take the empty seats.
+- A Group holds the shared round state of its members, outside their session
+  states. A round closes once every active member has submitted (a barrier),
+  or round_timeout_seconds after it opened. A bot plays the seat of each
+  member who did not submit in time, and a member who missed
+  MAX_MISSED_ROUNDS rounds in a row no longer holds up the barrier until
+  they submit again.
+- Payoffs are computed once per round, when it closes, and every member
+  awaiting Group.wait_for_round receives the same GroupRound.
+
+Everything runs on the backend's event loop: a waiting participant is a
+pending future, a round deadline is one loop timer, so one process holds
+hundreds of groups. Groups live in the memory of the process that formed
+them, so with several backend workers (see state_store.py) participants are
+matched within their worker, and their sessions must stay on it.
+"""
+
+import asyncio
+import dataclasses
+import logging
+import random
+import uuid
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set
+
+from .metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Defaults for settings missing from the [public_goods] table of profiles/experiment.toml
+GROUP_SIZE = 5
+LOBBY_TIMEOUT_SECONDS = 60.0
+ROUND_TIMEOUT_SECONDS = 90.0
+
+# Rounds in a row a member may miss before the barrier stops waiting for them
+MAX_MISSED_ROUNDS = 2
+
+# Seat names of the bots filling a group, e.g. "bot-1"
+BOT_PREFIX = "bot-"
+
+LOBBY_PLAYERS = REGISTRY.register(
+    Gauge("trust_web_matchmaking_lobby_players", "Participants waiting in the lobby for a group.")
+)
+ACTIVE_GROUPS = REGISTRY.register(Gauge("trust_web_matchmaking_groups", "Groups playing the public goods game."))
+BOT_SEATS = REGISTRY.register(
+    Counter(
+        "trust_web_matchmaking_bot_seats_total",
+        "Seats played by a bot in a round, because the group was not full or a member missed the deadline.",
+        ["reason"],
+    )
+)
+
+
+class MatchmakingError(Exception):
+    """A submission the group cannot accept."""
+
+
+@dataclasses.dataclass(frozen=True)
+class GroupSettings:
+    """Settings a group is formed with; participants are only matched with the same settings."""
+
+    group_size: int
+    initial_endowment: int
+    multiplier: float
+    total_rounds: int
+    lobby_timeout: float = LOBBY_TIMEOUT_SECONDS
+    round_timeout: float = ROUND_TIMEOUT_SECONDS
+
+    @classmethod
+    def from_config(cls, settings: Mapping[str, Any]) -> "GroupSettings":
+        """Settings from a [public_goods] table already merged with its defaults."""
+        return cls(
+            group_size=int(settings.get("group_size", GROUP_SIZE)),
+            initial_endowment=int(settings["initial_endowment"]),
+            multiplier=float(settings["multiplier"]),
+            total_rounds=int(settings["total_rounds"]),
+            lobby_timeout=float(settings.get("lobby_timeout_seconds", LOBBY_TIMEOUT_SECONDS)),
+            round_timeout=float(settings.get("round_timeout_seconds", ROUND_TIMEOUT_SECONDS)),
+        )
+
+
+def is_bot(seat: str) -> bool:
+    return seat.startswith(BOT_PREFIX)
+
+
+def bot_contribution(balance: int) -> int:
+    """A bot contributes like the single-player game's computer players: up to half its balance."""
+    return random.randint(0, balance // 2) if balance > 0 else 0
+
+
+@dataclasses.dataclass
+class GroupRound:
+    """Outcome of one round, the same for every member. Lists follow the group's seats."""
+
+    round: int  # 0-indexed
+    seats: List[str]
+    contributions: List[int]
+    substituted: List[str]  # Members a bot played for in this round
+    total_contribution: int
+    multiplied_pool: float
+    per_share: float
+    payoffs: List[float]
+    balances: List[int]  # After this round
+    finished: bool  # Last round of the game
+
+    def others(self, values: List[Any], player_id: str) -> List[Any]:
+        """values without player_id's seat, e.g. the other members' contributions."""
+        seat = self.seats.index(player_id)
+        return values[:seat] + values[seat + 1 :]
+
+
+class Group:
+    """Shared round state of one group, settled once per round for all members."""
+
+    def __init__(self, group_id: str, players: List[str], settings: GroupSettings, on_finished: Callable[["Group"], None]):
+        self.group_id = group_id
+        self.settings = settings
+        bots = settings.group_size - len(players)
+        self.seats = players + [f"{BOT_PREFIX}{i}" for i in range(1, bots + 1)]
+        self.balances = [settings.initial_endowment] * len(self.seats)
+        self.rounds: List[GroupRound] = []
+        self._on_finished = on_finished
+        self._contributions: Dict[str, int] = {}
+        self._missed: Dict[str, int] = {}
+        self._absent: Set[str] = set()  # Members the barrier does not wait for
+        self._settled = asyncio.Event()
+        self._deadline: Optional[asyncio.TimerHandle] = None
+        self._open_round()
+
+    @property
+    def players(self) -> List[str]:
+        return [seat for seat in self.seats if not is_bot(seat)]
+
+    @property
+    def current_round(self) -> int:
+        return len(self.rounds)
+
+    @property
+    def finished(self) -> bool:
+        return self.current_round >= self.settings.total_rounds
+
+    def balance(self, player_id: str) -> int:
+        return self.balances[self.seats.index(player_id)]
+
+    def submit(self, player_id: str, round_number: int, contribution: int) -> None:
+        """Records player_id's contribution to round_number, closing the round if it was the last one missing.
+
+        Raises:
+            MatchmakingError: If the round already closed or the contribution is out of range
+        """
+        if player_id not in self.players:
+            raise MatchmakingError(f"{player_id} is not a member of group {self.group_id}.")
+        if round_number != self.current_round or self.finished:
+            raise MatchmakingError(f"Round {round_number + 1} has already closed.")
+        max_contribution = self.balance(player_id) // 2
+        if not 0 <= contribution <= max_contribution:
+            raise MatchmakingError(f"Contribution must be between 0 and {max_contribution}.")
+        self._contributions[player_id] = contribution
+        self._absent.discard(player_id)  # A member who comes back holds up the barrier again
+        self._missed.pop(player_id, None)
+        self._close_if_complete()
+
+    def leave(self, player_id: str) -> None:
+        """Stops waiting for player_id; a bot plays their seat until they submit again."""
+        if player_id in self.players and not self.finished:
+            self._absent.add(player_id)
+            self._close_if_complete()
+
+    async def wait_for_round(self, round_number: int) -> GroupRound:
+        """The outcome of round_number, once the round has closed."""
+        if round_number >= self.settings.total_rounds:
+            raise MatchmakingError(f"The game has only {self.settings.total_rounds} rounds.")
+        while round_number >= len(self.rounds):
+            await self._settled.wait()
+        return self.rounds[round_number]
+
+    def _open_round(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._deadline = loop.call_later(self.settings.round_timeout, self._on_deadline, self.current_round)
+        self._close_if_complete()
+
+    def _on_deadline(self, round_number: int) -> None:
+        if round_number == self.current_round and not self.finished:
+            logger.debug("Round %d of group %s timed out", round_number + 1, self.group_id)
+            self._close_round()
+
+    def _close_if_complete(self) -> None:
+        waiting_for = [p for p in self.players if p not in self._absent and p not in self._contributions]
+        if not waiting_for:
+            self._close_round()
+
+    def _close_round(self) -> None:
+        if self._deadline is not None:
+            self._deadline.cancel()
+            self._deadline = None
+
+        contributions = []
+        substituted = []
+        for seat, balance in zip(self.seats, self.balances):
+            if seat in self._contributions:
+                contributions.append(self._contributions[seat])
+                continue
+            contributions.append(bot_contribution(balance))
+            if not is_bot(seat):
+                substituted.append(seat)
+                self._missed[seat] = self._missed.get(seat, 0) + 1
+                if self._missed[seat] >= MAX_MISSED_ROUNDS:
+                    self._absent.add(seat)
+        if len(self.seats) > len(self.players):
+            BOT_SEATS.inc(len(self.seats) - len(self.players), reason="unfilled")
+        if substituted:
+            BOT_SEATS.inc(len(substituted), reason="missed_deadline")
+
+        total_contribution = sum(contributions)
+        multiplied_pool = total_contribution * self.settings.multiplier
+        per_share = multiplied_pool / len(self.seats)
+        payoffs = [per_share - contribution for contribution in contributions]
+        self.balances = [balance + int(payoff) for balance, payoff in zip(self.balances, payoffs)]
+        self._contributions = {}
+        self.rounds.append(
+            GroupRound(
+                round=len(self.rounds),
+                seats=list(self.seats),
+                contributions=contributions,
+                substituted=substituted,
+                total_contribution=total_contribution,
+                multiplied_pool=multiplied_pool,
+                per_share=per_share,
+                payoffs=payoffs,
+                balances=list(self.balances),
+                finished=len(self.rounds) + 1 >= self.settings.total_rounds,
+            )
+        )
+
+        # Wake the members waiting for this round; the next wait uses a fresh event
+        settled, self._settled = self._settled, asyncio.Event()
+        settled.set()
+
+        if self.finished:
+            logger.info("Group %s finished", self.group_id, extra={"group_id": self.group_id})
+            self._on_finished(self)
+        else:
+            self._open_round()
+
+
+@dataclasses.dataclass
+class _Lobby:
+    waiting: Dict[str, "asyncio.Future[Optional[Group]]"] = dataclasses.field(default_factory=dict)
+    deadline: Optional[asyncio.TimerHandle] = None
+
+
+class Matchmaker:
+    """Forms groups from the participants waiting in the lobby and keeps track of the groups playing."""
+
+    def __init__(self):
+        self._lobbies: Dict[GroupSettings, _Lobby] = {}
+        self._groups: Dict[str, Group] = {}
+        self._player_groups: Dict[str, str] = {}
+
+    def group(self, group_id: str) -> Optional[Group]:
+        """The group playing under group_id in this process, None once it finished."""
+        return self._groups.get(group_id)
+
+    def group_of(self, player_id: str) -> Optional[Group]:
+        return self._groups.get(self._player_groups.get(player_id, ""))
+
+    async def join(self, player_id: str, settings: GroupSettings) -> Optional[Group]:
+        """Waits in the lobby until player_id's group forms; joining again waits for the same group.
+
+        Returns:
+            The group, or None if player_id left the lobby before it formed
+        """
+        group = self.group_of(player_id)
+        if group is not None:
+            return group
+        lobby = self._lobbies.setdefault(settings, _Lobby())
+        future = lobby.waiting.get(player_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            lobby.waiting[player_id] = future
+            LOBBY_PLAYERS.inc()
+            if len(lobby.waiting) >= settings.group_size:
+                self._form_group(settings)
+            elif lobby.deadline is None:
+                lobby.deadline = asyncio.get_running_loop().call_later(
+                    settings.lobby_timeout, self._form_group, settings
+                )
+        # Shielded, so that a cancelled join does not cancel a second tab waiting for the same group;
+        # a participant who is gone for good is bot-substituted once the group plays
+        return await asyncio.shield(future)
+
+    def leave(self, player_id: str) -> None:
+        """Takes player_id out of the lobby, or lets a bot play their seat in their group."""
+        for settings, lobby in list(self._lobbies.items()):
+            future = lobby.waiting.pop(player_id, None)
+            if future is None:
+                continue
+            LOBBY_PLAYERS.dec()
+            if not future.done():
+                future.set_result(None)
+            if not lobby.waiting:
+                if lobby.deadline is not None:
+                    lobby.deadline.cancel()
+                del self._lobbies[settings]
+        group = self.group_of(player_id)
+        if group is not None:
+            group.leave(player_id)
+
+    def _form_group(self, settings: GroupSettings) -> None:
+        lobby = self._lobbies.pop(settings, None)
+        if lobby is None:
+            return
+        if lobby.deadline is not None:
+            lobby.deadline.cancel()
+        if not lobby.waiting:
+            return
+        LOBBY_PLAYERS.dec(len(lobby.waiting))
+
+        group = Group(uuid.uuid4().hex, list(lobby.waiting), settings, self._forget)
+        self._groups[group.group_id] = group
+        self._player_groups.update((player_id, group.group_id) for player_id in group.players)
+        ACTIVE_GROUPS.inc()
+        logger.info(
+            "Group %s formed with %d participants and %d bots",
+            group.group_id,
+            len(group.players),
+            len(group.seats) - len(group.players),
+            extra={"group_id": group.group_id},
+        )
+        for future in lobby.waiting.values():
+            if not future.done():
+                future.set_result(group)
+
+    def _forget(self, group: Group) -> None:
+        self._groups.pop(group.group_id, None)
+        for player_id in group.players:
+            if self._player_groups.get(player_id) == group.group_id:
+                del self._player_groups[player_id]
+        ACTIVE_GROUPS.dec()
+
+
+# Groups of this backend process
+MATCHMAKER = Matchmaker()
@@ -0,0 +1,287 @@
+"""
+In-process latency and error metrics, served in the Prometheus text format.
+
+Every event handler of the app's states (see instrument_event_handlers) and
+every firebase_db call (see instrument_firestore_call) records the following,
+and runs in a tracing span when tracing is on (see tracing.py):
+
+    *_duration_seconds  histogram of wall-clock time, including awaits
+    *_errors_total      counter of exceptions raised, by exception type
+    *_in_flight         gauge of calls currently running
+
+GET /metrics on the backend (mounted with metrics_api()) returns the current
+values for a Prometheus scrape. Values live in this process only and reset on
+restart, like any Prometheus client.
+"""
+
+import abc
+import bisect
+import dataclasses
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import reflex as rx
+from reflex.event import EventHandler
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from .tracing import event_span_attributes, start_span, wrap_calls
+
+METRICS_PATH = "/metrics"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; event handlers range from sub-millisecond setters to multi-second LLM calls
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Only the handlers of the app's own states are instrumented, not Reflex's internal ones
+APP_MODULE_PREFIX = "Trust_Web."
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """The metric's sample lines in the Prometheus text format."""
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(v)}" for key, v in values]
+
+
+class Gauge(Counter):
+    """Value that goes up and down."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, ([*series[0]], series[1], series[2])) for key, series in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics served on METRICS_PATH."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics)
+
+
+REGISTRY = MetricsRegistry()
+
+EVENT_DURATION = REGISTRY.register(
+    Histogram("trust_web_event_duration_seconds", "Event handler wall-clock time.", ["handler"])
+)
+EVENT_ERRORS = REGISTRY.register(
+    Counter("trust_web_event_errors_total", "Exceptions raised by event handlers.", ["handler", "error"])
+)
+EVENTS_IN_FLIGHT = REGISTRY.register(Gauge("trust_web_events_in_flight", "Event handlers running.", ["handler"]))
+
+FIRESTORE_DURATION = REGISTRY.register(
+    Histogram("trust_web_firestore_call_duration_seconds", "firebase_db call wall-clock time.", ["operation"])
+)
+FIRESTORE_ERRORS = REGISTRY.register(
+    Counter("trust_web_firestore_errors_total", "Exceptions raised by firebase_db calls.", ["operation", "error"])
+)
+FIRESTORE_IN_FLIGHT = REGISTRY.register(
+    Gauge("trust_web_firestore_calls_in_flight", "firebase_db calls running.", ["operation"])
+)
+
+
+@contextmanager
+def track(duration: Histogram, errors: Counter, in_flight: Gauge, **labels: str) -> Iterator[None]:
+    """Times the block into duration, counting it in in_flight and any exception in errors."""
+    in_flight.inc(**labels)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        errors.inc(error=type(e).__name__, **labels)
+        raise
+    finally:
+        duration.observe(time.perf_counter() - start, **labels)
+        in_flight.dec(**labels)
+
+
+def instrument(
+    fn: Callable,
+    duration: Histogram,
+    errors: Counter,
+    in_flight: Gauge,
+    span_name: Optional[str] = None,
+    span_attributes: Optional[Callable[..., Dict[str, Any]]] = None,
+    **labels: str,
+) -> Callable:
+    """Wraps fn with track(), keeping it a plain, async, generator or async generator function.
+
+    Generators are timed until exhausted, so a handler yielding intermediate
+    updates is measured end to end.
+
+    Args:
+        span_name: If given, each call also runs in a tracing span of that name
+        span_attributes: Called with fn's arguments, returns the span's attributes
+    """
+
+    @contextmanager
+    def observe(args: tuple, kwargs: dict) -> Iterator[None]:
+        with track(duration, errors, in_flight, **labels):
+            if span_name is None:
+                yield
+                return
+            attributes = span_attributes(*args, **kwargs) if span_attributes is not None else {}
+            with start_span(span_name, **attributes):
+                yield
+
+    return wrap_calls(fn, observe)
+
+
+def instrument_firestore_call(fn: Callable) -> Callable:
+    """Decorator for firebase_db functions, labelled with the function name."""
+    return instrument(
+        fn,
+        FIRESTORE_DURATION,
+        FIRESTORE_ERRORS,
+        FIRESTORE_IN_FLIGHT,
+        span_name=f"firestore.{fn.__name__}",
+        operation=fn.__name__,
+    )
+
+
+def _handler_span_attributes(label: str, state: Any, *args, **kwargs) -> Dict[str, Any]:
+    return {"reflex.handler": label, **event_span_attributes(state)}
+
+
+def instrument_event_handlers(state_cls: type = rx.State) -> int:
+    """Wraps the event handlers of state_cls and its substates defined in this app, timing and tracing them.
+
+    Only the handlers Reflex dispatches events to (the event_handlers table)
+    are replaced, so component references to the handlers are unaffected.
+
+    Returns:
+        The number of handlers instrumented
+    """
+    count = 0
+    if state_cls.__module__.startswith(APP_MODULE_PREFIX):
+        for name, handler in list(state_cls.event_handlers.items()):
+            if type(handler) is not EventHandler or getattr(handler.fn, "_instrumented", False):
+                continue
+            label = f"{state_cls.__name__}.{name}"
+            wrapped = instrument(
+                handler.fn,
+                EVENT_DURATION,
+                EVENT_ERRORS,
+                EVENTS_IN_FLIGHT,
+                span_name=f"handler {label}",
+                span_attributes=functools.partial(_handler_span_attributes, label),
+                handler=label,
+            )
+            wrapped._instrumented = True
+            state_cls.event_handlers[name] = dataclasses.replace(handler, fn=wrapped)
+            count += 1
+    for substate in state_cls.get_substates():
+        count += instrument_event_handlers(substate)
+    return count
+
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def metrics_api() -> Starlette:
+    """API app serving METRICS_PATH, for rx.App(api_transformer=...)."""
+    return Starlette(routes=[Route(METRICS_PATH, metrics_endpoint)])
@@ -1,29 +1,61 @@
+import asyncio
+import datetime
+import logging
 import random
-from typing import List
+from typing import Any, Dict, List
 import reflex as rx
 from .firebase_db import save_experiment_data
+from .identity_state import IdentityState
+from .config_state import PinnedConfigMixin
+from .matchmaking import (
+    GROUP_SIZE,
+    LOBBY_TIMEOUT_SECONDS,
+    MATCHMAKER,
+    ROUND_TIMEOUT_SECONDS,
+    GroupRound,
+    GroupSettings,
+    MatchmakingError,
+)
+from .state_store import CompactStateMixin
 # from Trust_Web.trust_game_state import TrustGameState # Unused
 # from Trust_Web.authentication import AuthState # Unused
 # from reflex.utils import get_value # Unused
 
+logger = logging.getLogger(__name__)
 
+# Defaults for settings missing from the [public_goods] table of profiles/experiment.toml
 INITIAL_ENDOWMENT = 100
 MULTIPLIER = 1.5
 NUM_COMPUTER_PLAYERS = 4
 TOTAL_ROUNDS = 3
 
+EXPERIMENT_CONFIG = "experiment"
+PUBLIC_GOODS_DEFAULTS: Dict[str, Any] = {
+    "initial_endowment": INITIAL_ENDOWMENT,
+    "multiplier": MULTIPLIER,
+    "num_computer_players": NUM_COMPUTER_PLAYERS,
+    "total_rounds": TOTAL_ROUNDS,
+    # Multiplayer mode: participants play in groups formed by the matchmaker (see matchmaking.py)
+    "multiplayer": False,
+    "group_size": GROUP_SIZE,
+    "lobby_timeout_seconds": LOBBY_TIMEOUT_SECONDS,
+    "round_timeout_seconds": ROUND_TIMEOUT_SECONDS,
+}
 
-class PublicGoodState(rx.State):
+
+class PublicGoodState(PinnedConfigMixin, CompactStateMixin, rx.State):
     """
     State for the Public Goods Game.
     Handles user input, simulates computer players, and computes payoffs.
+
+    In multiplayer mode the other players are participants of the same group
+    (bots fill in for missing ones): the group computes the payoffs and
+    join_group applies each round's outcome to this state.
     """
 
     # User input
     human_contribution: int = 0
     contribution_error: str = ""
-    user_id: str = ""
-    user_email: str = ""
 
     # Game state
     current_round: int = 0
@@ -39,6 +71,13 @@ class PublicGoodState(rx.State):
     game_finished: bool = False
     game_began_at: str = ""
 
+    # Multiplayer mode
+    waiting_for_group: bool = False  # In the lobby until the group forms
+    waiting_for_round: bool = False  # Submitted, until the other members have
+    contribution_substituted: bool = False  # A bot contributed in the participant's place this round
+    _group_id: str = ""
+    _player_id: str = ""
+
     @rx.event
     def set_human_contribution(self, value: str) -> None:
         """Set the human player's contribution, with validation."""
@@ -55,7 +94,7 @@ class PublicGoodState(rx.State):
             self.human_contribution = 0  # 잘못된 입력 시 값을 0으로 리셋
 
     @rx.event
-    def play_game(self) -> None:
+    async def play_game(self) -> None:
         """
         Simulate the Public Goods Game round.
         - Accepts human contribution.
@@ -67,8 +106,17 @@ class PublicGoodState(rx.State):
         #     self.contribution_error = f"투자 가능한 금액은 0에서 {self.human_balance // 2} 사이입니다."
         #     return
 
+        if self._setting("multiplayer"):
+            self._submit_to_group()
+            return
+
+        if self.current_round == 0 and not self._config_version:
+            # First round: pin the session's configuration version and start from its endowment
+            self._pin_config()
+            self._reset_balances()
+
         # Total number of players is the number of computer players + 1 human player
-        total_players = NUM_COMPUTER_PLAYERS + 1
+        total_players = self.num_players
 
         # Simulate computer contributions (based on their current balance)
         # 컴퓨터는 현재 잔액의 절반 이하를 기여할 수 있다.
@@ -80,7 +128,7 @@ class PublicGoodState(rx.State):
         self.total_contribution = self.human_contribution + sum(self.computer_contributions)
 
         # Multiply the pool
-        self.multiplied_pool = self.total_contribution * MULTIPLIER
+        self.multiplied_pool = self.total_contribution * self._setting("multiplier")
 
         # Calculate per-participant share
         if total_players > 0:
@@ -102,7 +150,6 @@ class PublicGoodState(rx.State):
 
         # 게임 시작 시점 기록
         if not self.game_began_at:
-            import datetime
             self.game_began_at = datetime.datetime.now().isoformat()
 
         # Removed debug print statements for get_value
@@ -114,18 +161,8 @@ class PublicGoodState(rx.State):
         # print(f"type of get_value: {type(self.get_value('computer_contributions'))}")
         # print(f"type of get_value: {type(self.get_value('human_payoff'))}")
 
-        # user_id = str(AuthState.user_id) # Already commented out
-        # user_email = str(AuthState.user_email) # Already commented out
-        transaction = {
-            "user_id": self.user_id,
-            "user_email": self.user_email,
-            "game_name": "public_goods_game", # This can be kept or added by a potential helper in firebase_db
-            "game_began_at": self.game_began_at,
-            "round": self.current_round + 1,  # display_round_number와 맞추기 위해 +1
-            "human_contribution": self.human_contribution,
-            "computer_contributions": self.computer_contributions, # Use the list directly
-            "human_payoff": self.human_payoff,
-        }
+        identity = await self.get_state(IdentityState)
+        transaction = self._round_record(identity.user_id, identity.user_email)
         # The save_experiment_data function in firebase_db.py expects (user_id, game_name, data, ...)
         # The transaction dict already contains user_id and game_name, but save_experiment_data
         # also takes them as top-level arguments.
@@ -138,8 +175,115 @@ class PublicGoodState(rx.State):
         # However, to minimize changes if save_experiment_data relies on these fields in `data`,
         # I'll leave them for now, but ideally they would be removed from the dict sent to firebase if already params.
         # For this refactor, only get_value is changed.
-        save_experiment_data(user_id=self.user_id, game_name="public_goods_game", data=data_for_db)
+        await asyncio.to_thread(
+            save_experiment_data,
+            user_id=identity.user_id,
+            game_name="public_goods_game",
+            data=data_for_db,
+            document_id=f"round_{data_for_db['round']}",  # Deterministic, so a repeated click overwrites instead of duplicating
+        )
 
+    def _round_record(self, user_id: str, user_email: str) -> Dict[str, Any]:
+        """The document saved for the round just played."""
+        record = {
+            "user_id": user_id,
+            "user_email": user_email,
+            "game_name": "public_goods_game", # This can be kept or added by a potential helper in firebase_db
+            "game_began_at": self.game_began_at,
+            "round": self.current_round + 1,  # display_round_number와 맞추기 위해 +1
+            "human_contribution": self.human_contribution,
+            "computer_contributions": list(self.computer_contributions), # A plain copy, saved outside the state lock in multiplayer mode
+            "human_payoff": self.human_payoff,
+        }
+        if self._group_id:
+            record["group_id"] = self._group_id
+            record["contribution_substituted"] = self.contribution_substituted
+        return record
+
+    def _submit_to_group(self) -> None:
+        """Submits the contribution to the group's current round; join_group applies the outcome."""
+        group = MATCHMAKER.group(self._group_id)
+        if group is None:
+            self.contribution_error = "The group is no longer playing. Please reload the page."
+            logger.warning("Contribution for unknown group %s", self._group_id, extra={"user_id": self._player_id})
+            return
+        try:
+            group.submit(self._player_id, self.current_round, self.human_contribution)
+        except MatchmakingError as e:
+            self.contribution_error = str(e)
+            return
+        self.waiting_for_round = True
+
+    def _apply_group_round(self, outcome: GroupRound) -> None:
+        """Shows the group's outcome of a round from this participant's seat."""
+        player_id = self._player_id
+        seat = outcome.seats.index(player_id)
+        self.current_round = outcome.round
+        self.human_contribution = outcome.contributions[seat]
+        self.computer_contributions = outcome.others(outcome.contributions, player_id)
+        self.total_contribution = outcome.total_contribution
+        self.multiplied_pool = outcome.multiplied_pool
+        self.per_share = outcome.per_share
+        self.human_payoff = outcome.payoffs[seat]
+        self.computer_payoffs = outcome.others(outcome.payoffs, player_id)
+        self.human_balance = outcome.balances[seat]
+        self.computer_balances = outcome.others(outcome.balances, player_id)
+        self.contribution_substituted = player_id in outcome.substituted
+        self.contribution_error = ""
+        self.waiting_for_round = False
+        self.game_played = True
+
+    @rx.event(background=True)
+    async def join_group(self):
+        """Waits in the lobby for a group, then applies each round's outcome as soon as the group settles it.
+
+        Runs for the whole game, so the outcome reaches the participant even if
+        they were waiting on the results of the previous round or a bot had to
+        play for them. Does nothing in single-player mode.
+        """
+        async with self:
+            if not self._setting("multiplayer") or self.game_finished:
+                return
+            if self.game_played and self.current_round + 1 >= self._setting("total_rounds"):
+                return  # The group has played its last round; prepare_next_round finishes the game
+            if MATCHMAKER.group(self._group_id) is not None:
+                return  # Already following its group, e.g. after a page reload
+            if self._group_id:
+                # The group was lost with the process it ran in
+                logger.warning("Group %s is gone, starting over", self._group_id, extra={"user_id": self._player_id})
+                self.reset_game()
+            identity = await self.get_state(IdentityState)
+            if not identity.user_id:
+                return
+            user_id, user_email = identity.user_id, identity.user_email
+            self._pin_config()
+            self._reset_balances()
+            settings = GroupSettings.from_config({name: self._setting(name) for name in PUBLIC_GOODS_DEFAULTS})
+            self._player_id = user_id
+            self.waiting_for_group = True
+
+        group = await MATCHMAKER.join(user_id, settings)
+        async with self:
+            if group is None or self._player_id != user_id:
+                return  # Left the lobby, e.g. by logging out
+            self._group_id = group.group_id
+            self.waiting_for_group = False
+            self.game_began_at = datetime.datetime.now().isoformat()
+
+        for round_number in range(settings.total_rounds):
+            outcome = await group.wait_for_round(round_number)
+            async with self:
+                if self._group_id != group.group_id:
+                    return  # The game was reset
+                self._apply_group_round(outcome)
+                record = self._round_record(user_id, user_email)
+            await asyncio.to_thread(
+                save_experiment_data,
+                user_id=user_id,
+                game_name="public_goods_game",
+                data=record,
+                document_id=f"round_{record['round']}",
+            )
 
     @rx.event
     def prepare_next_round(self) -> None:
@@ -148,7 +292,7 @@ class PublicGoodState(rx.State):
         self.game_played = False
         self.human_contribution = 0
         self.contribution_error = ""
-        if self.current_round >= TOTAL_ROUNDS:
+        if self.current_round >= self.total_rounds:
             self.game_finished = True
         # Results like total_contribution, multiplied_pool, per_share, human_payoff, computer_contributions, computer_payoffs
         # will be recalculated and overwritten in the next play_game call.
@@ -162,20 +306,44 @@ class PublicGoodState(rx.State):
         self.multiplied_pool = 0.0
         self.per_share = 0.0
         self.human_payoff = 0.0
-        self.computer_payoffs = [0.0] * NUM_COMPUTER_PLAYERS  # Reset payoffs
         self.game_played = False
         self.contribution_error = ""
         self.current_round = 0
-        self.human_balance = INITIAL_ENDOWMENT
-        self.computer_balances = [INITIAL_ENDOWMENT] * NUM_COMPUTER_PLAYERS
+        if self._player_id:
+            MATCHMAKER.leave(self._player_id)  # A bot plays the seat for the rest of the game
+        self._group_id = ""
+        self._player_id = ""
+        self.waiting_for_group = False
+        self.waiting_for_round = False
+        self.contribution_substituted = False
+        self._unpin_config()  # The next game starts on the latest configuration version
+        self._reset_balances()
         self.game_finished = False
 
-    @rx.event
-    def set_user_identity(self, user_id: str, user_email: str):
-        """Sets the user ID and email for the public goods state."""
-        print(f"[DEBUG] Setting user identity in PublicGoodState: {user_id}, {user_email}")
-        self.user_id = user_id
-        self.user_email = user_email
+    def _setting(self, name: str) -> Any:
+        """A [public_goods] setting of the pinned configuration version."""
+        return self._config(EXPERIMENT_CONFIG).get("public_goods", {}).get(name, PUBLIC_GOODS_DEFAULTS[name])
+
+    def _num_players(self) -> int:
+        if self._setting("multiplayer"):
+            return self._setting("group_size")
+        return self._setting("num_computer_players") + 1
+
+    def _reset_balances(self):
+        num_computer_players = self._num_players() - 1
+        self.human_balance = self._setting("initial_endowment")
+        self.computer_balances = [self._setting("initial_endowment")] * num_computer_players
+        self.computer_payoffs = [0.0] * num_computer_players
+
+    @rx.var
+    def total_rounds(self) -> int:
+        """Rounds per game in the pinned configuration version."""
+        return self._setting("total_rounds")
+
+    @rx.var
+    def num_players(self) -> int:
+        """Number of players including the participant."""
+        return self._num_players()
 
     @rx.var
     def computer_contributions_str(self) -> str:
@@ -187,8 +355,8 @@ class PublicGoodState(rx.State):
     @rx.var
     def display_round_number(self) -> int:
         """Returns the 1-indexed current round number for display."""
-        if self.game_finished and self.current_round == TOTAL_ROUNDS:
-            return TOTAL_ROUNDS
+        if self.game_finished and self.current_round == self.total_rounds:
+            return self.total_rounds
         return self.current_round + 1
 
     @rx.var
@@ -206,19 +374,9 @@ class PublicGoodState(rx.State):
         """Return the human payoff formatted to 0 decimal places."""
         return f"{self.human_payoff:.0f}"
 
-    @rx.event_handler("auth.logout_event")
+    @rx.event
     def handle_logout_event(self):
-        """Handles the logout event emitted by AuthState."""
-        print("[PublicGoodState] Received logout event. Resetting game.")
+        """Resets the game when AuthState.logout signs the participant out."""
+        logger.debug("Logout, resetting the public goods game")
         self.reset_game() # Call existing reset method
 
-    @rx.event_handler("auth.set_user_identity")
-    def handle_set_user_identity(self, payload: dict):
-        """Handles the set_user_identity event emitted by AuthState."""
-        user_id = payload.get("user_id")
-        user_email = payload.get("user_email")
-        if user_id is not None and user_email is not None:
-            print(f"[PublicGoodState] Received set_user_identity event. User ID: {user_id}, Email: {user_email}")
-            self.set_user_identity(user_id, user_email) # Call existing method
-        else:
-            print("[PublicGoodState] Error: Received set_user_identity event with missing user_id or user_email.")
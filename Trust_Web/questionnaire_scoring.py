@@ -0,0 +1,291 @@
+"""
+Vectorized scoring of the questionnaires defined in profiles/questionnaires.toml.
+
+Each questionnaire is compiled once per configuration version into NumPy
+arrays: a reverse-coding mask over its items and a 0/1 scale matrix with one
+row per reported scale, the total first and then the subscales of its optional
+`[<NAME>.subscales]` table (lists of 1-indexed items). Scoring one participant
+or a whole cohort is the same pass over a (participants x items) response
+matrix: reflect the reverse-coded columns, then one matrix product with the
+scale matrix.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config_registry import get_config_snapshot
+
+logger = logging.getLogger(__name__)
+
+QUESTIONNAIRES_CONFIG = "questionnaires"
+
+TOTAL_SCALE = "total"
+
+# Encoded value of an unanswered item
+MISSING_RESPONSE = -1
+
+# Packed answers: one ASCII character per item, the answer's digit or PACKED_MISSING
+PACKED_MISSING = "-"
+MAX_LIKERT_LEVEL = 10  # Answers must fit in one digit
+
+
+class QuestionnaireScoringError(ValueError):
+    """A questionnaire definition or a set of responses that cannot be scored."""
+
+
+def _item_indices(name: str, field: str, items_1_indexed: Any, num_items: int) -> np.ndarray:
+    """0-indexed positions of a list of 1-indexed item numbers, validated against num_items."""
+    if not isinstance(items_1_indexed, (tuple, list)):
+        raise QuestionnaireScoringError(f"'{field}' of '{name}' must be a list of item numbers.")
+    indices = np.asarray(items_1_indexed, dtype=np.int64).reshape(-1) - 1
+    if indices.size and (indices.min() < 0 or indices.max() >= num_items):
+        raise QuestionnaireScoringError(f"'{field}' of '{name}' refers to items outside 1..{num_items}.")
+    return indices
+
+
+@dataclass(frozen=True)
+class CompiledQuestionnaire:
+    """Scoring arrays of one questionnaire; build with compile_questionnaire."""
+
+    name: str
+    likert_level: int
+    num_items: int
+    reverse_mask: np.ndarray  # bool (num_items,), True for reverse-coded items
+    scale_names: Tuple[str, ...]  # TOTAL_SCALE, then the subscales in TOML order
+    scale_matrix: np.ndarray  # int64 (num_scales, num_items), 1 where the item counts towards the scale
+
+    def encode(self, responses: Sequence[Sequence[Any]]) -> np.ndarray:
+        """Converts the responses of several participants to an int64 matrix.
+
+        Args:
+            responses: One sequence of num_items answers per participant; answers are
+                strings ("0", "1", ...), ints, or None when unanswered. An integer array
+                (e.g. from unpack_answers) is used as is, MISSING_RESPONSE marking unanswered items
+
+        Returns:
+            (participants x num_items) matrix, MISSING_RESPONSE for unanswered items
+
+        Raises:
+            QuestionnaireScoringError: If a participant has the wrong number of answers
+                or an answer is not an integer
+        """
+        if isinstance(responses, np.ndarray) and responses.dtype.kind in "iu":
+            if responses.shape[-1] != self.num_items:
+                raise QuestionnaireScoringError(f"Expected {self.num_items} responses per participant for '{self.name}'.")
+            return responses.reshape(-1, self.num_items).astype(np.int64)
+        if any(len(row) != self.num_items for row in responses):
+            raise QuestionnaireScoringError(f"Expected {self.num_items} responses per participant for '{self.name}'.")
+        answers = np.empty((len(responses), self.num_items), dtype=object)
+        answers[:] = responses
+        answers[np.equal(answers, None)] = MISSING_RESPONSE
+        try:
+            return answers.astype(np.int64)
+        except (TypeError, ValueError):
+            for value in answers.ravel():  # Only reached on bad input, to name the offending answer
+                try:
+                    int(value)
+                except (TypeError, ValueError):
+                    raise QuestionnaireScoringError(f"Non-integer string response ('{value}').") from None
+            raise
+
+    def valid_rows(self, matrix: np.ndarray) -> np.ndarray:
+        """Boolean mask of the participants whose every answer is within 0..likert_level-1."""
+        return ((matrix >= 0) & (matrix < self.likert_level)).all(axis=1)
+
+    def score_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """Scores an encoded (participants x num_items) matrix.
+
+        Returns:
+            float64 (participants x num_scales) matrix ordered like scale_names, NaN
+            for participants with unanswered or out-of-range items
+        """
+        reflected = np.where(self.reverse_mask, (self.likert_level - 1) - matrix, matrix)
+        scores = (reflected @ self.scale_matrix.T).astype(np.float64)
+        scores[~self.valid_rows(matrix)] = np.nan
+        return scores
+
+    def score_batch(self, responses: Sequence[Sequence[Any]]) -> Dict[str, np.ndarray]:
+        """Scores a cohort in one pass.
+
+        Returns:
+            Scale name -> float64 array with one score per participant (NaN if incomplete)
+        """
+        scores = self.score_matrix(self.encode(responses))
+        return {scale: scores[:, column] for column, scale in enumerate(self.scale_names)}
+
+    def score(self, responses: Sequence[Any]) -> Dict[str, int]:
+        """Scores one participant.
+
+        Returns:
+            Scale name -> score, TOTAL_SCALE first
+
+        Raises:
+            QuestionnaireScoringError: If an item is unanswered or an answer is invalid
+        """
+        matrix = self.encode(responses if isinstance(responses, np.ndarray) else [responses])
+        if (matrix == MISSING_RESPONSE).any():
+            raise QuestionnaireScoringError(f"Not all items answered for '{self.name}'.")
+        if not self.valid_rows(matrix)[0]:
+            raise QuestionnaireScoringError(
+                f"Responses for '{self.name}' must be between 0 and {self.likert_level - 1}."
+            )
+        scores = self.score_matrix(matrix)[0]
+        return {scale: int(score) for scale, score in zip(self.scale_names, scores)}
+
+
+def compile_questionnaire(name: str, config: Mapping[str, Any]) -> CompiledQuestionnaire:
+    """Compiles one questionnaire table of questionnaires.toml.
+
+    Raises:
+        QuestionnaireScoringError: If likert_level or items are missing, or reverse_coding
+            or a subscale refers to items that do not exist
+    """
+    likert_level = config.get("likert_level")
+    if not isinstance(likert_level, int) or likert_level < 2:
+        raise QuestionnaireScoringError(f"Likert level not defined for '{name}'.")
+    if likert_level > MAX_LIKERT_LEVEL:
+        raise QuestionnaireScoringError(f"Likert level of '{name}' exceeds {MAX_LIKERT_LEVEL}.")
+    items = config.get("items")
+    if not isinstance(items, (tuple, list)) or not items:
+        raise QuestionnaireScoringError(f"Questionnaire '{name}' has no items.")
+    num_items = len(items)
+
+    reverse_mask = np.zeros(num_items, dtype=bool)
+    reverse_mask[_item_indices(name, "reverse_coding", config.get("reverse_coding", ()), num_items)] = True
+
+    subscales = config.get("subscales", {})
+    if not isinstance(subscales, Mapping):
+        raise QuestionnaireScoringError(f"'subscales' of '{name}' must be a table.")
+    scale_names = (TOTAL_SCALE, *subscales.keys())
+    scale_matrix = np.zeros((len(scale_names), num_items), dtype=np.int64)
+    scale_matrix[0] = 1
+    for row, (subscale, subscale_items) in enumerate(subscales.items(), start=1):
+        scale_matrix[row, _item_indices(name, f"subscales.{subscale}", subscale_items, num_items)] = 1
+
+    reverse_mask.flags.writeable = False  # Shared by every session of the config version
+    scale_matrix.flags.writeable = False
+    return CompiledQuestionnaire(
+        name=name,
+        likert_level=likert_level,
+        num_items=num_items,
+        reverse_mask=reverse_mask,
+        scale_names=scale_names,
+        scale_matrix=scale_matrix,
+    )
+
+
+def empty_answers(num_items: int) -> np.ndarray:
+    """int8 answers of a questionnaire nobody has started: every item MISSING_RESPONSE."""
+    return np.full(num_items, MISSING_RESPONSE, dtype=np.int8)
+
+
+def pack_answers(answers: np.ndarray) -> str:
+    """Packs int8 answers into their storage form, e.g. [0, 3, -1] -> "03-"."""
+    codes = np.where(answers == MISSING_RESPONSE, ord(PACKED_MISSING), answers.astype(np.int16) + ord("0"))
+    return codes.astype(np.uint8).tobytes().decode("ascii")
+
+
+def unpack_answers(packed: str) -> np.ndarray:
+    """Inverse of pack_answers.
+
+    Raises:
+        QuestionnaireScoringError: If packed contains anything but digits and PACKED_MISSING
+    """
+    try:
+        codes = np.frombuffer(packed.encode("ascii"), dtype=np.uint8)
+    except UnicodeEncodeError:
+        raise QuestionnaireScoringError(f"Invalid packed answers '{packed}'.") from None
+    missing = codes == ord(PACKED_MISSING)
+    digits = codes.astype(np.int16) - ord("0")
+    if not (missing | ((digits >= 0) & (digits <= 9))).all():
+        raise QuestionnaireScoringError(f"Invalid packed answers '{packed}'.")
+    return np.where(missing, MISSING_RESPONSE, digits).astype(np.int8)
+
+
+def answers_from_document(data: Mapping[str, Any], num_items: int) -> Optional[np.ndarray]:
+    """int8 answers of a saved questionnaire document.
+
+    Reads the packed "responses_packed" field, or the list of strings older
+    documents stored under "responses".
+
+    Returns:
+        The answers, or None if the document has none or they do not have num_items items
+    """
+    try:
+        if isinstance(data.get("responses_packed"), str):
+            answers = unpack_answers(data["responses_packed"])
+        elif isinstance(data.get("responses"), list):
+            answers = np.array(
+                [MISSING_RESPONSE if value is None else int(value) for value in data["responses"]], dtype=np.int8
+            )
+        else:
+            return None
+    except (QuestionnaireScoringError, TypeError, ValueError, OverflowError):
+        return None
+    return answers if answers.shape == (num_items,) else None
+
+
+_compiled_lock = threading.Lock()
+_compiled_by_version: Dict[str, Dict[str, CompiledQuestionnaire]] = {}
+
+
+def get_compiled_questionnaires(version: Optional[str] = None) -> Dict[str, CompiledQuestionnaire]:
+    """Compiled questionnaires of a configuration version, compiled on first use.
+
+    Questionnaires whose definition cannot be compiled are left out (and logged).
+
+    Args:
+        version: The pinned config version, None for the latest
+
+    Returns:
+        Questionnaire name -> CompiledQuestionnaire
+    """
+    snapshot = get_config_snapshot(version)
+    compiled = _compiled_by_version.get(snapshot.version)
+    if compiled is not None:
+        return compiled
+    with _compiled_lock:
+        compiled = _compiled_by_version.get(snapshot.version)
+        if compiled is None:
+            compiled = {}
+            for name, config in snapshot.get(QUESTIONNAIRES_CONFIG).items():
+                if not isinstance(config, Mapping):
+                    continue
+                try:
+                    compiled[name] = compile_questionnaire(name, config)
+                except QuestionnaireScoringError as e:
+                    logger.error("Skipping '%s' in config version %s: %s", name, snapshot.version, e)
+            _compiled_by_version[snapshot.version] = compiled
+    return compiled
+
+
+def score_cohort(
+    name: str, responses_by_participant: Mapping[str, Sequence[Any]], version: Optional[str] = None
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """Scores the saved responses of many participants, e.g. for offline analysis of exports.
+
+    Args:
+        name: Questionnaire name, e.g. "DASS"
+        responses_by_participant: Participant ID -> that participant's responses
+        version: Config version the responses were collected under, None for the latest
+
+    Returns:
+        Participant ID -> {scale name: score, None if the responses are incomplete}
+
+    Raises:
+        KeyError: If name is not a compiled questionnaire
+        QuestionnaireScoringError: If a participant's responses cannot be encoded
+    """
+    compiled = get_compiled_questionnaires(version)[name]
+    participant_ids: List[str] = list(responses_by_participant)
+    scores = compiled.score_matrix(compiled.encode([responses_by_participant[pid] for pid in participant_ids]))
+    return {
+        pid: {
+            scale: (None if np.isnan(value) else float(value)) for scale, value in zip(compiled.scale_names, row)
+        }
+        for pid, row in zip(participant_ids, scores.tolist())
+    }
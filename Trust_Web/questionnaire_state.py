@@ -1,148 +1,195 @@
 import reflex as rx
-import toml
-from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Mapping, Optional, Any
+import asyncio
 import datetime
+import logging
+
+import numpy as np
 
 # Assuming firebase_db.py is in the same directory (Trust_Web)
-from .firebase_db import save_experiment_data, get_user_questionnaire_responses
+from .firebase_db import (
+    QUESTIONNAIRE_COLLECTION,
+    QUESTIONNAIRE_SUBMITTED_STATUS,
+    get_user_questionnaire_responses,
+    save_experiment_data,
+    save_questionnaire_draft,
+)
+from .identity_state import IdentityState
+from .instruction_state import InstructionState
+from .config_registry import CONFIG_FILES, PROFILES_DIR, thaw
+from .config_state import PinnedConfigMixin
+from .state_store import CompactStateMixin
+from .questionnaire_scoring import (
+    MISSING_RESPONSE,
+    TOTAL_SCALE,
+    QuestionnaireScoringError,
+    answers_from_document,
+    empty_answers,
+    get_compiled_questionnaires,
+    pack_answers,
+)
 # from .authentication import AuthState  # Import AuthState # Removed
 
-# Path to the questionnaires configuration file
-QUESTIONNAIRES_FILE_PATH: Path = Path(__file__).parent / "profiles" / "questionnaires.toml"
+logger = logging.getLogger(__name__)
+
+# Questionnaire configurations (profiles/questionnaires.toml) are served by the shared config registry
+QUESTIONNAIRES_CONFIG = "questionnaires"
+QUESTIONNAIRES_FILE_PATH = PROFILES_DIR / CONFIG_FILES[QUESTIONNAIRES_CONFIG]
 QUESTIONNAIRE_ORDER: List[str] = ["UCLA", "DASS", "TRUST"]
 
-# Path to the game rules configuration file
-GAME_RULES_FILE_PATH: Path = Path(__file__).parent / "profiles" / "game_rules.toml"
+# Items rendered per page; keeps the initial render and each page switch bounded for long questionnaires
+ITEMS_PER_PAGE = 10
+
+# Unsubmitted answers are saved as a draft at most this often, in one merged write per questionnaire
+DRAFT_FLUSH_SECONDS = 5.0
 
 
-class QuestionnaireState(rx.State):
+class QuestionnaireState(PinnedConfigMixin, CompactStateMixin, rx.State):
     """Manages questionnaire loading, response collection, scoring, and Firebase submission."""
 
-    user_id: str = ""  # This is the Firebase localId
-    user_email: str = ""  # Added to store user's email
+    _responses_loaded_for: str = ""  # user_id whose saved responses are loaded, "" before the first visit
     response_doc_ids: Dict[str, Optional[str]] = {}
 
     # Current questionnaire being managed
     current_questionnaire: str = QUESTIONNAIRE_ORDER[0]  # Default to the first questionnaire
 
-    # Internal state for configurations and responses
-    _raw_configs: Dict[str, Any] = {}
-    responses: Dict[str, List[Optional[str]]] = {}
+    # Answers per questionnaire as int8 arrays, MISSING_RESPONSE for unanswered items. Backend-only,
+    # so a click sends no answers to the client: the radio buttons keep their own selection.
+    _answers: Dict[str, np.ndarray] = {}
+    # Page of the current questionnaire being shown, 0-based
+    page_index: int = 0
+    # Packed answers of the current page when it was shown, the radio buttons' initial values
+    answer_defaults: str = ""
+    # Bumped with answer_defaults; keys the radio buttons so they pick the new defaults up
+    answers_revision: int = 0
     calculated_scores: Dict[str, Optional[int]] = {}
 
-    error_message: str = ""
+    # Questionnaires edited since their last draft save, and whether a flush_drafts_later task is pending
+    _dirty_drafts: List[str] = []
+    _draft_flush_scheduled: bool = False
 
-    def _ensure_configs_loaded(self):
-        """Loads questionnaire configurations from the TOML file if not already loaded."""
-        if not self._raw_configs:
-            try:
-                with open(QUESTIONNAIRES_FILE_PATH, "r", encoding="utf-8") as f:
-                    self._raw_configs = toml.load(f)
-
-                for name in QUESTIONNAIRE_ORDER:  # Ensure all ordered questionnaires are initialized
-                    if name in self._raw_configs:
-                        config_data = self._raw_configs[name]
-                        if "items" in config_data and isinstance(config_data["items"], list):
-                            self.responses[name] = [None] * len(config_data["items"])
-                        else:
-                            print(
-                                f"Warning: Questionnaire '{name}' in TOML is missing 'items' or 'items' is not a list."
-                            )
-                            # Potentially remove from QUESTIONNAIRE_ORDER or handle error if critical
-                    else:
-                        print(f"Warning: Questionnaire '{name}' from ORDER not found in TOML.")
-                        # Potentially remove from QUESTIONNAIRE_ORDER or handle error
+    error_message: str = ""
 
-            except FileNotFoundError:
-                self.error_message = f"Configuration file not found: {QUESTIONNAIRES_FILE_PATH}"
-                self._raw_configs = {}
-            except Exception as e:
-                print(f"Detailed error loading questionnaire TOML: {type(e).__name__}: {e}")
-                self.error_message = f"Error loading questionnaire configurations: {str(e)}"
-                self._raw_configs = {}
+    def _questionnaire_configs(self) -> Mapping[str, Any]:
+        """The shared, read-only questionnaire configurations; empty (with error_message set) on failure."""
+        try:
+            return self._config(QUESTIONNAIRES_CONFIG)
+        except FileNotFoundError:
+            self.error_message = f"Configuration file not found: {QUESTIONNAIRES_FILE_PATH}"
+        except Exception as e:
+            logger.exception("Error loading questionnaire TOML: %s", e)
+            self.error_message = f"Error loading questionnaire configurations: {str(e)}"
+        return {}
+
+    def _answers_for(self, questionnaire_name: str, configs: Mapping[str, Any]) -> np.ndarray:
+        """The session's answers to a questionnaire, all unanswered if it has none matching the items."""
+        num_items = len(configs.get(questionnaire_name, {}).get("items", ()))
+        answers = self._answers.get(questionnaire_name)
+        if answers is None or answers.shape != (num_items,):
+            answers = empty_answers(num_items)
+        return answers
+
+    def _current_config(self) -> Mapping[str, Any]:
+        """The frozen configuration of the current questionnaire, empty if unknown."""
+        return self._questionnaire_configs().get(self.current_questionnaire, {})
+
+    def _show_questionnaire(self, questionnaire_name: str, page_index: int = 0):
+        """Shows a page of questionnaire_name and sends that page's answers to the radio buttons."""
+        answers = self._answers_for(questionnaire_name, self._questionnaire_configs())
+        page_count = max(1, -(-answers.size // ITEMS_PER_PAGE))
+        page_index = min(max(page_index, 0), page_count - 1)
+        self.current_questionnaire = questionnaire_name
+        self.page_index = page_index
+        start = page_index * ITEMS_PER_PAGE
+        self.answer_defaults = pack_answers(answers[start : start + ITEMS_PER_PAGE])
+        self.answers_revision += 1
 
     @rx.event
-    def set_user_identity(self, user_id: str, user_email: str):
-        """Sets the user ID and email for the questionnaire state."""
-        print(f"[QUESTIONNAIRE_STATE] set_user_identity called with: id='{user_id}', email='{user_email}'")
-        self.user_id = user_id
-        self.user_email = user_email  # Store the email
+    async def ensure_responses_loaded(self):
+        """Loads the participant's saved responses on the first visit of the questionnaire page.
+
+        Later visits by the same participant keep the in-progress responses and
+        do not query Firestore again.
+        """
+        identity = await self.get_state(IdentityState)
+        if not identity.user_id:
+            return
+        if self._responses_loaded_for == identity.user_id:
+            self._show_questionnaire(self.current_questionnaire, self.page_index)  # Remounted radios need the answers
+            return
+        logger.info("First questionnaire visit, loading saved responses", extra={"user_id": identity.user_id})
+        self._responses_loaded_for = identity.user_id
         self.error_message = ""
+        self._dirty_drafts = []  # Edits of a previous participant in this browser session are not theirs
+        self._unpin_config()
+        self._pin_config()  # Items and scoring stay on this version while the participant answers
 
-        self._ensure_configs_loaded()  # Ensures self._raw_configs is populated
+        configs = self._questionnaire_configs()
 
-        # Initialize responses, scores, and doc_ids for all questionnaires in QUESTIONNAIRE_ORDER
+        # Initialize answers, scores, and doc_ids for all questionnaires in QUESTIONNAIRE_ORDER
+        self._answers = {}
         for q_name in QUESTIONNAIRE_ORDER:
-            if q_name in self._raw_configs and "items" in self._raw_configs[q_name]:
-                num_items = len(self._raw_configs[q_name]["items"])
-                self.responses[q_name] = [None] * num_items
-            else:
-                self.responses[q_name] = []
             self.calculated_scores.pop(q_name, None)
             self.response_doc_ids[q_name] = None
 
-        if self.user_id:  # Load existing data only if user_id is valid
-            print(f"[QUESTIONNAIRE_STATE] Attempting to load responses for user: {self.user_id}")
-            fetched_data = get_user_questionnaire_responses(self.user_id)
-            print(f"[QUESTIONNAIRE_STATE] Fetched data from Firebase: {fetched_data}")
+        if identity.user_id:  # Load existing data only if user_id is valid
+            fetched_data = get_user_questionnaire_responses(identity.user_id)
             for q_name, data in fetched_data.items():
                 if q_name in QUESTIONNAIRE_ORDER:
-                    loaded_q_responses = data.get("data", {}).get("responses")
-                    if (
-                        isinstance(loaded_q_responses, list)
-                        and q_name in self.responses
-                        and self.responses[q_name] is not None
-                        and len(loaded_q_responses) == len(self.responses[q_name])
-                    ):
-                        self.responses[q_name] = loaded_q_responses
+                    num_items = len(configs.get(q_name, {}).get("items", ()))
+                    loaded_answers = answers_from_document(data.get("data", {}), num_items)
+                    if loaded_answers is not None:
+                        self._answers[q_name] = loaded_answers
                         self.response_doc_ids[q_name] = data.get("doc_id")
-                        print(f"[QUESTIONNAIRE_STATE] Loaded responses for {q_name}, doc_id: {data.get('doc_id')}")
+                        logger.debug("Loaded responses for %s", q_name, extra={"user_id": identity.user_id})
                     else:
-                        print(f"[QUESTIONNAIRE_STATE] Mismatch/error loading responses for {q_name}.")
+                        logger.warning(
+                            "Saved responses for %s do not match the questionnaire",
+                            q_name,
+                            extra={"user_id": identity.user_id},
+                        )
 
         if QUESTIONNAIRE_ORDER:
-            self.current_questionnaire = QUESTIONNAIRE_ORDER[0]
+            self._show_questionnaire(QUESTIONNAIRE_ORDER[0])
         else:
             self.current_questionnaire = ""
             self.error_message = "Error: No questionnaires defined in order."
-        print(
-            f"[QUESTIONNAIRE_STATE] User ID set to: '{self.user_id}'. Current questionnaire: '{self.current_questionnaire}'"
-        )
 
     @rx.var
     def available_questionnaires(self) -> List[str]:
         """Returns a list of names of the available questionnaires (from order)."""
         return QUESTIONNAIRE_ORDER
 
-    @rx.var
-    def current_config(self) -> Dict[str, Any]:
-        """Returns the full configuration for the current questionnaire."""
-        self._ensure_configs_loaded()
-        return self._raw_configs.get(self.current_questionnaire, {})
-
-    @rx.var
-    def current_items(self) -> List[str]:
-        """Returns the list of items (questions) for the current questionnaire."""
-        return self.current_config.get("items", [])
-
     @rx.var
     def current_likert_anchors(self) -> List[str]:
         """Returns the Likert scale anchors for the current questionnaire."""
-        return self.current_config.get("likert_anchor", [])
+        return thaw(self._current_config().get("likert_anchor", ()))
 
     @rx.var
     def current_likert_level(self) -> Optional[int]:
         """Returns the Likert level (e.g., 4 for 0-3 scoring) for the current questionnaire."""
-        return self.current_config.get("likert_level")
+        return self._current_config().get("likert_level")
+
+    @rx.var
+    def page_count(self) -> int:
+        """Number of pages of the current questionnaire."""
+        return max(1, -(-len(self._current_config().get("items", ())) // ITEMS_PER_PAGE))
 
     @rx.var
-    def current_responses(self) -> List[Optional[str]]:
-        """Returns the responses for the current questionnaire."""
-        self._ensure_configs_loaded()
-        if self.current_questionnaire not in self.responses:
-            self.responses[self.current_questionnaire] = [None] * len(self.current_items)
-        return self.responses.get(self.current_questionnaire, [])
+    def page_item_offset(self) -> int:
+        """Index of the first item of the current page within the questionnaire."""
+        return self.page_index * ITEMS_PER_PAGE
+
+    @rx.var
+    def page_items(self) -> List[str]:
+        """The items (questions) of the current page only."""
+        start = self.page_index * ITEMS_PER_PAGE
+        return list(self._current_config().get("items", ())[start : start + ITEMS_PER_PAGE])
+
+    @rx.var
+    def is_last_page(self) -> bool:
+        """Whether the current page is the last one, which shows the submit button."""
+        return self.page_index >= self.page_count - 1
 
     @rx.var
     def current_likert_options_as_strings(self) -> List[str]:
@@ -151,132 +198,197 @@ class QuestionnaireState(rx.State):
             return [str(i) for i in range(self.current_likert_level)]
         return []
 
+    @rx.event
+    def next_page(self):
+        self._show_questionnaire(self.current_questionnaire, self.page_index + 1)
+
+    @rx.event
+    def previous_page(self):
+        self._show_questionnaire(self.current_questionnaire, self.page_index - 1)
+
     @rx.event
     def set_response(self, item_index: int, value: str):
         """
         Sets the response for a specific item in the current questionnaire.
         value is expected to be a string from UI (e.g., "0", "1", "2", "3").
+
+        Only backend vars change, so the state delta sent back stays empty however long the questionnaire is.
         """
         questionnaire_name = self.current_questionnaire  # Use the var's current value
-        print(f"Setting response for {questionnaire_name}, item {item_index}, value '{value}'")
+        configs = self._questionnaire_configs()
+        if self.error_message:
+            self.error_message = ""
 
-        self._ensure_configs_loaded()
-        self.error_message = ""
-
-        if questionnaire_name not in self._raw_configs:
+        if questionnaire_name not in configs:
             self.error_message = f"Questionnaire '{questionnaire_name}' not found."
             return
 
-        items = self._raw_configs[questionnaire_name].get("items", [])
-
-        if not (0 <= item_index < len(items)):
+        answers = self._answers_for(questionnaire_name, configs)
+        if not (0 <= item_index < answers.size):
             self.error_message = f"Invalid item index: {item_index}."
             return
+        try:
+            answer = int(value)
+        except (TypeError, ValueError):
+            answer = -1
+        if not (0 <= answer < configs[questionnaire_name].get("likert_level", 0)):
+            self.error_message = f"Invalid response '{value}' for item {item_index + 1}."
+            return
 
-        if questionnaire_name not in self.responses or len(self.responses[questionnaire_name]) != len(items):
-            self.responses[questionnaire_name] = [None] * len(items)
-
-        self.responses[questionnaire_name][item_index] = value
+        answers = answers.copy()  # Reassigned rather than mutated in place, so the state manager sees the change
+        answers[item_index] = answer
+        self._answers[questionnaire_name] = answers
 
-        if questionnaire_name in self.calculated_scores:
+        if self.calculated_scores.get(questionnaire_name) is not None:
             self.calculated_scores[questionnaire_name] = None
 
-    def _calculate_score_internal(self, questionnaire_name: str) -> Optional[int]:
-        q_config = self._raw_configs.get(questionnaire_name)
-        q_responses = self.responses.get(questionnaire_name)
+        if questionnaire_name not in self._dirty_drafts:
+            self._dirty_drafts.append(questionnaire_name)
+        if not self._draft_flush_scheduled:
+            self._draft_flush_scheduled = True
+            return QuestionnaireState.flush_drafts_later
+
+    def _take_dirty_drafts(self) -> Dict[str, Dict[str, Any]]:
+        """Draft documents of the questionnaires edited since the last save; marks them clean."""
+        drafts = {
+            q_name: {
+                "questionnaire_name": q_name,
+                "responses_packed": pack_answers(self._answers[q_name]),
+                "status": "draft",
+                "timestamp": datetime.datetime.now().isoformat(),
+                "game_name": "questionnaire_result",
+            }
+            for q_name in self._dirty_drafts
+            if q_name in self._answers
+        }
+        self._dirty_drafts = []
+        return drafts
+
+    @staticmethod
+    def _save_drafts(user_id: str, user_email: str, drafts: Dict[str, Dict[str, Any]]):
+        """Merges the drafts into the questionnaire documents get_user_questionnaire_responses reads.
+
+        Runs outside the state lock, so a questionnaire may have been submitted
+        since its draft was taken; save_questionnaire_draft leaves those alone.
+        """
+        for q_name, draft in drafts.items():
+            save_questionnaire_draft(user_id, q_name, {**draft, "user_email": user_email})
+        if drafts:
+            logger.debug("Saved drafts for %s", list(drafts), extra={"user_id": user_id})
+
+    @rx.event(background=True)
+    async def flush_drafts_later(self):
+        """Saves the edits made in the next DRAFT_FLUSH_SECONDS as one write per questionnaire."""
+        unscheduled = False
+        try:
+            await asyncio.sleep(DRAFT_FLUSH_SECONDS)
+            async with self:
+                # Cleared together with taking the drafts, so that any later edit schedules a new flush
+                self._draft_flush_scheduled = False
+                unscheduled = True
+                identity = await self.get_state(IdentityState)
+                user_id, user_email = identity.user_id, identity.user_email
+                drafts = self._take_dirty_drafts() if user_id else {}
+        finally:
+            if not unscheduled:  # The task failed before taking the drafts; let the next edit schedule a flush
+                async with self:
+                    self._draft_flush_scheduled = False
+        await asyncio.to_thread(self._save_drafts, user_id, user_email, drafts)
 
-        if not q_config or not q_responses:
+    @rx.event
+    async def flush_drafts(self):
+        """Saves pending drafts right away, e.g. when the participant leaves the questionnaire page."""
+        identity = await self.get_state(IdentityState)
+        if identity.user_id:
+            # Off the event loop, as in flush_drafts_later: each draft is a Firestore transaction
+            await asyncio.to_thread(self._save_drafts, identity.user_id, identity.user_email, self._take_dirty_drafts())
+
+    def _calculate_score_internal(self, questionnaire_name: str) -> Optional[Dict[str, int]]:
+        """Scores the session's responses with the compiled questionnaire of the pinned config version.
+
+        Returns:
+            Scale name -> score (TOTAL_SCALE plus any subscales), or None with error_message set
+        """
+        compiled = get_compiled_questionnaires(self._config_version or None).get(questionnaire_name)
+        answers = self._answers.get(questionnaire_name)
+
+        if compiled is None or answers is None:
             self.error_message = f"Data missing for score calculation of '{questionnaire_name}'."
             return None
-        if any(r is None for r in q_responses):
-            self.error_message = f"Not all items answered for '{questionnaire_name}'."
-            return None
-
-        total_score = 0
-        likert_level = q_config.get("likert_level")
-        reverse_coded_1_indexed = q_config.get("reverse_coding", [])
-        if not isinstance(reverse_coded_1_indexed, list):
-            reverse_coded_1_indexed = []
-        if likert_level is None:
-            self.error_message = f"Likert level not defined for '{questionnaire_name}'."
+        try:
+            return compiled.score(answers)
+        except QuestionnaireScoringError as e:
+            self.error_message = str(e)
             return None
 
-        for idx, score_value_str in enumerate(q_responses):
-            if score_value_str is None:
-                self.error_message = f"Internal error: Missing response for item {idx + 1}."
-                return None
-            try:
-                current_score_int = int(score_value_str)
-            except ValueError:
-                self.error_message = f"Internal error: Non-integer string response ('{score_value_str}')."
-                return None
-
-            item_number_1_indexed = idx + 1
-            if item_number_1_indexed in reverse_coded_1_indexed:
-                processed_score = (likert_level - 1) - current_score_int
-            else:
-                processed_score = current_score_int
-            total_score += processed_score
-        return total_score
-
     @rx.event
-    def submit_questionnaire(self):
+    async def submit_questionnaire(self):
         """
         Calculates score for current questionnaire, saves/updates it, and navigates to next step.
         """
-        print(
-            f"[QUESTIONNAIRE_STATE] submit_questionnaire entered. Current self.user_id: '{self.user_id}', self.user_email: '{self.user_email}'"
-        )
-        self._ensure_configs_loaded()
+        identity = await self.get_state(IdentityState)
+        configs = self._questionnaire_configs()
         self.error_message = ""
 
         current_q_name = self.current_questionnaire
 
-        if not self.user_id or not self.user_email:  # Check local copies
+        if not identity.user_id or not identity.user_email:
             self.error_message = "User ID or Email not set. Cannot save data."
-            print(
-                f"[QUESTIONNAIRE_STATE] Error in submit: User ID ('{self.user_id}') or Email ('{self.user_email}') is not set."
-            )
+            logger.warning("Questionnaire submitted without a signed-in participant")
             return
 
-        if current_q_name not in self._raw_configs:
+        if current_q_name not in configs:
             self.error_message = f"Questionnaire '{current_q_name}' not found."
             return
 
-        q_responses = self.responses.get(current_q_name)
-        if not q_responses or any(r is None for r in q_responses):
+        answers = self._answers.get(current_q_name)
+        if answers is None or (answers == MISSING_RESPONSE).any():
+            if answers is not None:  # Show the page of the first unanswered item
+                first_missing = int(np.argmax(answers == MISSING_RESPONSE))
+                self._show_questionnaire(current_q_name, first_missing // ITEMS_PER_PAGE)
             self.error_message = f"Please answer all items for '{current_q_name}' before submitting."
             return
 
         try:
-            total_score = self._calculate_score_internal(current_q_name)
-            if total_score is None:
+            scale_scores = self._calculate_score_internal(current_q_name)
+            if scale_scores is None:
                 if not self.error_message:
                     self.error_message = f"Failed to calculate score for '{current_q_name}'."
                 return
 
+            total_score = scale_scores[TOTAL_SCALE]
             self.calculated_scores[current_q_name] = total_score
-            q_config = self._raw_configs[current_q_name]
+            q_config = configs[current_q_name]
             data_to_save = {
-                "user_email": self.user_email,  # Use stored plain string email
+                "user_email": identity.user_email,
                 "questionnaire_name": current_q_name,
                 "total_score": total_score,
-                "responses": q_responses,  # These are List[Optional[str]], ensure they are List[str] if needed by schema or handle None
+                "subscale_scores": {scale: score for scale, score in scale_scores.items() if scale != TOTAL_SCALE},
+                "responses_packed": pack_answers(answers),  # One digit per item, see questionnaire_scoring
                 "likert_level": q_config.get("likert_level"),
                 "timestamp": datetime.datetime.now().isoformat(),  # Will be overwritten by server timestamp in save_experiment_data
+                "status": QUESTIONNAIRE_SUBMITTED_STATUS,
                 "game_name": "questionnaire_result",
             }
 
-            print(f"[QUESTIONNAIRE_STATE] Data being sent to Firebase: {data_to_save}")
+            logger.info(
+                "Submitting %s, total score %s", current_q_name, total_score, extra={"user_id": identity.user_id}
+            )
 
-            save_experiment_data(self.user_id, data_to_save)
+            # The document ID is the questionnaire name, as get_user_questionnaire_responses expects.
+            # It replaces this questionnaire's draft, which therefore no longer needs flushing.
+            if current_q_name in self._dirty_drafts:
+                self._dirty_drafts.remove(current_q_name)
+            await asyncio.to_thread(
+                save_experiment_data, identity.user_id, QUESTIONNAIRE_COLLECTION, data_to_save, document_id=current_q_name
+            )
             self.error_message = ""  # Clear error on success
 
             # Navigate to next questionnaire or page
             current_q_index = QUESTIONNAIRE_ORDER.index(current_q_name)
             if current_q_index < len(QUESTIONNAIRE_ORDER) - 1:
                 next_q_name = QUESTIONNAIRE_ORDER[current_q_index + 1]
-                self.current_questionnaire = next_q_name
+                self._show_questionnaire(next_q_name)
                 self.calculated_scores.pop(next_q_name, None)  # Clear any previous score for next_q
                 return None  # Stay on the same page, UI will update due to current_questionnaire change
             else:
@@ -287,119 +399,5 @@ class QuestionnaireState(rx.State):
             self.error_message = f"Error finding '{current_q_name}' in questionnaire sequence."
         except Exception as e:
             self.error_message = f"Error submitting '{current_q_name}': {str(e)}"
-            print(f"Detailed error during submission of {current_q_name}: {e}")
+            logger.exception("Error submitting %s: %s", current_q_name, e)
             self.calculated_scores[current_q_name] = None
-
-
-class InstructionState(rx.State):
-    """Manages loading and displaying game instructions."""
-
-    _raw_game_rules: Dict[str, Any] = {}
-    current_game_for_instructions: str = ""
-    error_message: str = ""
-
-    def _ensure_rules_loaded(self):
-        if not self._raw_game_rules:
-            print(f"[InstructionState] _ensure_rules_loaded: Attempting to load game rules from {GAME_RULES_FILE_PATH}")
-            try:
-                with open(GAME_RULES_FILE_PATH, "r", encoding="utf-8") as f:
-                    self._raw_game_rules = toml.load(f)
-                print(
-                    f"[InstructionState] _ensure_rules_loaded: Successfully loaded rules. Keys: {list(self._raw_game_rules.keys())}"
-                )
-            except FileNotFoundError:
-                self.error_message = f"Game rules file not found: {GAME_RULES_FILE_PATH}"
-                self._raw_game_rules = {}
-                print(f"[InstructionState] _ensure_rules_loaded: FileNotFoundError. Path: {GAME_RULES_FILE_PATH}")
-            except Exception as e:
-                self.error_message = f"Error loading game rules: {str(e)}"
-                self._raw_game_rules = {}
-                print(f"[InstructionState] _ensure_rules_loaded: Exception loading rules: {type(e).__name__}: {e}")
-        else:
-            print("[InstructionState] _ensure_rules_loaded: Rules already loaded.")
-
-    @rx.var
-    def current_game_config(self) -> Dict[str, Any]:
-        self._ensure_rules_loaded()
-        return self._raw_game_rules.get(self.current_game_for_instructions, {})
-
-    @rx.var
-    def current_game_title(self) -> str:
-        return self.current_game_config.get("title", "Instructions")
-
-    @rx.var
-    def current_game_rules(self) -> List[str]:
-        return self.current_game_config.get("rules", [])
-
-    @rx.var
-    def current_game_next_page_text(self) -> str:
-        print(f"[DEBUG] current_game_next_page_text: {self.current_game_config.get('next_page_text', 'Next')}")
-        return self.current_game_config.get("next_page_text", "Next")
-
-    @rx.var
-    def current_game_next_page_url(self) -> str:
-        print(f"[DEBUG] current_game_next_page_url: {self.current_game_config.get('next_page_url', '/')}")
-        return self.current_game_config.get("next_page_url", "/")  # Default to home if not specified
-
-    @rx.event
-    def prepare_instructions(self, game_name: str):
-        """Sets the current game and navigates to the instructions page."""
-        self._ensure_rules_loaded()
-        self.current_game_for_instructions = game_name
-        self.error_message = ""  # Clear any previous errors
-
-        # Check if the game_name is valid
-        if game_name not in self._raw_game_rules:
-            self.error_message = f"Instructions for game '{game_name}' not found."
-            # Potentially redirect to an error page or stay and show message
-            return rx.redirect("/")  # Or some error indication page
-
-        # If game name is valid, redirect to the generic instructions page
-        # The on_load of the instructions page can also take query params if needed.
-        # For example, if instructions page itself needs to call prepare_instructions if game is in URL.
-        return rx.redirect(f"/app/instructions?game={game_name}")
-
-    @rx.event
-    def load_instructions_for_current_page(self):
-        """Sets current_game_for_instructions based on URL query param 'game' or uses already set one."""
-        game_name_from_url = self.router.page.params.get("game", "")
-        self._ensure_rules_loaded()  # Ensure rules are available
-
-        if game_name_from_url:
-            if game_name_from_url in self._raw_game_rules:
-                self.current_game_for_instructions = game_name_from_url
-                self.error_message = ""
-                print(f"[InstructionState] Loaded instructions for: {game_name_from_url} from URL param.")
-            else:
-                self.error_message = f"Instructions for game '{game_name_from_url}' (from URL) not found."
-                self.current_game_for_instructions = ""  # Clear if invalid game from URL
-                print(self.error_message)
-        elif self.current_game_for_instructions and self.current_game_for_instructions in self._raw_game_rules:
-            # If no game in URL, but a valid game is already set in state, keep it.
-            print(f"[InstructionState] Using already set game: {self.current_game_for_instructions}")
-            pass
-        elif self._raw_game_rules:  # No game in URL, nothing valid set, try defaulting
-            first_game_in_rules = next(iter(self._raw_game_rules), None)
-            if first_game_in_rules:
-                self.current_game_for_instructions = first_game_in_rules
-                self.error_message = ""
-                print(f"[InstructionState] No game in URL or state, defaulting to first game: {first_game_in_rules}")
-            else:
-                self.error_message = "No game specified and no game rules found to default to."
-                print(self.error_message)
-        else:
-            self.error_message = "No game rules loaded."
-            print(self.error_message)
-
-    # Event handler for auth.set_user_identity
-    @rx.event_handler("auth.set_user_identity")
-    def handle_set_user_identity(self, payload: dict):
-        """Handles the set_user_identity event emitted by AuthState."""
-        user_id = payload.get("user_id")
-        user_email = payload.get("user_email")
-        if user_id is not None and user_email is not None:
-            print(f"[QuestionnaireState] Received set_user_identity event. User ID: {user_id}, Email: {user_email}")
-            # Call the existing set_user_identity method which also handles loading data
-            self.set_user_identity(user_id, user_email)
-        else:
-            print("[QuestionnaireState] Error: Received set_user_identity event with missing user_id or user_email.")
@@ -0,0 +1,322 @@
+"""
+Normalizes the raw experiment documents loaded by ResultsState into typed
+NumPy structured arrays, and derives every summary and chart series shown on
+the results page from them with vectorized reductions.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+
+# game_name values as stored in the documents of each game
+PGG_GAME_NAME = "public goods game"
+TRUST_GAME_NAME = "trust_game"
+
+# The ResultsState.current_game_loaded values gating the summary cards
+PGG_COLLECTION_NAME = "public_goods_game"
+TRUST_GAME_COLLECTION_NAME = "trust_game"
+
+ERROR_KEYS = ("error", "error_loading", "error_fetching")
+
+# Sentinel for trust game rounds whose document has no (numeric) round number
+MISSING_ROUND = -1
+
+PGG_DTYPE = np.dtype(
+    [
+        ("round", np.int32),
+        ("contribution", np.float64),
+        ("payoff", np.float64),
+    ]
+)
+
+TG_SECTION1_DTYPE = np.dtype(
+    [
+        ("round", np.int32),
+        ("amount_sent", np.float64),
+        ("amount_returned", np.float64),
+        ("player_a_payoff", np.float64),
+        ("player_b_payoff", np.float64),
+        ("player_a_balance", np.float64),
+        ("player_b_balance", np.float64),
+    ]
+)
+
+TG_SECTION2_DTYPE = np.dtype(
+    [
+        ("stage", np.int32),
+        ("round", np.int32),
+        ("amount_sent", np.float64),
+        ("amount_returned", np.float64),
+        ("human_payoff", np.float64),
+        ("player_b_payoff", np.float64),
+        ("human_balance", np.float64),
+        ("player_b_balance", np.float64),
+    ]
+)
+
+# Value columns summed in a single reduction per game
+PGG_VALUE_FIELDS = ["contribution", "payoff"]
+TG_SECTION1_VALUE_FIELDS = ["amount_sent", "amount_returned", "player_a_payoff", "player_b_payoff"]
+TG_SECTION2_VALUE_FIELDS = ["amount_sent", "amount_returned", "human_payoff", "player_b_payoff"]
+
+DEFAULT_PGG_SUMMARY: Dict[str, Any] = {
+    "total_rounds": 0,
+    "total_contribution": 0,
+    "avg_contribution": 0,
+    "total_payoff": 0,
+    "avg_payoff": 0,
+}
+
+DEFAULT_TG_SECTION1_SUMMARY: Dict[str, Any] = {
+    "total_rounds": 0,
+    "total_amount_sent": 0,
+    "avg_amount_sent": 0,
+    "total_amount_returned": 0,
+    "avg_amount_returned": 0,
+    "player_a_balance": 0,
+    "user_balance": 0,
+    "player_a_payoff": 0,
+    "user_payoff": 0,
+}
+
+DEFAULT_TG_SECTION2_SUMMARY: Dict[str, Any] = {
+    "total_rounds": 0,
+    "total_amount_sent": 0,
+    "avg_amount_sent": 0,
+    "total_amount_returned": 0,
+    "avg_amount_returned": 0,
+    "player_b_balance": 0,
+    "user_balance": 0,
+    "player_b_payoff": 0,
+    "user_payoff": 0,
+}
+
+# Document fields read by normalize_statistics, fetched as a Firestore projection
+PGG_RESULT_FIELDS = ["game_name", "round", "human_contribution", "human_payoff"]
+TG_RESULT_FIELDS = [
+    "game_name",
+    "section_num",
+    "stage_num",
+    "round",
+    "amount_sent",
+    "amount_returned",
+    "player_a_payoff",
+    "player_b_payoff",
+    "player_a_balance",
+    "player_b_balance",
+    "human_payoff",
+    "human_balance",
+]
+RESULT_FIELDS_BY_GAME: Dict[str, List[str]] = {
+    PGG_COLLECTION_NAME: PGG_RESULT_FIELDS,
+    TRUST_GAME_COLLECTION_NAME: TG_RESULT_FIELDS,
+}
+
+# Chart series name -> structured array field, per trust game section
+TG_SECTION1_CHART_FIELDS = {
+    "amount_sent": "amount_sent",
+    "amount_returned": "amount_returned",
+    "player_a_payoff": "player_a_payoff",
+    "user_payoff": "player_b_payoff",
+    "player_a_balance": "player_a_balance",
+    "user_balance": "player_b_balance",
+}
+TG_SECTION2_CHART_FIELDS = {
+    "amount_sent": "amount_sent",
+    "amount_returned": "amount_returned",
+    "user_payoff": "human_payoff",
+    "player_b_payoff": "player_b_payoff",
+    "user_balance": "human_balance",
+    "player_b_balance": "player_b_balance",
+}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _number_or_zero(value: Any) -> float:
+    return value if _is_number(value) else 0
+
+
+def _round_or_missing(value: Any) -> int:
+    return int(value) if _is_number(value) else MISSING_ROUND
+
+
+def has_load_error(statistics: list) -> bool:
+    """Returns True if statistics holds the error marker set by a failed load."""
+    return bool(statistics) and isinstance(statistics[0], dict) and any(key in statistics[0] for key in ERROR_KEYS)
+
+
+def normalize_statistics(statistics: list) -> Dict[str, np.ndarray]:
+    """Normalizes raw result documents into one structured array per game.
+
+    Args:
+        statistics: The list of {"id", "data"} dicts returned by get_user_experiment_data
+
+    Returns:
+        Dictionary with "pgg", "tg_section1" and "tg_section2" structured arrays,
+        rows in the order the documents were loaded
+    """
+    pgg_rows: List[Tuple] = []
+    s1_rows: List[Tuple] = []
+    s2_rows: List[Tuple] = []
+
+    for item in statistics:
+        data = item.get("data") if isinstance(item, dict) else None
+        if not isinstance(data, dict):
+            continue
+        game_name = data.get("game_name")
+
+        if game_name == PGG_GAME_NAME:
+            row = (data.get("round"), data.get("human_contribution", 0), data.get("human_payoff", 0))
+            if all(_is_number(value) for value in row):
+                pgg_rows.append(row)
+
+        elif game_name == TRUST_GAME_NAME:
+            section_num = data.get("section_num")
+            if section_num == 1:
+                s1_rows.append(
+                    (
+                        _round_or_missing(data.get("round")),
+                        _number_or_zero(data.get("amount_sent")),
+                        _number_or_zero(data.get("amount_returned")),
+                        _number_or_zero(data.get("player_a_payoff")),
+                        _number_or_zero(data.get("player_b_payoff")),
+                        _number_or_zero(data.get("player_a_balance")),
+                        _number_or_zero(data.get("player_b_balance")),
+                    )
+                )
+            elif section_num == 2:
+                s2_rows.append(
+                    (
+                        int(_number_or_zero(data.get("stage_num"))),
+                        _round_or_missing(data.get("round")),
+                        _number_or_zero(data.get("amount_sent")),
+                        _number_or_zero(data.get("amount_returned")),
+                        _number_or_zero(data.get("human_payoff")),
+                        _number_or_zero(data.get("player_b_payoff")),
+                        _number_or_zero(data.get("human_balance")),
+                        _number_or_zero(data.get("player_b_balance")),
+                    )
+                )
+
+    return {
+        "pgg": np.array(pgg_rows, dtype=PGG_DTYPE),
+        "tg_section1": np.array(s1_rows, dtype=TG_SECTION1_DTYPE),
+        "tg_section2": np.array(s2_rows, dtype=TG_SECTION2_DTYPE),
+    }
+
+
+def _column_sums(rows: np.ndarray, fields: List[str]) -> np.ndarray:
+    """Sums several value columns of a structured array in one reduction."""
+    return structured_to_unstructured(rows[fields]).sum(axis=0)
+
+
+def _to_python(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _rounded(value: Any) -> Any:
+    return round(_to_python(value), 2)
+
+
+def summarize_pgg(rows: np.ndarray) -> Dict[str, Any]:
+    """Overall summary of the Public Goods Game rounds."""
+    num_rounds = rows.size
+    if num_rounds == 0:
+        return dict(DEFAULT_PGG_SUMMARY)
+
+    total_contribution, total_payoff = _column_sums(rows, PGG_VALUE_FIELDS)
+    return {
+        "total_rounds": num_rounds,
+        "total_contribution": _rounded(total_contribution),
+        "avg_contribution": _rounded(total_contribution / num_rounds),
+        "total_payoff": _rounded(total_payoff),
+        "avg_payoff": _rounded(total_payoff / num_rounds),
+    }
+
+
+def pgg_round_series(rows: np.ndarray) -> List[Dict[str, Any]]:
+    """Per-round contribution/payoff series sorted by round number."""
+    ordered = rows[np.argsort(rows["round"], kind="stable")]
+    return [
+        {"round_number": round_number, "contribution": contribution, "payoff": payoff}
+        for round_number, contribution, payoff in zip(
+            ordered["round"].tolist(), ordered["contribution"].tolist(), ordered["payoff"].tolist()
+        )
+    ]
+
+
+def summarize_tg_section1(rows: np.ndarray) -> Dict[str, Any]:
+    """Summary of Trust Game Section 1, where the participant is Player B."""
+    num_rounds = rows.size
+    if num_rounds == 0:
+        return dict(DEFAULT_TG_SECTION1_SUMMARY)
+
+    sent, returned, player_a_payoff, player_b_payoff = _column_sums(rows, TG_SECTION1_VALUE_FIELDS)
+    last = rows[-1]
+    return {
+        "total_rounds": num_rounds,
+        "total_amount_sent": _rounded(sent),
+        "avg_amount_sent": _rounded(sent / num_rounds),
+        "total_amount_returned": _rounded(returned),
+        "avg_amount_returned": _rounded(returned / num_rounds),
+        "player_a_payoff": _rounded(player_a_payoff / num_rounds),
+        "user_payoff": _rounded(player_b_payoff / num_rounds),
+        "player_a_balance": _rounded(last["player_a_balance"]),
+        "user_balance": _rounded(last["player_b_balance"]),
+    }
+
+
+def summarize_tg_section2(rows: np.ndarray) -> Dict[str, Any]:
+    """Summary of Trust Game Section 2, where the participant is Player A."""
+    num_rounds = rows.size
+    if num_rounds == 0:
+        return dict(DEFAULT_TG_SECTION2_SUMMARY)
+
+    sent, returned, human_payoff, player_b_payoff = _column_sums(rows, TG_SECTION2_VALUE_FIELDS)
+    last = rows[-1]
+    return {
+        "total_rounds": num_rounds,
+        "total_amount_sent": _rounded(sent),
+        "avg_amount_sent": _rounded(sent / num_rounds),
+        "total_amount_returned": _rounded(returned),
+        "avg_amount_returned": _rounded(returned / num_rounds),
+        "player_b_balance": _rounded(last["player_b_balance"]),
+        "user_balance": _rounded(last["human_balance"]),
+        "player_b_payoff": _rounded(player_b_payoff / num_rounds),
+        "user_payoff": _rounded(human_payoff / num_rounds),
+    }
+
+
+def build_results_bundle(statistics: list, current_game_loaded: str) -> Dict[str, Any]:
+    """Computes every results-page summary and chart series in one pass.
+
+    Args:
+        statistics: The raw documents held in ResultsState.statistics
+        current_game_loaded: The game whose documents statistics holds
+
+    Returns:
+        Dictionary of summaries keyed by the ResultsState var each backs, plus
+        the round arrays the chart vars query
+    """
+    load_failed = has_load_error(statistics)
+    arrays = normalize_statistics([] if load_failed else statistics)
+    pgg, s1, s2 = arrays["pgg"], arrays["tg_section1"], arrays["tg_section2"]
+
+    pgg_loaded = current_game_loaded == PGG_COLLECTION_NAME
+    tg_loaded = current_game_loaded == TRUST_GAME_COLLECTION_NAME
+
+    return {
+        "pgg_overall_summary": summarize_pgg(pgg) if pgg_loaded else dict(DEFAULT_PGG_SUMMARY),
+        "pgg_round_summary": pgg_round_series(pgg) if pgg_loaded else [],
+        "tg_section1_summary": summarize_tg_section1(s1) if tg_loaded else dict(DEFAULT_TG_SECTION1_SUMMARY),
+        "tg_section2_summary": summarize_tg_section2(s2),
+        # Rounds with a round number, queried by the chart data service
+        "tg_section1_rows": s1[s1["round"] != MISSING_ROUND],
+        "tg_section2_rows": s2[s2["round"] != MISSING_ROUND],
+        "tg_section2_num_stages": int(s2["stage"].max()) + 1 if s2.size else 0,
+    }
+
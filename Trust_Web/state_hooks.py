@@ -0,0 +1,80 @@
+"""
+Hooks observing the app's state manager as it loads, saves and modifies session state.
+
+Tracing and the state size monitor both need to see the state manager's
+calls. Each registers a StateManagerHook here, and install_state_manager_hooks
+turns the app's state manager into an instance of a subclass of its own class
+whose get_state, set_state and modify_state run inside every registered hook.
+The manager keeps its type for Reflex's own isinstance checks (Reflex treats
+the Redis manager differently), and hooks registered later still apply.
+"""
+
+import contextlib
+from typing import Any, AsyncIterator, ContextManager, Dict, Iterator, List
+
+
+class StateManagerHook:
+    """Context managers entered around the state manager's calls; the defaults do nothing."""
+
+    def loading(self, token: str) -> ContextManager[Any]:
+        """Entered around get_state(token)."""
+        return contextlib.nullcontext()
+
+    def saving(self, token: str, state: Any) -> ContextManager[Any]:
+        """Entered around set_state(token, state), before the manager serializes the touched states."""
+        return contextlib.nullcontext()
+
+    def modifying(self, token: str) -> ContextManager[Any]:
+        """Entered around modify_state(token), which loads and saves the state inside it."""
+        return contextlib.nullcontext()
+
+
+_hooks: List[StateManagerHook] = []
+
+# State manager class -> its subclass running the hooks
+_hooked_classes: Dict[type, type] = {}
+
+
+def register_state_manager_hook(hook: StateManagerHook) -> None:
+    """Runs hook around the calls of every state manager installed with install_state_manager_hooks."""
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+@contextlib.contextmanager
+def _entered(contexts: Iterator[ContextManager[Any]]) -> Iterator[None]:
+    with contextlib.ExitStack() as stack:
+        for context in contexts:
+            stack.enter_context(context)
+        yield
+
+
+def _hooked_class(manager_cls: type) -> type:
+    if manager_cls in _hooked_classes.values():
+        return manager_cls
+    if manager_cls not in _hooked_classes:
+
+        class HookedStateManager(manager_cls):
+            async def get_state(self, token: str, *args, **kwargs):
+                with _entered(hook.loading(token) for hook in _hooks):
+                    return await super().get_state(token, *args, **kwargs)
+
+            async def set_state(self, token: str, state: Any, *args, **kwargs):
+                with _entered(hook.saving(token, state) for hook in _hooks):
+                    return await super().set_state(token, state, *args, **kwargs)
+
+            @contextlib.asynccontextmanager
+            async def modify_state(self, token: str, *args, **kwargs) -> AsyncIterator[Any]:
+                with _entered(hook.modifying(token) for hook in _hooks):
+                    async with super().modify_state(token, *args, **kwargs) as state:
+                        yield state
+
+        HookedStateManager.__name__ = HookedStateManager.__qualname__ = f"Hooked{manager_cls.__name__}"
+        _hooked_classes[manager_cls] = HookedStateManager
+    return _hooked_classes[manager_cls]
+
+
+def install_state_manager_hooks(manager: Any) -> None:
+    """Runs the registered hooks around manager's calls, in place, so every holder of the manager sees them."""
+    # StateManager is a pydantic model; bypass its validation to change the instance's class
+    object.__setattr__(manager, "__class__", _hooked_class(type(manager)))
@@ -0,0 +1,210 @@
+"""
+Serialized size of the app's states and their vars, served as metrics and checked against byte budgets.
+
+When a session's states are saved after an event, a sample of those saves
+records the blobs the save writes for the app states the event touched, so
+measuring adds no serialization of its own:
+
+    trust_web_state_size_bytes      the state's blob in the state store (see state_store.py)
+    trust_web_state_var_size_bytes  each var of a state pickling to more than VAR_BUDGET_BYTES:
+                                    its JSON for vars sent to the browser (base and computed
+                                    vars), its pickle for backend vars
+    trust_web_state_budget_exceeded_total  measurements over STATE_BUDGET_BYTES or VAR_BUDGET_BYTES
+
+The in-memory state manager never saves, so it is not measured. In dev mode
+every save is measured and each state or var that goes over its budget is
+logged once as a warning, naming the var to slim down.
+
+Environment:
+    TRUST_WEB_STATE_SIZE_SAMPLE_RATE  fraction of saves measured, default 1 in dev and 0.01 in prod
+    TRUST_WEB_STATE_BUDGET_BYTES      per state, default 100000
+    TRUST_WEB_VAR_BUDGET_BYTES        per var, default 16384
+"""
+
+import contextlib
+import dataclasses
+import logging
+import os
+import pickle
+import random
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Set, Tuple
+
+from reflex.utils import format
+from reflex.utils.exec import is_prod_mode
+
+from .metrics import APP_MODULE_PREFIX, REGISTRY, Counter, Histogram
+from .state_hooks import StateManagerHook, install_state_manager_hooks, register_state_manager_hook
+from .state_store import SERIALIZED_SIZES
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE_ENV = "TRUST_WEB_STATE_SIZE_SAMPLE_RATE"
+STATE_BUDGET_ENV = "TRUST_WEB_STATE_BUDGET_BYTES"
+VAR_BUDGET_ENV = "TRUST_WEB_VAR_BUDGET_BYTES"
+DEV_SAMPLE_RATE = 1.0
+PROD_SAMPLE_RATE = 0.01
+STATE_BUDGET_BYTES = 100_000  # Where Reflex starts warning about a state's size
+VAR_BUDGET_BYTES = 16_384
+
+SIZE_BUCKETS: Tuple[float, ...] = (256, 1024, 4096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304)
+
+STATE_SIZE = REGISTRY.register(
+    Histogram("trust_web_state_size_bytes", "Serialized size of a state in the state store.", ["state"], SIZE_BUCKETS)
+)
+VAR_SIZE = REGISTRY.register(
+    Histogram(
+        "trust_web_state_var_size_bytes", "Serialized size of a state var.", ["state", "var", "kind"], SIZE_BUCKETS
+    )
+)
+BUDGET_EXCEEDED = REGISTRY.register(
+    Counter("trust_web_state_budget_exceeded_total", "State and var sizes over their budget.", ["state", "var"])
+)
+
+
+@dataclasses.dataclass
+class StateSize:
+    """Serialized sizes of one state instance, in bytes."""
+
+    state: str
+    total: int
+    client_vars: Dict[str, int]
+    backend_vars: Dict[str, int]
+
+
+@dataclasses.dataclass
+class StateSizeMonitor:
+    """Measures sampled saves and checks them against the budgets."""
+
+    sample_rate: float
+    state_budget: int = STATE_BUDGET_BYTES
+    var_budget: int = VAR_BUDGET_BYTES
+    warn: bool = False
+    _warned: Set[Tuple[str, str]] = dataclasses.field(default_factory=set)
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, size: StateSize) -> None:
+        STATE_SIZE.observe(size.total, state=size.state)
+        if size.total > self.state_budget:
+            self._over_budget(size.state, "", size.total, self.state_budget)
+        for kind, var_sizes in (("client", size.client_vars), ("backend", size.backend_vars)):
+            for var, var_size in var_sizes.items():
+                VAR_SIZE.observe(var_size, state=size.state, var=var, kind=kind)
+                if var_size > self.var_budget:
+                    self._over_budget(size.state, var, var_size, self.var_budget)
+
+    def _over_budget(self, state: str, var: str, size: int, budget: int) -> None:
+        BUDGET_EXCEEDED.inc(state=state, var=var)
+        if self.warn and (state, var) not in self._warned:
+            self._warned.add((state, var))
+            logger.warning(
+                "%s serializes to %d bytes, over its budget of %d",
+                f"{state}.{var}" if var else state,
+                size,
+                budget,
+                extra={"state": state, "var": var, "size_bytes": size, "budget_bytes": budget},
+            )
+
+
+def _client_size(value: Any) -> int:
+    return len(format.json_dumps(value).encode("utf-8"))
+
+
+def _backend_size(value: Any) -> int:
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def measure_state(state: Any, total: int) -> StateSize:
+    """Serialized size of each var state defines (inherited vars are measured on their own state).
+
+    Args:
+        state: The state instance to measure
+        total: Size of the state's blob in the state store
+    """
+    client_vars = {
+        name: _client_size(state.__dict__[name])
+        for name in state.base_vars
+        if name not in state.inherited_vars and name in state.__dict__
+    }
+    client_vars.update(
+        (name, _client_size(getattr(state, name)))
+        for name in state.computed_vars
+        if name not in state.inherited_vars and not name.startswith("_")
+    )
+    backend_vars = {
+        name: _backend_size(value)
+        for name, value in state._backend_vars.items()
+        if name not in state.inherited_backend_vars
+    }
+    return StateSize(type(state).__name__, total, client_vars, backend_vars)
+
+
+def _touched_app_states(state: Any) -> Iterator[Any]:
+    if type(state).__module__.startswith(APP_MODULE_PREFIX) and state._get_was_touched():
+        yield state
+    for substate in state.substates.values():
+        yield from _touched_app_states(substate)
+
+
+class StateSizeHook(StateManagerHook):
+    """Records the blob sizes a sample of saves write, and measures the vars of the states that are large."""
+
+    def __init__(self, monitor: StateSizeMonitor):
+        self.monitor = monitor
+
+    @contextlib.contextmanager
+    def saving(self, token: str, state: Any) -> Iterator[None]:
+        # The Redis manager saves each substate with a nested set_state, all recorded by the outermost one
+        if SERIALIZED_SIZES.get() is not None or not self.monitor.sampled():
+            yield
+            return
+        # Before saving, as the Redis and disk managers clear the touched flags when they save
+        touched = {app_state.get_full_name(): app_state for app_state in _touched_app_states(state)}
+        sizes: Dict[str, Tuple[int, int]] = {}
+        reset_sizes = SERIALIZED_SIZES.set(sizes)
+        try:
+            yield
+        finally:
+            SERIALIZED_SIZES.reset(reset_sizes)
+        for name, (pickled, stored) in sizes.items():
+            app_state = touched.get(name)
+            if app_state is None:
+                continue
+            try:
+                # No var of a state pickled within the var budget can be far over it
+                if pickled > self.monitor.var_budget:
+                    size = measure_state(app_state, stored)
+                else:
+                    size = StateSize(type(app_state).__name__, stored, {}, {})
+                self.monitor.record(size)
+            except Exception as e:
+                logger.debug("Could not measure %s: %s", type(app_state).__name__, e)
+
+
+def instrument_state_manager(manager: Any, monitor: StateSizeMonitor) -> None:
+    """Measures the app states touched by a sample of the state manager's saves (see StateSizeHook)."""
+    register_state_manager_hook(StateSizeHook(monitor))
+    install_state_manager_hooks(manager)
+
+
+def configure_state_size_monitor(sample_rate: Optional[float] = None) -> StateSizeMonitor:
+    """Monitor configured from the environment, warning about budgets in dev mode only."""
+    dev = not is_prod_mode()
+    if sample_rate is None:
+        sample_rate = float(os.getenv(SAMPLE_RATE_ENV, DEV_SAMPLE_RATE if dev else PROD_SAMPLE_RATE))
+    return StateSizeMonitor(
+        sample_rate=sample_rate,
+        state_budget=int(os.getenv(STATE_BUDGET_ENV, STATE_BUDGET_BYTES)),
+        var_budget=int(os.getenv(VAR_BUDGET_ENV, VAR_BUDGET_BYTES)),
+        warn=dev,
+    )
+
+
+@contextlib.asynccontextmanager
+async def state_size_lifespan(rx_app: Any) -> AsyncIterator[None]:
+    """Backend lifespan task measuring rx_app's state manager, which only exists once the app is set up."""
+    monitor = configure_state_size_monitor()
+    if monitor.sample_rate > 0:
+        instrument_state_manager(rx_app.state_manager, monitor)
+    yield
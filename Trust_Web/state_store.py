@@ -0,0 +1,155 @@
+"""
+Compact serialization of the app's states for a shared state store.
+
+With REDIS_URL set (see rxconfig.py) Reflex keeps every session's states in
+Redis instead of one backend process, so several workers can serve the
+experiment behind a load balancer and sessions survive restarts. Each state
+is then pickled into Redis after every event that touches it, so the app's
+states inherit CompactStateMixin to keep those blobs small:
+
+- computed var caches are not stored, they are recomputed on first read
+- the state's attributes are pickled once, and blobs over
+  COMPRESSION_THRESHOLD bytes are stored zlib-compressed
+
+The same blobs are written by the disk state manager used in development.
+
+To check a Redis server round-trips the app's states, and how large their
+blobs are, run:
+
+    python -m Trust_Web.state_store redis://localhost:6379
+"""
+
+import argparse
+import asyncio
+import contextvars
+import os
+import pickle
+import random
+import sys
+import uuid
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import reflex as rx
+
+COMPRESSION_THRESHOLD = 1024  # Bytes; smaller blobs do not shrink enough to pay for compressing
+COMPRESSION_LEVEL = 1  # Fastest level, as states are serialized on every event
+
+# Instance attributes Reflex caches computed var values in
+COMPUTED_VAR_CACHE_PREFIXES = ("__cached_", "__last_updated_")
+
+# Pickled in place of a state's attributes, holding them pickled, or pickled and compressed
+PICKLED_STATE_KEY = "__pickled__"
+COMPRESSED_STATE_KEY = "__compressed__"
+
+# While set, serializing a state records its pickled and stored sizes in bytes here
+SERIALIZED_SIZES: contextvars.ContextVar[Optional[Dict[str, Tuple[int, int]]]] = contextvars.ContextVar(
+    "serialized_sizes", default=None
+)
+
+
+class CompactStateMixin(rx.State, mixin=True):
+    """Keeps derivable data out of the serialized state and compresses large states."""
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["__dict__"] = {
+            name: value
+            for name, value in state["__dict__"].items()
+            if not name.startswith(COMPUTED_VAR_CACHE_PREFIXES)
+        }
+        # The state manager pickles what is returned here again, which only copies the bytes
+        payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) <= COMPRESSION_THRESHOLD:
+            stored = {PICKLED_STATE_KEY: payload}
+        else:
+            stored = {COMPRESSED_STATE_KEY: zlib.compress(payload, COMPRESSION_LEVEL)}
+        sizes = SERIALIZED_SIZES.get()
+        if sizes is not None:
+            sizes[self.get_full_name()] = (len(payload), len(next(iter(stored.values()))))
+        return stored
+
+    def __setstate__(self, state: dict):
+        if COMPRESSED_STATE_KEY in state:
+            state = pickle.loads(zlib.decompress(state[COMPRESSED_STATE_KEY]))
+        elif PICKLED_STATE_KEY in state:
+            state = pickle.loads(state[PICKLED_STATE_KEY])
+        super().__setstate__(state)
+
+
+async def check_round_trip(redis_url: str) -> List[Tuple[str, int, int]]:
+    """Stores a session with a full game history in Redis and loads it back.
+
+    Args:
+        redis_url: The Redis server to check, e.g. redis://localhost:6379.
+
+    Returns:
+        The name, pickled size and stored size in bytes of each state written.
+
+    Raises:
+        AssertionError: If a loaded state differs from the one stored.
+    """
+    from redis.asyncio import Redis
+    from reflex.state import StateManagerRedis
+
+    from .benchmarks import _result_documents, _round_history
+    from .results_state import ResultsState
+    from .trust_game_state import PERSONALITIES_CONFIG, TrustGameState
+
+    redis = Redis.from_url(redis_url)
+    manager = StateManagerRedis(state=rx.State, redis=redis)
+    client_token = str(uuid.uuid4())
+    rng = random.Random(0)
+    sizes: Dict[str, Tuple[int, int]] = {}
+    reset_sizes = SERIALIZED_SIZES.set(sizes)
+    try:
+        game_token = f"{client_token}_{TrustGameState.get_full_name()}"
+        game = await manager.get_state(game_token, top_level=False)
+        game._pin_config()
+        game._shuffled_profiles = list(game._config(PERSONALITIES_CONFIG))
+        game._round_history = _round_history(rng, len(game._shuffled_profiles))
+        await manager.set_state(game_token, game)
+
+        results_token = f"{client_token}_{ResultsState.get_full_name()}"
+        results = await manager.get_state(results_token, top_level=False)
+        results._statistics = _result_documents(rng)
+        await manager.set_state(results_token, results)
+
+        loaded_game = await manager.get_state(game_token, top_level=False)
+        loaded_results = await manager.get_state(results_token, top_level=False)
+        assert loaded_game is not game and loaded_results is not results
+        assert (loaded_game._round_history, loaded_game._shuffled_profiles, loaded_results._statistics) == (
+            game._round_history,
+            game._shuffled_profiles,
+            results._statistics,
+        ), "the states loaded from Redis differ from the ones stored"
+    finally:
+        SERIALIZED_SIZES.reset(reset_sizes)
+        keys = await redis.keys(f"{client_token}*")
+        if keys:
+            await redis.delete(*keys)
+        await redis.aclose()
+    return [(name, raw, stored) for name, (raw, stored) in sorted(sizes.items())]
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check a Redis server round-trips the app's states.")
+    parser.add_argument(
+        "redis_url",
+        nargs="?",
+        default=os.environ.get("REDIS_URL", "redis://localhost:6379"),
+        help="the Redis server (default: $REDIS_URL or redis://localhost:6379)",
+    )
+    args = parser.parse_args(argv)
+
+    rows = asyncio.run(check_round_trip(args.redis_url))
+    width = max(len(name) for name, _, _ in rows)
+    print(f"{'state':<{width}}  {'pickled':>10}  {'stored':>10}")
+    for name, raw, stored in rows:
+        print(f"{name:<{width}}  {raw:>10}  {stored:>10}")
+    print(f"Round trip through {args.redis_url} OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Caches the Firebase ID/refresh tokens of an authenticated session and keeps
+them fresh.
+
+A session's tokens are a plain dict (so they can live in a backend-only state
+var) holding the tokens, their absolute expiry and the claims decoded from the
+ID token. Sessions are validated locally against these claims; the network is
+only used to exchange the refresh token shortly before the ID token expires.
+"""
+
+import base64
+import json
+import time
+from typing import Any, Dict, Optional
+
+from .firebase_config import get_auth_client
+
+# Refresh the ID token this long before it expires
+REFRESH_MARGIN_SECONDS = 300
+
+# Lower bound on the wait between two refresh attempts
+MIN_REFRESH_DELAY_SECONDS = 5
+
+# Wait before retrying a refresh that failed for a transient reason
+REFRESH_RETRY_SECONDS = 30
+
+# Firebase ID tokens live one hour; used when expiresIn is missing
+DEFAULT_EXPIRES_IN_SECONDS = 3600
+
+# Refresh failures after which the refresh token can never succeed again
+PERMANENT_REFRESH_ERRORS = (
+    "TOKEN_EXPIRED",
+    "USER_DISABLED",
+    "USER_NOT_FOUND",
+    "INVALID_REFRESH_TOKEN",
+    "INVALID_GRANT_TYPE",
+    "MISSING_REFRESH_TOKEN",
+)
+
+
+def decode_token_claims(id_token: str) -> Dict[str, Any]:
+    """Decodes the payload of a JWT without verifying its signature.
+
+    The token was received directly from Firebase over TLS, so its claims are
+    trusted as-is; they are only used to check expiry and the owning user.
+
+    Args:
+        id_token: The Firebase ID token
+
+    Returns:
+        The claims dictionary, empty if the token is malformed
+    """
+    try:
+        payload = id_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError):
+        return {}
+    return claims if isinstance(claims, dict) else {}
+
+
+def session_tokens_from_response(response: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+    """Builds the cached session tokens from a sign-in/sign-up or token refresh response.
+
+    Args:
+        response: identitytoolkit response (idToken, refreshToken, expiresIn, localId)
+            or securetoken response (id_token, refresh_token, expires_in, user_id)
+        now: Current time in seconds since the epoch, defaults to time.time()
+
+    Returns:
+        Dictionary with id_token, refresh_token, user_id and expires_at, or an
+        empty dict if the response carries no ID token
+    """
+    now = time.time() if now is None else now
+    id_token = response.get("idToken") or response.get("id_token") or ""
+    if not id_token:
+        return {}
+    claims = decode_token_claims(id_token)
+
+    try:
+        expires_in = float(response.get("expiresIn") or response.get("expires_in") or DEFAULT_EXPIRES_IN_SECONDS)
+    except (TypeError, ValueError):
+        expires_in = DEFAULT_EXPIRES_IN_SECONDS
+    expires_at = float(claims["exp"]) if isinstance(claims.get("exp"), (int, float)) else now + expires_in
+
+    return {
+        "id_token": id_token,
+        "refresh_token": response.get("refreshToken") or response.get("refresh_token") or "",
+        "user_id": claims.get("user_id") or claims.get("sub") or response.get("localId") or response.get("user_id") or "",
+        "expires_at": expires_at,
+    }
+
+
+def is_session_valid(tokens: Dict[str, Any], user_id: str, now: Optional[float] = None) -> bool:
+    """Checks locally that the cached tokens belong to user_id and have not expired."""
+    if not tokens or not user_id or tokens.get("user_id") != user_id:
+        return False
+    now = time.time() if now is None else now
+    return now < tokens.get("expires_at", 0)
+
+
+def can_refresh(tokens: Dict[str, Any], user_id: str) -> bool:
+    """Returns True if the cached tokens belong to user_id and hold a refresh token."""
+    return bool(tokens) and bool(user_id) and tokens.get("user_id") == user_id and bool(tokens.get("refresh_token"))
+
+
+def seconds_until_refresh(tokens: Dict[str, Any], now: Optional[float] = None) -> float:
+    """Seconds to wait before refreshing the cached tokens (0 if they are due)."""
+    now = time.time() if now is None else now
+    return max(0.0, tokens.get("expires_at", 0) - REFRESH_MARGIN_SECONDS - now)
+
+
+def is_permanent_refresh_error(code: str) -> bool:
+    """Returns True if a refresh failing with code should not be retried."""
+    return any(error in code for error in PERMANENT_REFRESH_ERRORS)
+
+
+async def refresh_session_tokens(tokens: Dict[str, Any]) -> Dict[str, Any]:
+    """Exchanges the cached refresh token for fresh session tokens.
+
+    Args:
+        tokens: The cached session tokens
+
+    Returns:
+        The new session tokens
+
+    Raises:
+        FirebaseAuthError: If the secure token endpoint rejects the refresh
+    """
+    response = await get_auth_client().refresh_id_token(tokens["refresh_token"])
+    return session_tokens_from_response(response)
@@ -0,0 +1,356 @@
+"""
+Request tracing in the OpenTelemetry model: one trace per Reflex event.
+
+The root span ("reflex.event") opens when the state manager hands an event its
+session state and ends after the state is saved back. Inside it come the spans
+"state.load" and "state.save" (see StateManagerTracing), one span per
+event handler and per firebase_db call (through metrics.instrument), and one
+per LLM request (see traced).
+
+Trace tags (TRACE_TAGS: user id, experiment section, stage and round, handler)
+set on any span are copied to its ancestors and inherited by the spans started
+under it, so every span of a slow click can be found by participant and round.
+
+Finished spans are queued and written by a background thread, in batches, to:
+
+    TRUST_WEB_TRACE_FILE      a JSON-lines file, one span per line
+    TRUST_WEB_TRACE_ENDPOINT  an OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+
+Tracing is off unless configure_tracing() finds one of them; then starting a
+span costs a single check.
+"""
+
+import atexit
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from .app_logging import HOT_PATH
+from .state_hooks import StateManagerHook, install_state_manager_hooks, register_state_manager_hook
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE_ENV = "TRUST_WEB_TRACE_FILE"
+TRACE_ENDPOINT_ENV = "TRUST_WEB_TRACE_ENDPOINT"
+
+SERVICE_NAME = "trust-web"
+ROOT_SPAN_NAME = "reflex.event"
+
+# Attributes shared by every span of a trace
+TRACE_TAGS: Tuple[str, ...] = ("user.id", "experiment.section", "experiment.stage", "experiment.round", "reflex.handler")
+
+# State var -> trace tag, read from the state an event handler runs on
+STATE_VAR_TAGS: Dict[str, str] = {
+    "current_section": "experiment.section",
+    "current_stage": "experiment.stage",
+    "current_round": "experiment.round",
+}
+
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL_SECONDS = 1.0
+EXPORT_TIMEOUT_SECONDS = 5.0
+
+
+class Span:
+    """One timed operation of a trace."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = {tag: parent.attributes[tag] for tag in TRACE_TAGS if tag in parent.attributes} if parent else {}
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.set_attributes(attributes)
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        """Sets attributes on this span; trace tags among them also go to every ancestor."""
+        self.attributes.update(attributes)
+        tags = {key: value for key, value in attributes.items() if key in TRACE_TAGS}
+        ancestor = self.parent
+        while tags and ancestor is not None:
+            ancestor.attributes.update(tags)
+            ancestor = ancestor.parent
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": "error" if self.error is not None else "ok",
+            "error": self.error,
+            "attributes": dict(self.attributes),
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Dict[str, Any]) -> Dict[str, Any]:
+    """A span of to_dict() in the OTLP/JSON encoding."""
+    otlp = {
+        "traceId": span["trace_id"],
+        "spanId": span["span_id"],
+        "name": span["name"],
+        "kind": 2 if span["parent_span_id"] is None else 1,  # SERVER for the event, INTERNAL below it
+        "startTimeUnixNano": str(span["start_time_unix_nano"]),
+        "endTimeUnixNano": str(span["end_time_unix_nano"]),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span["attributes"].items()],
+        "status": {"code": 2, "message": span["error"]} if span["error"] is not None else {"code": 1},
+    }
+    if span["parent_span_id"] is not None:
+        otlp["parentSpanId"] = span["parent_span_id"]
+    return otlp
+
+
+class SpanExporter:
+    """Writes finished spans from a background thread, so the event loop only enqueues them."""
+
+    def __init__(self, trace_file: Optional[str] = None, endpoint: Optional[str] = None):
+        self.trace_file = Path(trace_file) if trace_file else None
+        self.endpoint = endpoint
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._client: Optional[httpx.Client] = None
+
+    def start(self) -> None:
+        if self.endpoint:
+            self._client = httpx.Client(timeout=EXPORT_TIMEOUT_SECONDS)
+        self._thread.start()
+
+    def submit(self, span: Span) -> None:
+        self._queue.put(span.to_dict())
+
+    def stop(self) -> None:
+        """Exports the spans still queued and ends the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(EXPORT_TIMEOUT_SECONDS * 2)
+        if self._client is not None:
+            self._client.close()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    span = self._queue.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                self._export(batch)
+
+    def _export(self, batch: List[Dict[str, Any]]) -> None:
+        if self.trace_file is not None:
+            try:
+                with self.trace_file.open("a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(span, default=str, ensure_ascii=False) + "\n" for span in batch)
+            except OSError as e:
+                logger.warning("Could not write %d spans to %s: %s", len(batch), self.trace_file, e, extra=HOT_PATH)
+        if self._client is not None:
+            payload = {
+                "resourceSpans": [
+                    {
+                        "resource": {"attributes": [{"key": "service.name", "value": _otlp_value(SERVICE_NAME)}]},
+                        "scopeSpans": [{"scope": {"name": __name__}, "spans": [_otlp_span(span) for span in batch]}],
+                    }
+                ]
+            }
+            try:
+                self._client.post(self.endpoint, json=payload).raise_for_status()
+            except httpx.HTTPError as e:
+                logger.warning("Could not export %d spans to %s: %s", len(batch), self.endpoint, e, extra=HOT_PATH)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("trust_web_current_span", default=None)
+_exporter: Optional[SpanExporter] = None
+
+
+def configure_tracing(trace_file: Optional[str] = None, endpoint: Optional[str] = None) -> bool:
+    """Starts exporting spans if a trace file or collector is configured; later calls do nothing.
+
+    Args:
+        trace_file: JSON-lines output path, defaults to $TRUST_WEB_TRACE_FILE
+        endpoint: OTLP/HTTP traces URL, defaults to $TRUST_WEB_TRACE_ENDPOINT
+
+    Returns:
+        True if tracing is enabled
+    """
+    global _exporter
+    if _exporter is not None:
+        return True
+    trace_file = trace_file or os.getenv(TRACE_FILE_ENV)
+    endpoint = endpoint or os.getenv(TRACE_ENDPOINT_ENV)
+    if not trace_file and not endpoint:
+        return False
+    _exporter = SpanExporter(trace_file, endpoint)
+    _exporter.start()
+    atexit.register(_exporter.stop)
+    logger.info("Tracing enabled", extra={"trace_file": trace_file, "trace_endpoint": endpoint})
+    return True
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Runs the block in a new span, a child of the current one, and exports it when done.
+
+    An exception escaping the block marks the span as failed and is re-raised.
+
+    Yields:
+        The span, or None while tracing is off
+    """
+    if _exporter is None:
+        yield None
+        return
+    span = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        _exporter.submit(span)
+
+
+def wrap_calls(fn: Callable, enter: Callable[[tuple, dict], ContextManager]) -> Callable:
+    """Runs every call of fn inside enter(args, kwargs), keeping fn a plain, async, generator or async generator function.
+
+    Generators stay inside the context until exhausted, so a handler yielding
+    intermediate updates is covered end to end.
+    """
+    if inspect.isasyncgenfunction(fn):
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with enter(args, kwargs):
+                async for item in fn(*args, **kwargs):
+                    yield item
+
+    elif inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with enter(args, kwargs):
+                return await fn(*args, **kwargs)
+
+    elif inspect.isgeneratorfunction(fn):
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with enter(args, kwargs):
+                return (yield from fn(*args, **kwargs))
+
+    else:
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with enter(args, kwargs):
+                return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def traced(name: str, **attributes: Any) -> Callable[[Callable], Callable]:
+    """Decorator running every call of the function in a span called name."""
+
+    def decorator(fn: Callable) -> Callable:
+        return wrap_calls(fn, lambda args, kwargs: start_span(name, **attributes))
+
+    return decorator
+
+
+def event_span_attributes(state: Any) -> Dict[str, Any]:
+    """Trace tags of an event handler's state: the participant's user id and the section, stage and round vars it has."""
+    if _exporter is None:
+        return {}
+    state = getattr(state, "__wrapped__", state)  # Background tasks get a StateProxy; read the last loaded values
+    attributes: Dict[str, Any] = {}
+    for var_name, tag in STATE_VAR_TAGS.items():
+        if var_name in state.base_vars:
+            attributes[tag] = getattr(state, var_name)
+
+    from .identity_state import IdentityState  # Imported here: firebase_db -> metrics -> tracing must not load the states
+
+    root = state
+    while root.parent_state is not None:
+        root = root.parent_state
+    identity = root.substates.get(IdentityState.get_name())  # Only if already loaded; tracing never fetches state
+    if identity is not None and identity.user_id:
+        attributes["user.id"] = identity.user_id
+    return attributes
+
+
+class StateManagerTracing(StateManagerHook):
+    """A root span per modify_state, with state.load and state.save under it.
+
+    A modify_state already inside a span, like `async with self` in a background
+    task, does not start a new trace.
+    """
+
+    def loading(self, token: str) -> ContextManager[Any]:
+        return start_span("state.load")
+
+    def saving(self, token: str, state: Any) -> ContextManager[Any]:
+        return start_span("state.save")
+
+    def modifying(self, token: str) -> ContextManager[Any]:
+        if _current_span.get() is not None:
+            return contextlib.nullcontext()
+        return start_span(ROOT_SPAN_NAME)
+
+
+_state_manager_tracing = StateManagerTracing()
+
+
+def instrument_state_manager(manager: Any) -> None:
+    """Traces the state manager of the app (see StateManagerTracing)."""
+    register_state_manager_hook(_state_manager_tracing)
+    install_state_manager_hooks(manager)
+
+
+@contextlib.asynccontextmanager
+async def tracing_lifespan(rx_app: Any):
+    """Backend lifespan task tracing rx_app's state manager, which only exists once the app is set up."""
+    if _exporter is not None:
+        instrument_state_manager(rx_app.state_manager)
+    yield
@@ -1,27 +1,56 @@
+import asyncio
 import datetime
+import logging
 import random
 import numpy as np
-import toml
-from pathlib import Path
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Mapping, Optional, Any
 
 import reflex as rx
-from .firebase_db import save_experiment_data
+from .firebase_db import get_session_checkpoint, save_experiment_data, save_session_checkpoint
+from .identity_state import IdentityState
+from .config_registry import is_config_version_available, thaw
+from .config_state import PinnedConfigMixin
+from .state_store import CompactStateMixin
 # from Trust_Web.authentication import AuthState
 # from reflex.utils import get_value
 # from .authentication import AuthState # Removed
 
+logger = logging.getLogger(__name__)
+
+# Defaults for settings missing from the [trust_game] table of profiles/experiment.toml
 NUM_ROUNDS = 3  # test 용으로 원래는 10
 PROLIFERATION_FACTOR = 3
 INITIAL_BALANCE = 10
 
-# Load personality profiles from toml file
-PROFILES_PATH: Path = Path(__file__).parent / "profiles" / "personalities.toml"
-with open(PROFILES_PATH, "r") as f:
-    PERSONALITY_PROFILES: Dict[str, Any] = toml.load(f)
-
-
-class TrustGameState(rx.State):
+# Personality profiles and game settings are served by the shared config registry
+PERSONALITIES_CONFIG = "personalities"
+EXPERIMENT_CONFIG = "experiment"
+TRUST_GAME_DEFAULTS: Dict[str, Any] = {
+    "num_rounds": NUM_ROUNDS,
+    "proliferation_factor": PROLIFERATION_FACTOR,
+    "initial_balance": INITIAL_BALANCE,
+}
+
+# Round fields summed per stage for the stage transition and final pages
+STAGE_TOTAL_FIELDS = ("amount_sent", "amount_returned", "player_a_current_round_payoff")
+
+# Checkpoints: one compact record per participant, rewritten on every round commit and read on login
+CHECKPOINT_VERSION = 1
+SECTION_NUMBERS: Dict[str, int] = {"section1": 1, "section2": 2}
+CHECKPOINT_PAGES: Dict[str, str] = {"section1": "/app/section1", "section2": "/app/section2"}
+# _round_history is stored as one flat list of these fields per entry (Firestore has no nested
+# arrays); the personality follows from the stage
+CHECKPOINT_HISTORY_FIELDS = (
+    "stage",
+    "round",
+    "amount_sent",
+    "amount_returned",
+    "player_a_current_round_payoff",
+    "player_b_current_round_payoff",
+)
+
+
+class TrustGameState(PinnedConfigMixin, CompactStateMixin, rx.State):
     """State for the trust game experiment."""
 
     # Game state
@@ -62,17 +91,14 @@ class TrustGameState(rx.State):
     amount_to_return: int = 0  # 수탁자(player_b)가 투자자에게 돌려줄 금액
     message_b: str = ""  # 수탁자(player_b)가 투자자에게 보내는 메시지
 
-    # Game history
-    round_history: List[
+    # Game history, kept on the server; the browser only gets the per-stage totals below
+    _round_history: List[
         Dict
     ] = []  # 현재 stage에서 진행된 모든 round의 데이터를 저장하는 리스트
 
-    # Player B profiles for section 2
-    shuffled_profiles: List[
-        Tuple[str, Dict]
-    ] = []  # List of (personality, profile) tuples
+    # Player B profiles for section 2, as personality names into the config registry; the browser gets num_stages
+    _shuffled_profiles: List[str] = []
     player_b_personality: str = ""
-    player_b_profile: Optional[Dict] = None
 
     current_section: str = "section1"  # "section1" or "section2"
 
@@ -80,8 +106,8 @@ class TrustGameState(rx.State):
 
     game_began_at: str = ""
 
-    user_id: str = ""
-    user_email: str = ""
+    # Seeds the AI players' draws of every round (see _round_rng), so a resumed round draws the same values
+    _rng_seed: int = 0
 
     @rx.event
     def set_amount_to_return(self, value: str) -> None:
@@ -107,28 +133,18 @@ class TrustGameState(rx.State):
         except ValueError:
             raise ValueError("Please enter a valid integer value")
 
-    @rx.event
-    def set_user_identity(self, user_id: str, user_email: str):
-        """Sets the user ID and email for the trust game state."""
-        print(
-            f"[DEBUG] set_user_identity called with: id='{user_id}', email='{user_email}'"
-        )
-        self.user_id = user_id
-        self.user_email = user_email
-
     # ========================== Transaction ==========================
     @rx.event
     def simulate_player_a_decision(self) -> None:
         """Simulate Player A's decision for Section 1."""
-        print(f"initial_balance: {self.player_a_balance}")
-        print(f"max_send_amount: {self.max_send_amount}")
-        self.amount_to_send = random.randint(1, self.max_send_amount)
+        self.amount_to_send = int(self._round_rng().integers(1, self.max_send_amount + 1))
 
     @rx.event
-    def submit_player_b_decision(self) -> None:
+    async def submit_player_b_decision(self) -> None:
         """Handle Player B's decision submission.
         This function is executed when a human participant plays as player_b in the first section.
         """
+        identity = await self.get_state(IdentityState)
         try:
             self.player_b_current_round_payoff = (
                 self.received_amount - self.amount_to_return
@@ -142,8 +158,8 @@ class TrustGameState(rx.State):
             # Section 1: 실험 데이터 저장
             if self.current_section == "section1":
                 transaction = {
-                    "user_id": self.user_id,
-                    "user_email": self.user_email,
+                    "user_id": identity.user_id,
+                    "user_email": identity.user_email,
                     # "game_name": "trust_game", # Added by helper
                     # "section_num": 1, # Added by helper
                     "round": self.current_round,
@@ -155,12 +171,14 @@ class TrustGameState(rx.State):
                     "player_b_balance": self.player_b_balance,
                     "game_began_at": self.game_began_at,
                 }
-                self._save_trust_game_round_data(
+                await self._save_trust_game_round_data(
+                    user_id=identity.user_id,
                     section_num=1,
                     stage_num=0, # Section 1 can be considered stage 0
                     round_num=self.current_round,
                     transaction_data=transaction
                 )
+                await asyncio.to_thread(save_session_checkpoint, identity.user_id, self._checkpoint())
             # Move to next round or section
             # 다음 라운드로 이동은 별도 이벤트(go_to_next_round)에서 처리
             pass
@@ -181,17 +199,17 @@ class TrustGameState(rx.State):
         self.current_round = 1
         self.amount_to_send = 0 # Player A starts with 0 to send
         self.player_b_balance = 0 # Opponent's balance resets per stage
-        # self.round_history = [] # Round history is for the entire section 2, not per stage
+        # self._round_history = [] # Round history is for the entire section 2, not per stage
 
     def _reset_section_balances(self):
         """Resets player balances for a new section."""
-        self.player_a_balance = INITIAL_BALANCE # Human player's balance
+        self.player_a_balance = self._setting("initial_balance") # Human player's balance
         self.player_b_balance = 0 # Opponent's balance (for Player B in S1, or AI in S2)
 
     @rx.event
     def go_to_next_round(self) -> None:
         self._reset_round_variables()
-        if self.current_round < NUM_ROUNDS:
+        if self.current_round < self._setting("num_rounds"):
             self.current_round += 1
             if self.current_section == "section1":
                 self.simulate_player_a_decision() # Player A (AI) makes a decision
@@ -203,7 +221,7 @@ class TrustGameState(rx.State):
                 return self.proceed_to_section_transition()
             elif self.current_section == "section2":
                 self.current_stage += 1
-                if self.current_stage >= len(self.shuffled_profiles): # Use >= for safety
+                if self.current_stage >= len(self._shuffled_profiles): # Use >= for safety
                     self.is_last_stage = True
                     # Potentially redirect to a final summary or results page for section 2
                     # For now, proceed_to_stage_transition will handle the last stage by showing summary
@@ -214,7 +232,7 @@ class TrustGameState(rx.State):
     @rx.event
     def start_section_1(self) -> None:
         """Mark user as ready to start the experiment section 1 (Player B Trust Game)."""
-        print("[DEBUG] Section 1 start")
+        logger.debug("Section 1 start")
         import datetime
 
         self.game_began_at = datetime.datetime.now().isoformat()
@@ -223,7 +241,7 @@ class TrustGameState(rx.State):
     @rx.event
     def start_section_2(self) -> None:
         """Start Section 2 after the transition page."""
-        print("[DEBUG] Section 2 start")
+        logger.debug("Section 2 start")
         import datetime
 
         self.game_began_at = datetime.datetime.now().isoformat()
@@ -232,23 +250,27 @@ class TrustGameState(rx.State):
     @rx.event
     def select_player_b_profile(self) -> None:
         """Select the Player B profile for the current stage."""
-        self.player_b_personality, self.player_b_profile = self.shuffled_profiles[
-            self.current_stage
-        ]
+        self.player_b_personality = self._shuffled_profiles[self.current_stage]
+
+    def _player_b_profile(self) -> Optional[Mapping[str, Any]]:
+        """The frozen profile of the current Player B, None before Section 2 starts."""
+        if not self.player_b_personality:
+            return None
+        return self._config(PERSONALITIES_CONFIG).get(self.player_b_personality)
+
+    def _setting(self, name: str) -> Any:
+        """A [trust_game] setting of the pinned configuration version."""
+        return self._config(EXPERIMENT_CONFIG).get("trust_game", {}).get(name, TRUST_GAME_DEFAULTS[name])
 
     @rx.event
-    def main_algorithm(self) -> None:
+    async def main_algorithm(self) -> None:
         """
         The main game logic for Section 2.
         Handle Player A's decision submission.
         This function is executed when a human participant plays as player_a in the second section.
         """
+        identity = await self.get_state(IdentityState)
         try:
-            # 매번 AuthState에서 값을 복사 (지연 import로 circular import 방지)
-            # from Trust_Web.authentication import AuthState
-            # self.set_user_identity(str(AuthState.user_id), str(AuthState.user_email))
-            # 위 코드를 제거하고, 이미 self.user_id/self.user_email이 올바르게 세팅되어 있다고 가정
-
             # Calculate Player B's return amount based on the profile
             self.amount_to_return = self.calculate_player_b_return()
 
@@ -264,8 +286,8 @@ class TrustGameState(rx.State):
 
             # Record round
             round_data: Dict[str, Any] = {
-                "user_id": self.user_id,
-                "user_email": self.user_email,
+                "user_id": identity.user_id,
+                "user_email": identity.user_email,
                 "stage": self.current_stage,
                 "round": self.current_round,
                 "personality": self.player_b_personality,
@@ -277,19 +299,19 @@ class TrustGameState(rx.State):
                 "timestamp": datetime.datetime.now().isoformat(),
             }
 
-            self.round_history.append(round_data)
+            self._round_history.append(round_data)
 
             # Section 2: 실험 데이터 저장
             if self.current_section == "section2":
                 transaction = {
-                    "user_id": self.user_id,
-                    "user_email": self.user_email,
+                    "user_id": identity.user_id,
+                    "user_email": identity.user_email,
                     # "game_name": "trust_game", # Added by helper
                     # "section_num": 2, # Added by helper
                     "stage_num": self.current_stage,
                     "round": self.current_round,
                     "player_b_profile_name": self.player_b_personality, # Save profile name
-                    "player_b_profile_details": self.player_b_profile, # Save full profile
+                    "player_b_profile_details": thaw(self._player_b_profile()), # Save full profile
                     "amount_sent": self.amount_to_send,
                     "amount_returned": self.amount_to_return,
                     "message": self.message_b, # AI message to human
@@ -299,7 +321,8 @@ class TrustGameState(rx.State):
                     "player_b_balance": self.player_b_balance,
                     "game_began_at": self.game_began_at,
                 }
-                self._save_trust_game_round_data(
+                await self._save_trust_game_round_data(
+                    user_id=identity.user_id,
                     section_num=2,
                     stage_num=self.current_stage,
                     round_num=self.current_round,
@@ -307,6 +330,8 @@ class TrustGameState(rx.State):
                 )
 
             self.is_decision_submitted = True
+            if self.current_section == "section2":
+                await asyncio.to_thread(save_session_checkpoint, identity.user_id, self._checkpoint())
             # 결과만 보여주고, 라운드/스테이지 이동은 go_to_next_round에서만 처리
             return None
         except ValueError:
@@ -316,27 +341,128 @@ class TrustGameState(rx.State):
     def calculate_player_b_return(self) -> int:
         """Calculate Player B's return amount based on profile."""
 
-        if not self.player_b_profile:
+        profile = self._player_b_profile()
+        if not profile:
             return 0
 
-        params: Dict[str, float] = self.player_b_profile["parameters"]
+        params: Mapping[str, float] = profile["parameters"]
         loc_value: float = params["base_fairness"] + params["generosity_bias"]
 
         if self.amount_to_send > params["large_investment_cutoff"]:
             loc_value -= params["large_investment_bias"]
 
-        base_return_rate: float = np.random.normal(
+        base_return_rate: float = self._round_rng().normal(
             loc_value, params["fairness_variance"]
         )
         base_return: float = self.received_amount * base_return_rate
 
-        if self.current_round > NUM_ROUNDS * 0.8:
+        if self.current_round > self._setting("num_rounds") * 0.8:
             base_return *= 1 - params["end_game_fairness_drop"]
 
         max_return: int = self.received_amount
         return min(max(0, round(base_return)), max_return)
 
-    def _save_trust_game_round_data(self, section_num: int, stage_num: int, round_num: int, transaction_data: Dict[str, Any]):
+    def _round_rng(self) -> np.random.Generator:
+        """Random generator of the current round, the same every time the round is played."""
+        return np.random.default_rng(
+            [self._rng_seed, SECTION_NUMBERS[self.current_section], self.current_stage, self.current_round]
+        )
+
+    def _checkpoint(self) -> Dict[str, Any]:
+        """The record a reconnecting session resumes from, taken right after a round is committed."""
+        return {
+            "version": CHECKPOINT_VERSION,
+            "config_version": self._config_version,
+            "section": self.current_section,
+            "stage": self.current_stage,
+            "round": self.current_round,
+            "seed": self._rng_seed,
+            "balances": [self.player_a_balance, self.player_b_balance],
+            "amounts": [self.amount_to_send, self.amount_to_return],
+            "payoffs": [self.player_a_current_round_payoff, self.player_b_current_round_payoff],
+            "profiles": list(self._shuffled_profiles),
+            "history": [entry.get(field, 0) for entry in self._round_history for field in CHECKPOINT_HISTORY_FIELDS],
+            "game_began_at": self.game_began_at,
+            "finished": self.current_section == "section2"
+            and self.current_stage >= len(self._shuffled_profiles) - 1
+            and self.current_round >= self._setting("num_rounds"),
+        }
+
+    def _is_resumable(self, checkpoint: Optional[Mapping[str, Any]]) -> bool:
+        """Whether checkpoint is of this version and taken before the game's last round was committed."""
+        return bool(checkpoint) and checkpoint.get("version") == CHECKPOINT_VERSION and not checkpoint["finished"]
+
+    def _restore_checkpoint(self, checkpoint: Mapping[str, Any]) -> bool:
+        """Puts the game back in the state _checkpoint recorded.
+
+        A checkpoint of a configuration version that is no longer available
+        restarts its stage on the latest version instead, as its rounds were
+        played under rules this process cannot read.
+
+        Returns:
+            False if the game cannot be resumed, leaving the state to be reset
+        """
+        config_available = is_config_version_available(checkpoint["config_version"])
+        self._config_version = checkpoint["config_version"] if config_available else ""
+        self._rng_seed = checkpoint["seed"]
+        self.current_section = checkpoint["section"]
+        self.current_stage = checkpoint["stage"]
+        self.current_round = checkpoint["round"]
+        self.player_a_balance, self.player_b_balance = checkpoint["balances"]
+        self.amount_to_send, self.amount_to_return = checkpoint["amounts"]
+        self.player_a_current_round_payoff, self.player_b_current_round_payoff = checkpoint["payoffs"]
+        self._shuffled_profiles = list(checkpoint["profiles"])
+        self.player_b_personality = self._shuffled_profiles[self.current_stage] if self.current_section == "section2" else ""
+        history, width = checkpoint["history"], len(CHECKPOINT_HISTORY_FIELDS)
+        rows = (history[start : start + width] for start in range(0, len(history), width))
+        self._round_history = [
+            {**dict(zip(CHECKPOINT_HISTORY_FIELDS, row)), "personality": self._shuffled_profiles[row[0]]} for row in rows
+        ]
+        self.game_began_at = checkpoint["game_began_at"]
+        self.is_decision_submitted = True  # Checkpoints are taken when a round is committed
+        self.is_stage_transition = False
+        self.is_last_stage = False
+        self.is_ready = True
+        if not config_available:
+            return self._restart_stage_on_latest_config(checkpoint["config_version"])
+        return True
+
+    def _restart_stage_on_latest_config(self, lost_version: str) -> bool:
+        """Replays the restored stage from its first round, pinned to the latest configuration version."""
+        self._pin_config()
+        if self.current_section == "section1":
+            logger.warning(
+                "Config version %s is unavailable, restarting section 1 on version %s", lost_version, self._config_version
+            )
+            self._reset_section_balances()
+            self._reset_stage_variables()
+            self._round_history = []
+            self.simulate_player_a_decision()
+            return True
+
+        personalities = self._config(PERSONALITIES_CONFIG)
+        missing = [name for name in self._shuffled_profiles[self.current_stage :] if name not in personalities]
+        if missing:
+            logger.warning(
+                "Config version %s is unavailable and version %s lacks personalities %s, not resuming",
+                lost_version,
+                self._config_version,
+                missing,
+            )
+            return False
+        logger.warning(
+            "Config version %s is unavailable, restarting stage %d on version %s",
+            lost_version,
+            self.current_stage,
+            self._config_version,
+        )
+        stage_rounds = [entry for entry in self._round_history if entry["stage"] == self.current_stage]
+        self.player_a_balance -= sum(entry["player_a_current_round_payoff"] for entry in stage_rounds)
+        self._round_history = [entry for entry in self._round_history if entry["stage"] != self.current_stage]
+        self._reset_stage_variables()
+        return True
+
+    async def _save_trust_game_round_data(self, user_id: str, section_num: int, stage_num: int, round_num: int, transaction_data: Dict[str, Any]):
         """Helper function to save trust game round data."""
         # Common data to be added by this helper if not already in transaction_data by caller
         # However, current transaction_data seems complete enough.
@@ -345,8 +471,9 @@ class TrustGameState(rx.State):
 
         document_id = f"stage_{stage_num}_round_{round_num}"
         
-        save_experiment_data(
-            user_id=self.user_id, # Assumes self.user_id is set
+        await asyncio.to_thread(
+            save_experiment_data,
+            user_id=user_id,
             game_name="trust_game", # Explicitly "trust_game"
             data=transaction_data,
             section_num=section_num,
@@ -361,30 +488,61 @@ class TrustGameState(rx.State):
         self.select_player_b_profile()
         return rx.redirect("/app/section2")
 
+    @rx.event
+    async def resume_from_checkpoint(self, default_path: str):
+        """Resumes the participant's game where their last session left off, on login.
+
+        Redirects to the page of the restored round, or to default_path if
+        there is nothing to resume or this session already has a game running.
+        """
+        identity = await self.get_state(IdentityState)
+        if self.is_ready or not identity.user_id:
+            return rx.redirect(default_path)
+        checkpoint = get_session_checkpoint(identity.user_id)
+        if not self._is_resumable(checkpoint):
+            return rx.redirect(default_path)
+        if not self._restore_checkpoint(checkpoint):
+            self.reset_game_state()
+            return rx.redirect(default_path)
+        logger.info(
+            "Resumed %s at stage %d, round %d",
+            self.current_section,
+            self.current_stage,
+            self.current_round,
+            extra={"user_id": identity.user_id},
+        )
+        return rx.redirect(CHECKPOINT_PAGES[self.current_section])
+
     @rx.event
     def reset_game_state(self) -> None:
+        self._unpin_config() # The next game starts on the latest configuration version
+        self._rng_seed = 0
         self._reset_stage_variables() # Resets most per-round/stage vars
         self._reset_section_balances() # Resets player_a_balance to initial, player_b_balance to 0
         
         self.is_last_stage = False
-        print("[TRUST_GAME_STATE] reset_game_state called")
+        logger.debug("reset_game_state called")
         self.current_stage = 0
         self.is_ready = False # Should be set true when a section begins
         self.is_stage_transition = False
-        self.round_history = [] # Clear history for a full reset
-        self.shuffled_profiles = []
-        self.player_b_profile = None
+        self._round_history = [] # Clear history for a full reset
+        self._shuffled_profiles = []
         self.player_b_personality = ""
         self.current_section = "section1" # Default to section1 on full reset
         self.game_began_at = ""
 
     @rx.var
     def received_amount(self) -> int:
-        return self.amount_to_send * PROLIFERATION_FACTOR
+        return self.amount_to_send * self._setting("proliferation_factor")
 
     @rx.var
     def progress_percent(self) -> float:
-        return (self.current_round - 1) / NUM_ROUNDS * 100
+        return (self.current_round - 1) / self.num_rounds * 100
+
+    @rx.var
+    def num_rounds(self) -> int:
+        """Rounds per stage in the pinned configuration version."""
+        return self._setting("num_rounds")
 
     @rx.var
     def max_send_amount(self) -> int:
@@ -392,7 +550,7 @@ class TrustGameState(rx.State):
 
     @rx.var
     def round_str(self) -> str:
-        return f"Round {self.current_round} / {NUM_ROUNDS}"
+        return f"Round {self.current_round} / {self.num_rounds}"
 
     # @rx.event
     # def go_to_trust_game_instructions(self):
@@ -402,10 +560,17 @@ class TrustGameState(rx.State):
     @rx.var
     def player_a_total_payoff_in_section2(self) -> int:
         """Calculates the total payoff for Player A in Section 2 so far."""
-        return self.player_a_balance - INITIAL_BALANCE
+        return self.player_a_balance - self._setting("initial_balance")
+
+    def _start_section(self):
+        """Pins the configuration version and draws the session's seed, unless a section already did."""
+        self._pin_config()  # The session keeps this configuration version until the game is reset
+        if not self._rng_seed:
+            self._rng_seed = random.getrandbits(32)
 
     @rx.event
     def proceed_to_section1(self):
+        self._start_section()
         self.current_section = "section1"
         self._reset_section_balances() # Resets player_a_balance to INITIAL_BALANCE, player_b_balance to 0
         self._reset_stage_variables() # Resets round vars, current_round to 1, amount_to_send to 0
@@ -413,7 +578,7 @@ class TrustGameState(rx.State):
         self.is_ready = True
         self.simulate_player_a_decision() # AI (Player A) makes a decision
         self.is_last_stage = False # Not applicable to section 1 structure
-        self.round_history = [] # Clear history for section 1
+        self._round_history = [] # Clear history for section 1
         return rx.redirect("/app/section1")
 
     @rx.event
@@ -425,6 +590,7 @@ class TrustGameState(rx.State):
 
     @rx.event
     def proceed_to_section2(self):
+        self._start_section()  # Section 2 can be entered directly, e.g. after a reset
         self.current_section = "section2"
         self._reset_section_balances() # Human (Player A) balance reset, AI (Player B) balance to 0
         self._reset_stage_variables()  # Resets round vars, current_round to 1, amount_to_send to 0 etc.
@@ -433,17 +599,15 @@ class TrustGameState(rx.State):
         self.current_stage = 0 # Start from the first AI opponent
         self.is_stage_transition = False
         self.is_last_stage = False
-        self.round_history = [] # Clear history for section 2
+        self._round_history = [] # Clear history for section 2
 
         # Shuffle the profiles and store them
-        profiles = list(PERSONALITY_PROFILES.items())
+        profiles = list(self._config(PERSONALITIES_CONFIG).keys())
         random.shuffle(profiles)
-        self.shuffled_profiles = profiles
-        print(
-            f"[DEBUG] proceed_to_section2: shuffled_profiles={len(self.shuffled_profiles)}"
-        )
-        if not self.shuffled_profiles: # Handle case of no profiles
-             print("[ERROR] No personality profiles loaded or available for Section 2.")
+        self._shuffled_profiles = profiles
+        logger.debug("proceed_to_section2: %d shuffled profiles", len(self._shuffled_profiles))
+        if not self._shuffled_profiles: # Handle case of no profiles
+             logger.error("No personality profiles loaded or available for Section 2")
              # Optionally, redirect to an error page or handle differently
              return rx.redirect("/") # Fallback redirect
         
@@ -457,33 +621,45 @@ class TrustGameState(rx.State):
         # State for the next stage (e.g. opponent balance) is reset when start_next_stage is called
         return rx.redirect("/app/stage-transition")
 
+    @rx.var
+    def num_stages(self) -> int:
+        """Player B opponents in Section 2."""
+        return len(self._shuffled_profiles)
+
+    @rx.var
+    def _stage_totals(self) -> Dict[str, List[int]]:
+        """Per-stage sums of the round history, computed in one pass.
+
+        Cached by Reflex until a round is recorded or the profiles change.
+        """
+        totals = {field: [0] * len(self._shuffled_profiles) for field in STAGE_TOTAL_FIELDS}
+        history = self._round_history
+        for entry in getattr(history, "__wrapped__", history):  # The plain list; no proxy per entry
+            stage = entry.get("stage")
+            if isinstance(stage, int) and 0 <= stage < len(self._shuffled_profiles):
+                for field, stage_totals in totals.items():
+                    stage_totals[stage] += entry.get(field, 0)
+        return totals
+
+    def _finished_stage_total(self, field: str) -> int:
+        stage_totals = self._stage_totals[field]
+        stage = self.current_stage - 1  # stage_transition is shown after stage increment
+        return stage_totals[stage] if 0 <= stage < len(stage_totals) else 0
+
     @rx.var
     def stage_total_invested(self) -> int:
         # Sum of amount_sent for the current stage
-        return sum(
-            r.get("amount_sent", 0)
-            for r in self.round_history
-            if r.get("stage")
-            == self.current_stage - 1  # stage_transition is shown after stage increment
-        )
+        return self._finished_stage_total("amount_sent")
 
     @rx.var
     def stage_total_returned(self) -> int:
         # Sum of amount_returned for the current stage
-        return sum(
-            r.get("amount_returned", 0)
-            for r in self.round_history
-            if r.get("stage") == self.current_stage - 1
-        )
+        return self._finished_stage_total("amount_returned")
 
     @rx.var
     def stage_net_payoff(self) -> int:
         # Net payoff for player A in the stage
-        return sum(
-            r.get("player_a_current_round_payoff", 0)
-            for r in self.round_history
-            if r.get("stage") == self.current_stage - 1
-        )
+        return self._finished_stage_total("player_a_current_round_payoff")
 
     @rx.var
     def stage_end_balance(self) -> int:
@@ -494,76 +670,32 @@ class TrustGameState(rx.State):
     @rx.var
     def all_stages_total_invested(self) -> list:
         # List of total invested per stage
-        if not self.shuffled_profiles:
-            return []
-        num_stages = len(self.shuffled_profiles)
-        return [
-            sum(
-                r.get("amount_sent", 0)
-                for r in self.round_history
-                if r.get("stage") == i
-            )
-            for i in range(num_stages)
-        ]
+        return self._stage_totals["amount_sent"]
 
     @rx.var
     def all_stages_total_returned(self) -> list:
         # List of total returned per stage
-        if not self.shuffled_profiles:
-            return []
-        num_stages = len(self.shuffled_profiles)
-        return [
-            sum(
-                r.get("amount_returned", 0)
-                for r in self.round_history
-                if r.get("stage") == i
-            )
-            for i in range(num_stages)
-        ]
+        return self._stage_totals["amount_returned"]
 
     @rx.var
     def all_stages_net_payoff(self) -> list:
         # List of net payoff per stage
-        if not self.shuffled_profiles:
-            return []
-        num_stages = len(self.shuffled_profiles)
-        return [
-            sum(
-                r.get("player_a_current_round_payoff", 0)
-                for r in self.round_history
-                if r.get("stage") == i
-            )
-            for i in range(num_stages)
-        ]
+        return self._stage_totals["player_a_current_round_payoff"]
 
     @rx.var
     def all_stages_end_balance(self) -> list:
         # List of end balance per stage (cumulative)
-        if not self.shuffled_profiles:
-            return []
-        num_stages = len(self.shuffled_profiles)
+        net_payoffs = self._stage_totals["player_a_current_round_payoff"]
+        running_balance = self.player_a_balance - sum(net_payoffs)  # back-calculate initial
         balances = []
-        running_balance = self.player_a_balance - sum(
-            self.all_stages_net_payoff
-        )  # back-calculate initial
-        for i in range(num_stages):
-            running_balance += self.all_stages_net_payoff[i]
+        for net_payoff in net_payoffs:
+            running_balance += net_payoff
             balances.append(running_balance)
         return balances
 
-    @rx.event_handler("auth.logout_event")
+    @rx.event
     def handle_logout_event(self):
-        """Handles the logout event emitted by AuthState."""
-        print("[TrustGameState] Received logout event. Resetting game state.")
+        """Resets the game when AuthState.logout signs the participant out."""
+        logger.debug("Logout, resetting the trust game")
         self.reset_game_state() # Call existing reset method
 
-    @rx.event_handler("auth.set_user_identity")
-    def handle_set_user_identity(self, payload: dict):
-        """Handles the set_user_identity event emitted by AuthState."""
-        user_id = payload.get("user_id")
-        user_email = payload.get("user_email")
-        if user_id is not None and user_email is not None:
-            print(f"[TrustGameState] Received set_user_identity event. User ID: {user_id}, Email: {user_email}")
-            self.set_user_identity(user_id, user_email) # Call existing method
-        else:
-            print("[TrustGameState] Error: Received set_user_identity event with missing user_id or user_email.")
@@ -1,5 +1,8 @@
 import reflex as rx
 
+# Setting REDIS_URL (e.g. redis://localhost:6379) in the environment keeps session
+# state in Redis instead of this process, so several backend workers can share it
+# and sessions survive restarts; see Trust_Web/state_store.py.
 config = rx.Config(
     app_name="Trust_Web",
     env=rx.Env.DEV,